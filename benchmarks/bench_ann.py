@@ -0,0 +1,84 @@
+"""Measures recall@k and latency of the ann strategy against exact cosine search and the Jaccard path."""
+import random
+import time
+
+from synapsense import ContextManager
+from synapsense.ann_index import LSHIndex
+
+SYLLABLES = [consonant + vowel for consonant in "bcdfghjklmnprstvwz" for vowel in "aeiou"]
+SUFFIXES = ["", "", "", "s", "ing", "ed", "er"]
+
+
+def make_corpus(rng, n_examples, n_queries, n_topics=1000, topic_size=40, common_size=200):
+    def word():
+        return "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+
+    # Examples mix the words of one topic with common words, as real contexts do
+    common = [word() for _ in range(common_size)]
+    topics = [[word() for _ in range(topic_size)] for _ in range(n_topics)]
+    examples = []
+    for _ in range(n_examples):
+        topic = rng.choice(topics)
+        words = [rng.choice(topic if rng.random() < 0.7 else common) for _ in range(rng.randint(6, 14))]
+        examples.append(" ".join(word + rng.choice(SUFFIXES) for word in words))
+    queries = []
+    sources = []
+    for _ in range(n_queries):
+        # Most words of an example, inflected differently, as a paraphrase would be
+        source = rng.randrange(n_examples)
+        words = examples[source].split()
+        words = rng.sample(words, max(3, len(words) * 2 // 3))
+        queries.append([word.rstrip("sdgr") + rng.choice(SUFFIXES) for word in words])
+        sources.append(source)
+    return examples, queries, sources
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    results = [fn(keywords) for keywords in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1e3
+
+
+def main(n_examples=100_000, n_queries=200, k=10):
+    rng = random.Random(0)
+    examples, queries, sources = make_corpus(rng, n_examples, n_queries)
+    cm = ContextManager()
+    cm.add_context("bench", examples)
+
+    start = time.perf_counter()
+    cm.rank_examples("bench", queries[0], strategy="ann")
+    print(f"{n_examples} examples, embedded and indexed in {time.perf_counter() - start:.1f} s")
+
+    reference = LSHIndex()
+    reference.add(examples)
+    exact, exact_ms = timed(lambda keywords: reference.exact_rank(" ".join(keywords), k, 0.0), queries)
+    jaccard, jaccard_ms = timed(lambda keywords: cm.rank_examples("bench", keywords, k, 0.0), queries)
+    strategy, strategy_ms = timed(lambda keywords: cm.rank_examples("bench", keywords, k, 0.0, "ann"), queries)
+    print(f"  exact cosine scan:  {exact_ms:8.2f} ms/query, "
+          f"finds the paraphrased example in {found_source(exact, sources):.0%} of queries")
+    print(f"  jaccard (inverted): {jaccard_ms:8.2f} ms/query, "
+          f"finds the paraphrased example in {found_source(jaccard, sources):.0%} of queries, "
+          f"recall@{k} {recall(jaccard, exact):.3f}")
+    print(f"  ann strategy:       {strategy_ms:8.2f} ms/query, "
+          f"finds the paraphrased example in {found_source(strategy, sources):.0%} of queries, "
+          f"recall@{k} {recall(strategy, exact):.3f}")
+
+    for n_bits, candidates in ((256, 300), (512, 1000), (1024, 1000), (1024, 3000)):
+        index = LSHIndex(n_bits=n_bits, candidates=candidates)
+        index.add(examples)
+        found, ann_ms = timed(lambda keywords: index.rank(" ".join(keywords), k, 0.0), queries)
+        print(f"  lsh {n_bits:4d} bits, {candidates:4d} candidates: {ann_ms:8.2f} ms/query, "
+              f"recall@{k} {recall(found, exact):.3f}, paraphrased example found in {found_source(found, sources):.0%}")
+
+
+def found_source(results, sources):
+    return sum(source in {i for i, _ in result} for result, source in zip(results, sources)) / len(sources)
+
+
+def recall(found, exact):
+    hits = sum(len({i for i, _ in a} & {i for i, _ in b}) for a, b in zip(found, exact))
+    return hits / max(1, sum(len(b) for b in exact))
+
+
+if __name__ == "__main__":
+    main()
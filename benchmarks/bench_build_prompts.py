@@ -0,0 +1,36 @@
+"""Measures build_prompts throughput for 1, 2, 4 and 8 worker processes."""
+import os
+import random
+import time
+
+from synapsense import ContextManager, PromptBuilder
+
+
+def main(n_examples=20_000, n_inputs=20_000):
+    rng = random.Random(0)
+    # extract_keywords keeps alphabetic tokens only.
+    vocabulary = ["w" + "".join(chr(97 + int(d)) for d in str(i)) for i in range(5_000)]
+    examples = [" ".join(rng.choices(vocabulary, k=rng.randint(6, 14))) for _ in range(n_examples)]
+    # Inputs overlap the examples, so every prompt scores real candidates.
+    user_inputs = [" ".join(rng.choice(examples).split()[:5] + rng.sample(vocabulary, 2)) for _ in range(n_inputs)]
+
+    cm = ContextManager()
+    cm.add_context("bench", examples)
+
+    print(f"{n_examples} examples, {n_inputs} inputs, {os.cpu_count()} CPUs")
+    pb = PromptBuilder(cm)
+    start = time.perf_counter()
+    expected = [pb.build_prompt("bench", user_input) for user_input in user_inputs]
+    print(f"build_prompt loop: {n_inputs / (time.perf_counter() - start):10.0f} prompts/s")
+    for workers in (1, 2, 4, 8):
+        with PromptBuilder(cm) as pb:
+            # The first call starts the pool, the next ones reuse it
+            for call in ("first call", "next calls"):
+                start = time.perf_counter()
+                prompts = pb.build_prompts("bench", user_inputs, workers=workers)
+                elapsed = time.perf_counter() - start
+                assert prompts == expected
+                print(f"{workers} workers, {call}: {n_inputs / elapsed:10.0f} prompts/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Measures the memory retained by ContextManager with and without compact mode, and its retrieval latency."""
+import random
+import sys
+import time
+import tracemalloc
+from itertools import accumulate
+
+from synapsense import ContextManager
+
+
+def records(n, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(50_000)]
+    # Zipf-distributed tokens, as in natural text
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    for _ in range(n):
+        tokens = rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(6, 18))
+        yield {"context": f"context{rng.randrange(4)}", "example": " ".join(tokens)}
+
+
+def main(n):
+    queries = [[f"w{i}", f"w{i * 7 + 3}"] for i in range(50)]
+    print(f"{n} examples")
+    retained = {}
+    for compact in (False, True):
+        tracemalloc.start()
+        cm = ContextManager(compact=compact)
+        cm.ingest(records(n))
+        retained[compact], _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        for keywords in queries:
+            cm.rank_examples("context0", keywords, top_k=10, threshold=0.05)
+        latency = (time.perf_counter() - start) / len(queries)
+        print(f"  compact={compact!s:<5}  {retained[compact] / 2 ** 20:8.1f} MiB "
+              f"({retained[compact] / n:6.1f} B/example)  {latency * 1e3:6.2f} ms/query")
+        del cm
+    print(f"  reduction: {retained[False] / retained[True]:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,43 @@
+"""Measures the cost per insert of near-duplicate detection as a context grows, and what it saves."""
+import random
+import time
+
+from synapsense import ContextManager
+
+
+def make_examples(n, rng, duplicate_rate=0.2):
+    vocabulary = [f"w{i}" for i in range(20_000)]
+    examples = []
+    for _ in range(n):
+        if examples and rng.random() < duplicate_rate:
+            # A near-duplicate: an earlier example with one token appended
+            examples.append(rng.choice(examples) + " " + rng.choice(vocabulary))
+        else:
+            examples.append(" ".join(rng.choices(vocabulary, k=rng.randint(12, 24))))
+    return examples
+
+
+def main():
+    rng = random.Random(0)
+    batch_size = 1_000
+    print(f"{'size':>8} {'plain us/insert':>16} {'dedup us/insert':>16} {'dropped':>8} {'KiB saved':>10}")
+    for size in (10_000, 100_000, 300_000):
+        examples = make_examples(size + batch_size, rng)
+        base, batch = examples[:size], examples[size:]
+        timings = []
+        for dedup_threshold in (None, 0.9):
+            cm = ContextManager(dedup_threshold=dedup_threshold)
+            cm.add_context("test", base)
+            checked = cm.dedup_stats["checked"]
+            start = time.perf_counter()
+            for i in range(0, batch_size, 10):
+                cm.add_context("test", batch[i:i + 10])
+            timings.append((time.perf_counter() - start) / batch_size * 1e6)
+        stats = cm.dedup_stats
+        print(f"{size:>8} {timings[0]:>16.1f} {timings[1]:>16.1f} "
+              f"{stats['duplicates'] / stats['checked']:>7.0%} {stats['bytes_saved'] / 1024:>10.0f}")
+        assert stats["checked"] == checked + batch_size
+
+
+if __name__ == "__main__":
+    main()
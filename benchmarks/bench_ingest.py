@@ -0,0 +1,37 @@
+"""Measures ingestion rate and peak memory of ContextManager.ingest for growing JSONL files."""
+import json
+import os
+import random
+import tempfile
+import tracemalloc
+
+from synapsense import SQLiteContextManager
+
+
+def write_jsonl(path, n_rows, rng):
+    vocabulary = [f"w{i}" for i in range(5_000)]
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(n_rows):
+            example = " ".join(rng.choices(vocabulary, k=rng.randint(6, 14)))
+            f.write(json.dumps({"context": f"context{rng.randrange(4)}", "example": example}) + "\n")
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'rows':>8} {'rows/s':>10} {'peak MiB':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for n_rows in (50_000, 200_000, 800_000):
+            source = os.path.join(directory, f"{n_rows}.jsonl")
+            write_jsonl(source, n_rows, rng)
+            # The on-disk manager keeps nothing in memory, so the peak is the ingestion overhead alone
+            cm = SQLiteContextManager(os.path.join(directory, f"{n_rows}.db"))
+            tracemalloc.start()
+            stats = cm.ingest(source, chunk_size=10_000)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            cm.close()
+            print(f"{n_rows:>8} {stats['rows_per_second']:>10.0f} {peak / 2 ** 20:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
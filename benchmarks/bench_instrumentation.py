@@ -0,0 +1,53 @@
+"""Measures the overhead of build_prompt instrumentation when disabled, with no-op hooks, and with Metrics."""
+import gc
+import random
+import time
+
+from synapsense import ContextManager, Instrumentation, Metrics, PromptBuilder
+
+
+def uninstrumented(pb, context_name, user_input):
+    # build_prompt without any instrumentation check, as the baseline
+    keywords = pb.extract_keywords(user_input)
+    relevant_examples = pb.find_relevant_examples(None, keywords, context_name=context_name)
+    if not relevant_examples:
+        return f"No relevant examples found for {context_name}. Please try again."
+    return pb.generate_prompt(relevant_examples, user_input, context_name)
+
+
+def main(n_examples=2_000, n_queries=200, repeat=300):
+    rng = random.Random(0)
+    vocabulary = ["".join(rng.choices("abcdefghij", k=6)) for _ in range(500)]
+    examples = [" ".join(rng.choices(vocabulary, k=rng.randint(4, 12))) for _ in range(n_examples)]
+    inputs = [" ".join(rng.choices(vocabulary, k=3)) for _ in range(n_queries)]
+
+    cm = ContextManager()
+    cm.add_context("bench", examples)
+    builders = {}
+    for label, hook in (("disabled", None), ("no-op hooks", Instrumentation()), ("Metrics", Metrics())):
+        builders[label] = PromptBuilder(cm, similarity_threshold=0.1, instrumentation=hook)
+    plain = builders["disabled"]
+    assert [uninstrumented(plain, "bench", q) for q in inputs] == [plain.build_prompt("bench", q) for q in inputs]
+    variants = {"uninstrumented": lambda q: uninstrumented(plain, "bench", q)}
+    for label, pb in builders.items():
+        variants[label] = lambda q, pb=pb: pb.build_prompt("bench", q)
+
+    # The variants take turns, so that they see the same state of the machine
+    gc.collect()
+    results = dict.fromkeys(variants, float("inf"))
+    for _ in range(repeat):
+        for label, build in variants.items():
+            started = time.perf_counter()
+            for user_input in inputs:
+                build(user_input)
+            results[label] = min(results[label], (time.perf_counter() - started) / len(inputs) * 1e6)
+
+    baseline = results["uninstrumented"]
+    print(f"build_prompt, {n_examples} examples, {n_queries} queries, best of {repeat}")
+    for label, us in results.items():
+        print(f"  {label:15s} {us:8.2f} us/prompt  {(us / baseline - 1) * 100:+6.1f}%")
+    assert results["disabled"] < baseline * 1.05, "disabled instrumentation should cost close to nothing"
+
+
+if __name__ == "__main__":
+    main()
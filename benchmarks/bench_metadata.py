@@ -0,0 +1,37 @@
+"""Measures filter_contexts with a metadata index lookup against a callable run on every example."""
+import random
+import sys
+import time
+
+from synapsense import ContextManager
+
+
+def timed(function, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main(n):
+    rng = random.Random(0)
+    langs = ["en"] * 20 + ["es"] * 5 + ["pt"]
+    cm = ContextManager()
+    for name in ("support", "sales", "docs", "legal"):
+        records = [rng.choice(langs) for _ in range(n // 4)]
+        # The language is also written in the example, so that a callable can filter on it
+        cm.add_context(name, [f"{lang}: example {i}" for i, lang in enumerate(records)],
+                       [{"lang": lang, "source": name} for lang in records])
+    print(f"{n} examples")
+
+    expected, scan = timed(lambda: cm.filter_contexts(lambda example: example.startswith("pt:")))
+    result, indexed = timed(lambda: cm.filter_contexts(where={"lang": "pt"}))
+    assert result == expected
+    _, lazy = timed(lambda: next(cm.iter_filter_contexts(where={"lang": "pt"})))
+    print(f"callable        {scan * 1e3:>9.2f} ms")
+    print(f"where           {indexed * 1e3:>9.2f} ms ({scan / indexed:.0f}x)")
+    print(f"lazy, first     {lazy * 1e3:>9.3f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 400_000)
@@ -0,0 +1,64 @@
+"""Measures ContextOptimizer feedback throughput and the cost of reading the optimized context."""
+import random
+import time
+
+from synapsense import ContextOptimizer
+
+
+def main(n_evaluations=500_000, n_examples=100_000, n_queries=50):
+    rng = random.Random(0)
+    feedback = [(f"example{rng.randrange(n_examples)}", f"query{rng.randrange(n_queries)}", rng.random())
+                for _ in range(n_evaluations)]
+
+    co = ContextOptimizer(max_entries=200_000)
+    start = time.perf_counter()
+    for example, query, metric in feedback:
+        co.evaluate_relevance(example, query, metric)
+    elapsed = time.perf_counter() - start
+    print(f"evaluate_relevance: {n_evaluations / elapsed * 60:,.0f} evaluations/min")
+
+    start = time.perf_counter()
+    for _ in range(1_000):
+        co.adjust_contexts()
+        co.get_optimized_context()
+    print(f"adjust_contexts + get_optimized_context: {(time.perf_counter() - start) * 1e3:.3f} us each "
+          f"over {len(co.example_performance)} examples")
+
+    # Evaluation jobs repeat the same examples and queries many times per batch
+    examples = [f"example{rng.randrange(n_examples // 10)}" for _ in range(n_evaluations)]
+    queries = [f"query{rng.randrange(n_queries)}" for _ in range(n_evaluations)]
+    metrics = [rng.random() for _ in range(n_evaluations)]
+    for name, evaluate in (("evaluate_relevance loop", evaluate_one_by_one), ("evaluate_many", evaluate_many)):
+        co = ContextOptimizer()
+        start = time.perf_counter()
+        evaluate(co, examples, metrics, queries)
+        elapsed = time.perf_counter() - start
+        print(f"{name}, {n_examples // 10} examples: {n_evaluations / elapsed * 60:,.0f} evaluations/min")
+
+    try:
+        import numpy as np
+    except ImportError:
+        return
+    generator = np.random.default_rng(0)
+    example_ids = generator.integers(0, n_examples // 10, 2 * n_evaluations)
+    query_ids = generator.integers(0, 20, 2 * n_evaluations)
+    scores = generator.random(2 * n_evaluations)
+    co = ContextOptimizer()
+    start = time.perf_counter()
+    co.evaluate_many(example_ids, scores, query_ids)
+    elapsed = time.perf_counter() - start
+    print(f"evaluate_many, NumPy id arrays: {2 * n_evaluations / elapsed * 60:,.0f} evaluations/min")
+
+
+def evaluate_one_by_one(co, examples, metrics, queries):
+    for example, query, metric in zip(examples, queries, metrics):
+        co.evaluate_relevance(example, query, metric)
+    co.adjust_contexts()
+
+
+def evaluate_many(co, examples, metrics, queries):
+    co.evaluate_many(examples, metrics, queries)
+
+
+if __name__ == "__main__":
+    main()
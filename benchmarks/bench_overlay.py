@@ -0,0 +1,35 @@
+"""Measures merging a small tenant context manager over a large shared one, as an overlay and materialized."""
+import random
+import sys
+import time
+
+from synapsense import ContextManager, PromptBuilder
+
+
+def main(n):
+    rng = random.Random(0)
+    # Keywords must be alphabetic, so words are spelled with letters
+    vocabulary = ["w" + "".join(chr(97 + int(digit)) for digit in str(i)) for i in range(5000)]
+    base = ContextManager()
+    base.add_context("test", [" ".join(rng.choices(vocabulary, k=rng.randint(6, 18))) for _ in range(n)])
+    tenant = ContextManager()
+    tenant.add_context("test", [" ".join(rng.choices(vocabulary, k=rng.randint(6, 18))) for _ in range(1000)])
+    queries = [" ".join(rng.choices(vocabulary[:200], k=3)) for _ in range(50)]
+    print(f"{n} shared examples, 1000 tenant examples")
+    print(f"{'merge':>12} {'merge ms':>10} {'prompt ms':>10}")
+
+    for name, merge in (("overlay", lambda: base.merge_contexts(tenant)),
+                        ("materialize", lambda: base.merge_contexts(tenant).materialize())):
+        start = time.perf_counter()
+        merged = merge()
+        merge_time = time.perf_counter() - start
+        builder = PromptBuilder(merged, similarity_threshold=0.05)
+        start = time.perf_counter()
+        for user_input in queries:
+            builder.build_prompt("test", user_input)
+        prompt_time = (time.perf_counter() - start) / len(queries)
+        print(f"{name:>12} {merge_time * 1e3:>10.3f} {prompt_time * 1e3:>10.3f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
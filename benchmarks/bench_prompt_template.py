@@ -0,0 +1,37 @@
+"""Compares += concatenation with the compiled template for prompts with many examples."""
+import random
+import time
+
+from synapsense import ContextManager, PromptBuilder
+
+
+def concatenate(relevant_examples, user_input):
+    prompt = ""
+    for example in relevant_examples:
+        prompt += f"Example: {example}\n"
+    prompt += f"User Input: {user_input}\n"
+    prompt += "Please respond based on the above context"
+    return prompt
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) * 1e3 / repeat
+
+
+def main(example_counts=(3, 100, 1000, 10000)):
+    rng = random.Random(0)
+    builder = PromptBuilder(ContextManager())
+    for n_examples in example_counts:
+        examples = [" ".join(rng.choices("abcdefgh", k=200)) for _ in range(n_examples)]
+        repeat = max(1, 20000 // n_examples)
+        expected, concatenated_ms = timed(lambda: concatenate(examples, "user input"), repeat)
+        rendered, template_ms = timed(lambda: builder.generate_prompt(examples, "user input"), repeat)
+        assert rendered == expected
+        print(f"{n_examples:6d} examples: += {concatenated_ms:9.3f} ms   template {template_ms:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
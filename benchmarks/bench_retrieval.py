@@ -0,0 +1,39 @@
+"""Compares the linear scan with the inverted index behind find_relevant_examples."""
+import random
+import time
+
+from synapsense import ContextManager, PromptBuilder
+
+
+def make_corpus(n_examples, rng):
+    # Vocabulary grows with the corpus (Heaps' law), as it does for real example sets.
+    vocabulary = [f"w{i}" for i in range(int(30 * n_examples ** 0.7))]
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    examples = [" ".join(rng.choices(vocabulary, weights, k=rng.randint(6, 14))) for _ in range(n_examples)]
+    queries = [rng.sample(vocabulary[50:], 4) for _ in range(200)]
+    return examples, queries
+
+
+def timeit(fn, queries):
+    start = time.perf_counter()
+    for keywords in queries:
+        fn(keywords)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'examples':>10} {'linear (ms)':>12} {'index (ms)':>12} {'speedup':>8}")
+    for n_examples in (1_000, 10_000, 100_000):
+        examples, queries = make_corpus(n_examples, rng)
+        cm = ContextManager()
+        cm.add_context("bench", examples)
+        pb = PromptBuilder(cm)
+
+        linear = timeit(lambda keywords: pb.find_relevant_examples(examples, keywords), queries[:20])
+        indexed = timeit(lambda keywords: pb.find_relevant_examples(None, keywords, context_name="bench"), queries)
+        print(f"{n_examples:>10} {linear * 1e3:>12.3f} {indexed * 1e3:>12.3f} {linear / indexed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Measures search_context latency with the trigram index against a scan of every example."""
+import gc
+import random
+import sys
+import time
+
+from synapsense import ContextManager
+
+
+def main(n):
+    rng = random.Random(0)
+    words = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(3, 9))) for _ in range(20_000)]
+    cm = ContextManager()
+    for name in ("support", "sales", "docs", "legal"):
+        cm.add_context(name, [" ".join(rng.choices(words, k=rng.randint(6, 18))) for _ in range(n // 4)])
+    queries = [rng.choice(words) for _ in range(100)] + [rng.choice(words)[-3:] + " " + rng.choice(words)[:3]
+                                                        for _ in range(100)]
+    print(f"{n} examples, {len(queries)} queries")
+
+    start = time.perf_counter()
+    expected = [[(name, example) for name in cm.contexts for example in cm.contexts[name] if query in example]
+                for query in queries[:20]]
+    scan = (time.perf_counter() - start) / 20
+    start = time.perf_counter()
+    cm.search_context(queries[0])
+    build = time.perf_counter() - start
+    # The trigram postings are millions of new objects: collect them before timing queries
+    gc.collect()
+    start = time.perf_counter()
+    results = [cm.search_context(query) for query in queries]
+    indexed = (time.perf_counter() - start) / len(queries)
+    assert results[:20] == expected
+    start = time.perf_counter()
+    assert cm.search_contexts(queries) == results
+    batch = (time.perf_counter() - start) / len(queries)
+
+    print(f"scan            {scan * 1e3:>9.3f} ms/query")
+    print(f"index build     {build * 1e3:>9.1f} ms (first search)")
+    print(f"indexed         {indexed * 1e3:>9.3f} ms/query ({scan / indexed:.0f}x)")
+    print(f"indexed batch   {batch * 1e3:>9.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,51 @@
+"""Measures ranking latency percentiles of a large context on one process and on sharded workers."""
+import os
+import random
+import sys
+import time
+from itertools import accumulate
+
+from synapsense import ContextManager, ShardedContextManager
+
+
+def make_examples(n, rng):
+    vocabulary = [f"w{i}" for i in range(20_000)]
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    return [" ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(6, 18))) for _ in range(n)]
+
+
+def percentiles(cm, queries):
+    latencies = []
+    for keywords in queries:
+        start = time.perf_counter()
+        cm.rank_examples("test", keywords, top_k=10, threshold=0.05)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1e3, latencies[int(len(latencies) * 0.99)] * 1e3
+
+
+def main(n):
+    rng = random.Random(0)
+    examples = make_examples(n, rng)
+    # Frequent tokens match many examples, which is what makes a query slow
+    queries = [[f"w{rng.randrange(20)}", f"w{rng.randrange(200)}", f"w{rng.randrange(2000)}"] for _ in range(200)]
+    print(f"{n} examples, {os.cpu_count()} CPUs")
+    print(f"{'shards':>8} {'p50 ms':>8} {'p99 ms':>8}")
+
+    cm = ContextManager()
+    cm.add_context("test", examples)
+    expected = [cm.rank_examples("test", keywords, top_k=10, threshold=0.05) for keywords in queries]
+    p50, p99 = percentiles(cm, queries)
+    print(f"{'none':>8} {p50:>8.2f} {p99:>8.2f}")
+    del cm
+
+    for shards in (2, 4, 8):
+        with ShardedContextManager(shards) as cm:
+            cm.add_context("test", examples)
+            assert [cm.rank_examples("test", keywords, top_k=10, threshold=0.05) for keywords in queries] == expected
+            p50, p99 = percentiles(cm, queries)
+            print(f"{shards:>8} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
@@ -0,0 +1,69 @@
+"""Measures read throughput with growing numbers of reader threads while a writer keeps adding examples."""
+import random
+import sys
+import threading
+import time
+
+from synapsense import ContextManager
+
+
+class GlobalLock:
+    """The alternative to snapshots: one lock held by every read and write."""
+
+    def __init__(self, cm):
+        self.cm = cm
+        self.lock = threading.Lock()
+
+    def add_context(self, context_name, examples):
+        with self.lock:
+            self.cm.add_context(context_name, examples)
+
+    def rank_examples(self, *args):
+        with self.lock:
+            return self.cm.rank_examples(*args)
+
+
+def run(manager, n_readers, duration, rng):
+    vocabulary = [f"w{i}" for i in range(2_000)]
+    stop = threading.Event()
+    reads = [0] * n_readers
+    writes = [0]
+
+    def write():
+        while not stop.is_set():
+            manager.add_context("test", [" ".join(rng.choices(vocabulary, k=12)) for _ in range(100)])
+            writes[0] += 1
+            time.sleep(0.001)
+
+    def read(reader):
+        queries = [rng.choices(vocabulary, k=3) for _ in range(100)]
+        while not stop.is_set():
+            manager.rank_examples("test", queries[reads[reader] % 100], 10, 0.05)
+            reads[reader] += 1
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read, args=(i,)) for i in range(n_readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(reads) / duration, writes[0] / duration
+
+
+def main(duration):
+    rng = random.Random(0)
+    vocabulary = [f"w{i}" for i in range(2_000)]
+    base = [" ".join(rng.choices(vocabulary, k=12)) for _ in range(50_000)]
+    print(f"{'readers':>8} {'snapshot reads/s':>17} {'writes/s':>9} {'locked reads/s':>15} {'writes/s':>9}")
+    for n_readers in (1, 2, 4, 8):
+        rates = []
+        for locked in (False, True):
+            cm = ContextManager()
+            cm.add_context("test", base)
+            rates += run(GlobalLock(cm) if locked else cm, n_readers, duration, rng)
+        print(f"{n_readers:>8} {rates[0]:>17.0f} {rates[1]:>9.0f} {rates[2]:>15.0f} {rates[3]:>9.0f}")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 3.0)
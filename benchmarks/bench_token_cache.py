@@ -0,0 +1,40 @@
+"""Compares re-tokenizing every example per query with the cached token sets of ContextManager."""
+import random
+import time
+import tracemalloc
+
+from synapsense import ContextManager, PromptBuilder
+
+
+def main(n_examples=50_000, n_queries=50):
+    rng = random.Random(0)
+    vocabulary = [f"w{i}" for i in range(5_000)]
+    examples = [" ".join(rng.choices(vocabulary, k=rng.randint(6, 14))) for _ in range(n_examples)]
+    queries = [rng.sample(vocabulary, 4) for _ in range(n_queries)]
+
+    tracemalloc.start()
+    cm = ContextManager()
+    cm.add_context("bench", examples)
+    index_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    pb = PromptBuilder(cm)
+
+    def per_query(fn):
+        start = time.perf_counter()
+        for keywords in queries:
+            fn(keywords)
+        return (time.perf_counter() - start) / n_queries * 1e3
+
+    split = per_query(lambda keywords: pb.find_relevant_examples(examples, keywords))
+    scan = per_query(lambda keywords: cm.rank_examples("bench", keywords, strategy="scan"))
+    inverted = per_query(lambda keywords: cm.rank_examples("bench", keywords, strategy="inverted"))
+
+    print(f"{n_examples} examples, {n_queries} queries")
+    print(f"cached tokens + index memory: {index_bytes / 2 ** 20:.1f} MiB ({index_bytes / n_examples:.0f} B/example)")
+    print(f"split per query:   {split:8.3f} ms/query")
+    print(f"cached token sets: {scan:8.3f} ms/query")
+    print(f"inverted index:    {inverted:8.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
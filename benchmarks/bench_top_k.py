@@ -0,0 +1,37 @@
+"""Compares a full sort with bounded top-k selection over 1M scored examples."""
+import heapq
+import random
+import time
+
+from synapsense.context_index import select_top_k
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1e3
+
+
+def main(n_scored=1_000_000, k=10):
+    rng = random.Random(0)
+    # Coarse scores, as Jaccard similarities are, so there are plenty of ties
+    ranked = [(example_id, rng.randint(1, 50) / 50) for example_id in range(n_scored)]
+    performance = {f"example{example_id}": score for example_id, score in ranked}
+
+    full, full_ms = timed(lambda: sorted(ranked, key=lambda x: (-x[1], x[0]))[:k])
+    heap, heap_ms = timed(lambda: select_top_k(ranked, k))
+    assert full == heap
+    print(f"retrieval, {n_scored} scored examples, k={k}")
+    print(f"  sort + slice: {full_ms:8.1f} ms")
+    print(f"  heap top-k:   {heap_ms:8.1f} ms")
+
+    full, full_ms = timed(lambda: sorted(performance, key=performance.get, reverse=True)[:k])
+    heap, heap_ms = timed(lambda: heapq.nlargest(k, performance, key=performance.get))
+    assert full == heap
+    print(f"optimizer, {n_scored} examples, k={k}")
+    print(f"  sort + slice: {full_ms:8.1f} ms")
+    print(f"  heap top-k:   {heap_ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,28 @@
+import asyncio
 import os
-import openai
-from openai import OpenAI
-from synapsense import ContextManager, PromptBuilder, ContextOptimizer
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-
-# Download NLTK stopwords corpus if not already downloaded
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
-
-# Load API key from environment variable
-api_key = os.environ.get("OPENAI_API_KEY")
-client = OpenAI(api_key=api_key)
-
-def create_openai_client(api_key):
-    """Creates an OpenAI client instance with the given API key."""
-    return openai.Client(api_key=api_key)
+from synapsense import AsyncPipeline, ContextManager, PromptBuilder, ContextOptimizer
+
+SYSTEM_PROMPT = "You are an expert assistant specialized in Retrieval-Augmented Generation (RAG), In-Context Learning (ICL), and Retrieval-Based Context. Your role is to provide clear, accurate, and detailed explanations of these concepts based on recent academic research. You should assist users by clarifying the differences, applications, and benefits of these methods in large language models (LLMs). When answering, ensure to refer to the latest findings on these techniques, offering examples and insights from research papers to support your explanations."
+
 
 def create_context_manager() -> ContextManager:
     """Create a context manager instance."""
-    # Assuming ContextManager is a custom class
     return ContextManager()
 
 def create_prompt_builder(context_manager: ContextManager) -> PromptBuilder:
     """Create a prompt builder instance."""
-    # Assuming PromptBuilder is a custom class
     return PromptBuilder(context_manager)
 
 def create_context_optimizer() -> ContextOptimizer:
     """Create a context optimizer instance."""
-    # Assuming ContextOptimizer is a custom class
     return ContextOptimizer()
 
-def add_context(context_manager: ContextManager, context_type: str, examples: list[str]) -> None:
-    """Add context examples to the context manager."""
-    context_manager.add_context(context_type, examples)
-
-def call_openai_api(model: str, prompt: str, max_tokens: int, temperature: float) -> str:
-    """Call the OpenAI API to generate a response."""
-    try:
-        response = client.chat.completions.create(model=model,
-        messages=[
-            {"role": "system", "content": "You are an expert assistant specialized in Retrieval-Augmented Generation (RAG), In-Context Learning (ICL), and Retrieval-Based Context. Your role is to provide clear, accurate, and detailed explanations of these concepts based on recent academic research. You should assist users by clarifying the differences, applications, and benefits of these methods in large language models (LLMs). When answering, ensure to refer to the latest findings on these techniques, offering examples and insights from research papers to support your explanations."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=max_tokens,
-        temperature=temperature)
-        return response.choices[0].message.content
-    except Exception as e:
-        print(f"Error: {e}")
-        return None
-
-def main() -> None:
-    # Create OpenAI client
-    client = create_openai_client(api_key)  # Pass api_key as an argument
+def create_pipeline(prompt_builder: PromptBuilder) -> AsyncPipeline:
+    """Create a pipeline that builds prompts and requests completions with the async OpenAI client."""
+    return AsyncPipeline(prompt_builder, model="gpt-4o", api_key=os.environ.get("OPENAI_API_KEY"),
+                         max_tokens=2048, temperature=0.7, system_prompt=SYSTEM_PROMPT)
 
+async def main() -> None:
     # Create a ContextManager instance
     context_manager = create_context_manager()
 
@@ -108,23 +72,22 @@ def main() -> None:
         # For demonstration purposes, assume a performance metric of 0.5
         context_optimizer.evaluate_relevance(example, "AI-Research", 0.5)
 
-    # Adjust the context examples based on their relevance
+    # Adjust the context examples based on their relevance and print the optimized ones
     context_optimizer.adjust_contexts()
+    print(f"Optimized context: {context_optimizer.get_optimized_context()}")
 
-    # Get the optimized context examples
-    optimized_context = context_optimizer.get_optimized_context()
-
-    # Build a prompt for the "AI-Research" context with a user input
     user_input = "Explain if In-Context Learning (ICL) with Retrieval-Augmented Generation (RAG) improves the accuracy of language models in providing relevant responses, particularly in real-time applications."
-    prompt = prompt_builder.build_prompt("AI-Research", user_input)
-    # Print the built prompt
-    print(prompt)
-
-    # Call OpenAI API
-    model = "gpt-4o"
-    max_tokens = 2048
-    temperature = 0.7
-    response = call_openai_api(model, prompt, max_tokens, temperature)
+    async with create_pipeline(prompt_builder) as pipeline:
+        # Build a prompt for the "AI-Research" context with the user input, then print it
+        prompt = await pipeline.build_prompt("AI-Research", user_input)
+        print(prompt)
+
+        # Request a completion for the prompt
+        try:
+            response = await pipeline.complete(prompt)
+        except Exception as e:
+            print(f"Error: {e}")
+            response = None
 
     # Print the model's response
     if response is not None:
@@ -134,4 +97,4 @@ def main() -> None:
         print("Failed to retrieve model response.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
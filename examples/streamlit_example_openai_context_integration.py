@@ -1,12 +1,12 @@
+import asyncio
 import os
 import streamlit as st
-import openai
-from openai import OpenAI
-from synapsense import ContextManager, PromptBuilder, ContextOptimizer
+from synapsense import AsyncPipeline, ContextManager, PromptBuilder
+
+SYSTEM_PROMPT = "You are an expert assistant specialized in Retrieval-Augmented Generation (RAG), In-Context Learning (ICL), and Retrieval-Based Context. Your role is to provide clear, accurate, and detailed explanations of these concepts based on recent academic research. You should assist users by clarifying the differences, applications, and benefits of these methods in large language models (LLMs). When answering, ensure to refer to the latest findings on these techniques, offering examples and insights from research papers to support your explanations."
 
 # Initialize the OpenAI API key using the environment variable
 api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=api_key)
 
 # Check if the OpenAI API key is defined
 if not api_key:
@@ -21,25 +21,16 @@ else:
         """Create a prompt builder instance."""
         return PromptBuilder(context_manager)
 
-    def call_openai_api(model: str, prompt: str, max_tokens: int, temperature: float) -> str:
-        """Call the OpenAI API to generate a response."""
-        try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert assistant specialized in Retrieval-Augmented Generation (RAG), In-Context Learning (ICL), and Retrieval-Based Context. Your role is to provide clear, accurate, and detailed explanations of these concepts based on recent academic research. You should assist users by clarifying the differences, applications, and benefits of these methods in large language models (LLMs). When answering, ensure to refer to the latest findings on these techniques, offering examples and insights from research papers to support your explanations."
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=max_tokens,
-                temperature=temperature
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            st.error(f"Error: {e}")
-            return None
+    async def generate_response(prompt_builder: PromptBuilder, context_type: str, user_input: str, model: str,
+                                max_tokens: int, temperature: float) -> str:
+        """Build a prompt and request a completion for it with the async OpenAI client."""
+        async with AsyncPipeline(prompt_builder, model=model, api_key=api_key, max_tokens=max_tokens,
+                                 temperature=temperature, system_prompt=SYSTEM_PROMPT) as pipeline:
+            try:
+                return await pipeline.run(context_type, user_input)
+            except Exception as e:
+                st.error(f"Error: {e}")
+                return None
 
     # Initialize the Context Manager and add default "AI-Research" context examples
     context_manager = create_context_manager()
@@ -93,11 +84,9 @@ else:
 
     # Generate and display response
     if user_input:
-        # Create PromptBuilder and pass both context and user input
+        # Create PromptBuilder, then build the prompt and call the OpenAI API with it
         prompt_builder = create_prompt_builder(context_manager)
-        prompt = prompt_builder.build_prompt(context_type, user_input)
-        
-        # Call OpenAI API with the generated prompt
-        response = call_openai_api(model="gpt-4o", prompt=prompt, max_tokens=150, temperature=0.7)
+        response = asyncio.run(generate_response(prompt_builder, context_type, user_input, model="gpt-4o",
+                                                 max_tokens=150, temperature=0.7))
         st.write("Response:")
         st.write(response)
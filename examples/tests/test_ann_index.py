@@ -0,0 +1,88 @@
+import os
+import random
+import tempfile
+import unittest
+from synapsense import ContextManager, PromptBuilder
+
+try:
+    import numpy
+    from synapsense.ann_index import LSHIndex, hash_embed
+except ImportError:
+    numpy = None
+
+
+@unittest.skipUnless(numpy, "NumPy is not installed")
+class TestANNIndex(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(5)
+        syllables = [consonant + vowel for consonant in "bdgklmnprst" for vowel in "aeiou"]
+        vocabulary = ["".join(rng.choices(syllables, k=3)) for _ in range(300)]
+        self.examples = [" ".join(rng.choices(vocabulary, k=rng.randint(4, 10))) for _ in range(2000)]
+        self.queries = [" ".join(rng.sample(rng.choice(self.examples).split(), 3)) for _ in range(50)]
+
+    def test_hash_embed(self):
+        vectors = hash_embed(["Running dogs", "running dog", "stock market", ""])
+        self.assertEqual(vectors.dtype, numpy.float32)
+        self.assertEqual(vectors.shape, (4, 256))
+        numpy.testing.assert_allclose(numpy.linalg.norm(vectors[:3], axis=1), 1.0, rtol=1e-5)
+        self.assertFalse(vectors[3].any())
+        # Inflections share most of their n-grams, unrelated texts do not
+        self.assertGreater(vectors[0] @ vectors[1], 0.6)
+        self.assertLess(abs(vectors[0] @ vectors[2]), 0.3)
+        numpy.testing.assert_array_equal(hash_embed(["running dog"]), vectors[1:2])
+
+    def test_rank_recall_against_exact_search(self):
+        index = LSHIndex(candidates=200)
+        index.add(self.examples[:1000])
+        index.add(self.examples[1000:])
+        hits = total = 0
+        for query in self.queries:
+            exact = index.exact_rank(query, top_k=5, threshold=0.0)
+            approximate = index.rank(query, top_k=5, threshold=0.0)
+            # Scores are exact, and only neighbours may be missed
+            for example_id, similarity in approximate:
+                self.assertAlmostEqual(similarity, float(index.vectors[example_id] @ hash_embed([query])[0]), places=5)
+            hits += len({i for i, _ in exact} & {i for i, _ in approximate})
+            total += len(exact)
+        self.assertGreater(hits / total, 0.8)
+
+    def test_save_and_memory_map(self):
+        index = LSHIndex(candidates=200)
+        index.add(self.examples)
+        with tempfile.TemporaryDirectory() as directory:
+            index.save(directory)
+            loaded = LSHIndex.load(os.path.join(directory))
+            self.assertIsInstance(loaded.vectors, numpy.memmap)
+            for query in self.queries[:10]:
+                self.assertEqual(loaded.rank(query, top_k=5), index.rank(query, top_k=5))
+            # Adding to a read-only index copies it into memory
+            loaded.add(["brand new example"])
+            self.assertEqual(len(loaded), len(self.examples) + 1)
+            self.assertEqual(loaded.exact_rank("brand new example", top_k=1)[0][0], len(self.examples))
+            del loaded
+
+    def test_ann_strategy(self):
+        cm = ContextManager()
+        cm.add_context("test", ["the cat sat on the mat", "dogs are running in the park"])
+        pb = PromptBuilder(cm, strategy="ann", similarity_threshold=0.2)
+        self.assertEqual(pb.find_relevant_examples(None, ["running", "dog"], context_name="test"),
+                         ["dogs are running in the park"])
+        # The index follows examples added later
+        cm.add_context("test", ["a running dog barks"])
+        self.assertEqual(pb.find_relevant_examples(None, ["running", "dog"], context_name="test")[0],
+                         "a running dog barks")
+
+    def test_default_threshold_of_each_strategy(self):
+        cm = ContextManager()
+        cm.add_context("c", ["the patient reported a fever and headache", "invoice overdue"])
+        self.assertEqual(PromptBuilder(cm).similarity_threshold, 0.5)
+        self.assertEqual(PromptBuilder(cm, strategy="ann").similarity_threshold, 0.2)
+        self.assertEqual(PromptBuilder(cm, strategy="ann", similarity_threshold=0.6).similarity_threshold, 0.6)
+        # The cosine similarity of this match is below the Jaccard default of 0.5
+        prompt = PromptBuilder(cm, strategy="ann").build_prompt("c", "patient fever")
+        self.assertEqual(prompt.count("Example:"), 1)
+        self.assertIn("Example: the patient reported a fever and headache", prompt)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from synapsense import AsyncPipeline, ContextManager, PromptBuilder
+
+try:
+    import openai
+except ImportError:
+    openai = None
+
+
+class StubCompletionServer(ThreadingHTTPServer):
+    """A local stand-in for an OpenAI-compatible chat completions endpoint."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubCompletionHandler)
+        self.lock = threading.Lock()
+        self.failures = 0  # number of requests to answer with a server error
+        self.delay = 0.0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class StubCompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections alive, so the client can pool them
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            fail = server.failures > 0
+            server.failures -= fail
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+
+        if fail:
+            payload, status = {"error": {"message": "overloaded", "type": "server_error"}}, 500
+        else:
+            content = "echo: " + body["messages"][-1]["content"].splitlines()[-2]
+            payload, status = {
+                "id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+            }, 200
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client timed out and went away
+
+    def log_message(self, *args):
+        pass
+
+
+@unittest.skipUnless(openai, "openai is not installed")
+class TestAsyncPipeline(unittest.TestCase):
+    def setUp(self):
+        self.server = StubCompletionServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        cm = ContextManager()
+        cm.add_context("medical", ["patient fever headache", "patient chest pain"])
+        self.pb = PromptBuilder(cm)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def run_pipeline(self, user_inputs, **kwargs):
+        async def main():
+            async with AsyncPipeline(self.pb, api_key="test", base_url=self.server.base_url,
+                                     backoff=0.01, **kwargs) as pipeline:
+                return await pipeline.run_many("medical", user_inputs)
+        return asyncio.run(main())
+
+    def test_run_many_keeps_order_and_bounds_concurrency(self):
+        self.server.delay = 0.05
+        user_inputs = [f"patient fever question{i}" for i in range(12)]
+        completions = self.run_pipeline(user_inputs, max_concurrency=3)
+
+        self.assertEqual(completions, [f"echo: User Input: {user_input}" for user_input in user_inputs])
+        self.assertLessEqual(self.server.max_in_flight, 3)
+
+    def test_retries_server_errors(self):
+        self.server.failures = 2
+        self.assertEqual(self.run_pipeline(["patient fever"]), ["echo: User Input: patient fever"])
+        self.assertEqual(self.server.requests, 3)
+
+    def test_timeout_is_retried_then_raised(self):
+        self.server.delay = 0.5
+        with self.assertRaises(asyncio.TimeoutError):
+            self.run_pipeline(["patient fever"], timeout=0.05, max_retries=1)
+        self.assertEqual(self.server.requests, 2)
+
+    def test_pipeline_runs_on_successive_event_loops(self):
+        pipeline = AsyncPipeline(self.pb, api_key="test", base_url=self.server.base_url, max_concurrency=1)
+        for _ in range(2):
+            # Each asyncio.run has its own event loop, and the concurrency limit is contended
+            completions = asyncio.run(pipeline.run_many("medical", ["patient fever", "patient pain"]))
+            self.assertEqual(completions, ["echo: User Input: patient fever", "echo: User Input: patient pain"])
+
+
+if __name__ == '__main__':
+    unittest.main()
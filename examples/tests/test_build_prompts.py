@@ -0,0 +1,50 @@
+import unittest
+from synapsense import ContextManager, PromptBuilder
+
+
+class TestBuildPrompts(unittest.TestCase):
+    def setUp(self):
+        self.cm = ContextManager()
+        self.cm.add_context("medical", [
+            "patient fever headache",
+            "patient diabetes treatment",
+            "patient chest pain breath",
+            "patient hypertension medication",
+        ])
+        self.user_inputs = [
+            "patient fever headache",
+            "chest pain breath",
+            "unrelated question",
+            "patient diabetes treatment",
+        ] * 5
+
+    def test_build_prompts_in_process(self):
+        pb = PromptBuilder(self.cm)
+        expected = [pb.build_prompt("medical", user_input) for user_input in self.user_inputs]
+        self.assertEqual(pb.build_prompts("medical", self.user_inputs), expected)
+
+    def test_build_prompts_on_worker_pool(self):
+        pb = PromptBuilder(self.cm)
+        expected = [pb.build_prompt("medical", user_input) for user_input in self.user_inputs]
+        self.assertEqual(pb.build_prompts("medical", self.user_inputs, workers=2), expected)
+        pb.close()
+
+    def test_worker_pool_is_reused_until_the_context_changes(self):
+        with PromptBuilder(self.cm) as pb:
+            pb.build_prompts("medical", self.user_inputs, workers=2)
+            pool = pb._pool
+            # Settings travel with each chunk, so changing them does not need a new pool
+            pb.top_k = 1
+            self.assertEqual(pb.build_prompts("medical", self.user_inputs, workers=2),
+                             [pb.build_prompt("medical", user_input) for user_input in self.user_inputs])
+            self.assertIs(pb._pool, pool)
+
+            self.cm.add_context("medical", ["patient fever cough"])
+            self.assertEqual(pb.build_prompts("medical", ["patient fever cough"], workers=2),
+                             [pb.build_prompt("medical", "patient fever cough")])
+            self.assertIsNot(pb._pool, pool)
+        self.assertIsNone(pb._pool)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import pickle
+import random
+import unittest
+from synapsense import ContextManager, PromptBuilder
+from synapsense.compact import CompactExamples, Vocabulary
+
+
+class TestCompactMode(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.words = [f"w{i}" for i in range(40)]
+        self.examples = [" ".join(rng.choices(self.words, k=rng.randint(0, 8))) for _ in range(300)]
+        self.examples += ["  tabs\tand\nnewlines ", "accents été"]
+        self.queries = [rng.choices(self.words, k=rng.randint(1, 3)) + ["unknown"] * rng.randint(0, 1)
+                        for _ in range(30)]
+        self.plain = ContextManager()
+        self.compact = ContextManager(compact=True)
+        for cm in (self.plain, self.compact):
+            cm.add_context("test", self.examples[:100])
+            cm.add_context("test", self.examples[100:])
+            cm.add_context("other", self.examples[:10])
+
+    def test_examples_round_trip(self):
+        examples = self.compact.get_context("test")
+        self.assertIsInstance(examples, CompactExamples)
+        self.assertEqual(examples, self.examples)
+        self.assertEqual(list(examples), self.examples)
+        self.assertEqual(examples[-1], "accents été")
+        self.assertEqual(examples[3:6], self.examples[3:6])
+        self.assertEqual(self.compact.get_examples("test", [301, 0]), [self.examples[301], self.examples[0]])
+        self.assertEqual(pickle.loads(pickle.dumps(examples)), self.examples)
+        with self.assertRaises(IndexError):
+            examples[len(self.examples)]
+
+    def test_rankings_match_the_plain_index(self):
+        for keywords in self.queries:
+            for strategy in ("inverted", "scan"):
+                self.assertEqual(self.compact.rank_examples("test", keywords, 5, 0.1, strategy),
+                                 self.plain.rank_examples("test", keywords, 5, 0.1, strategy))
+
+    def test_token_sets_and_counts_match_the_plain_index(self):
+        self.assertEqual(list(self.compact.get_token_sets("test")), self.plain.get_token_sets("test"))
+        self.assertEqual(self.compact.get_token_sets("test")[-1], frozenset(["accents", "été"]))
+        self.assertEqual(self.compact.get_token_counts("test", [0, 301]),
+                         self.plain.get_token_counts("test", [0, 301]))
+
+    def test_vocabulary_is_shared_by_contexts(self):
+        self.assertEqual(len(self.compact.vocabulary), len({t for e in self.examples for t in e.split()}))
+
+    def test_prompts_match(self):
+        for keywords in self.queries[:5]:
+            user_input = " ".join(keywords)
+            self.assertEqual(PromptBuilder(self.compact, similarity_threshold=0.1).build_prompt("test", user_input),
+                             PromptBuilder(self.plain, similarity_threshold=0.1).build_prompt("test", user_input))
+
+    def test_search_and_filter(self):
+        self.assertEqual(self.compact.search_context("tabs"), self.plain.search_context("tabs"))
+        self.assertEqual(self.compact.filter_contexts(lambda e: "été" in e), {"test": ["accents été"]})
+
+
+class TestVocabulary(unittest.TestCase):
+    def test_intern_returns_sorted_ids(self):
+        vocabulary = Vocabulary()
+        self.assertEqual(vocabulary.intern(["b", "a"]), [0, 1])
+        self.assertEqual(vocabulary.intern(["c", "b"]), [0, 2])
+        self.assertEqual(vocabulary.lookup(["c", "z", "a"]), [2, 1])
+        self.assertEqual(vocabulary.tokens[2], "c")
+
+
+if __name__ == '__main__':
+    unittest.main()
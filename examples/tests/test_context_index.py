@@ -0,0 +1,85 @@
+import random
+import unittest
+from synapsense import ContextManager, PromptBuilder
+
+
+class TestContextIndex(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        vocabulary = [f"word{i}" for i in range(40)]
+        self.examples = [" ".join(rng.choices(vocabulary, k=rng.randint(1, 6))) for _ in range(500)]
+        self.queries = [rng.sample(vocabulary, rng.randint(1, 5)) for _ in range(200)]
+
+    def test_index_matches_linear_scan(self):
+        cm = ContextManager()
+        cm.add_context("test", self.examples[:250])
+        cm.add_context("test", self.examples[250:])
+        pb = PromptBuilder(cm)
+
+        for keywords in self.queries:
+            self.assertEqual(
+                pb.find_relevant_examples(None, keywords, context_name="test"),
+                pb.find_relevant_examples(self.examples, keywords),
+            )
+
+    def test_top_k_and_threshold(self):
+        cm = ContextManager()
+        cm.add_context("test", self.examples)
+        pb = PromptBuilder(cm, top_k=10, similarity_threshold=0.2)
+
+        for keywords in self.queries:
+            expected = pb.find_relevant_examples(self.examples, keywords)
+            self.assertLessEqual(len(expected), 10)
+            for strategy in ("inverted", "scan"):
+                pb.strategy = strategy
+                self.assertEqual(pb.find_relevant_examples(None, keywords, context_name="test"), expected)
+
+        with self.assertRaises(ValueError):
+            PromptBuilder(cm, similarity_threshold=-0.1)
+
+    def test_scan_matches_inverted_index(self):
+        cm = ContextManager()
+        cm.add_context("test", self.examples)
+
+        for keywords in self.queries:
+            self.assertEqual(
+                cm.rank_examples("test", keywords, strategy="scan"),
+                cm.rank_examples("test", keywords, strategy="inverted"),
+            )
+
+    def test_cached_token_sets(self):
+        cm = ContextManager()
+        cm.add_context("test", self.examples)
+        pb = PromptBuilder(cm)
+
+        token_sets = cm.get_token_sets("test")
+        self.assertEqual(len(token_sets), len(self.examples))
+        for example, tokens in zip(self.examples, token_sets):
+            self.assertIsInstance(tokens, frozenset)
+            self.assertEqual(pb.calculate_similarity(tokens, self.queries[0]),
+                             pb.calculate_similarity(example, self.queries[0]))
+
+        cm.remove_context("test")
+        self.assertEqual(cm.get_token_sets("test"), [])
+
+    def test_index_follows_context_changes(self):
+        cm = ContextManager()
+        cm.add_context("test", ["alpha beta"])
+        self.assertEqual(cm.rank_examples("test", ["alpha", "beta"]), [(0, 1.0)])
+
+        cm.contexts["test"].append("alpha beta")
+        self.assertEqual(cm.rank_examples("test", ["alpha", "beta"]), [(0, 1.0), (1, 1.0)])
+
+        cm.remove_context("test")
+        self.assertEqual(cm.rank_examples("test", ["alpha", "beta"]), [])
+
+    def test_add_context_copies_examples(self):
+        cm = ContextManager()
+        examples = ["alpha beta"]
+        cm.add_context("test", examples)
+        cm.add_context("test", ["gamma"])
+        self.assertEqual(examples, ["alpha beta"])
+
+
+if __name__ == '__main__':
+    unittest.main()
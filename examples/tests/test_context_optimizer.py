@@ -0,0 +1,161 @@
+import heapq
+import random
+import statistics
+import unittest
+from unittest import mock
+from synapsense import ContextOptimizer
+from synapsense.online_stats import IncrementalTopK
+
+
+def overlap_scorer(context, query):
+    return sum(query in example for example in context) / len(context)
+
+
+class TestContextOptimizer(unittest.TestCase):
+    def test_adjust_contexts_keeps_top_k(self):
+        co = ContextOptimizer(top_k=3)
+        for i, metric in enumerate([0.1, 0.9, 0.5, 0.9, 0.7, 0.2]):
+            co.evaluate_relevance(f"example{i}", "query", metric)
+        co.adjust_contexts()
+        # Ties keep the order in which the examples were first evaluated
+        self.assertEqual(co.get_optimized_context(), ["example1", "example3", "example4"])
+
+    def test_running_statistics(self):
+        co = ContextOptimizer(ema_alpha=0.5)
+        values = [0.2, 0.8, 0.5, 0.9]
+        for i, value in enumerate(values):
+            co.evaluate_relevance("example", f"query{i % 2}", value)
+
+        stats = co.get_stats("example")
+        self.assertEqual(stats["count"], 4)
+        self.assertAlmostEqual(stats["mean"], statistics.mean(values))
+        self.assertAlmostEqual(stats["variance"], statistics.variance(values))
+        self.assertAlmostEqual(stats["ema"], ((0.2 * 0.5 + 0.8 * 0.5) * 0.5 + 0.5 * 0.5) * 0.5 + 0.9 * 0.5)
+        self.assertEqual(stats["last"], 0.9)
+        self.assertAlmostEqual(co.get_stats("example", "query1")["mean"], (0.8 + 0.9) / 2)
+        self.assertIsNone(co.get_stats("example", "query2"))
+
+    def test_incremental_top_k_matches_full_selection(self):
+        rng = random.Random(5)
+        top = IncrementalTopK(5)
+        scores = {}
+        for _ in range(3000):
+            key = f"example{rng.randrange(40)}"
+            if rng.random() < 0.1:
+                top.remove(key)
+                scores.pop(key, None)
+            else:
+                score = rng.randint(0, 10) / 10
+                top.update(key, score)
+                scores[key] = score
+            self.assertEqual(top.top(), heapq.nlargest(5, scores, key=scores.get))
+
+    def test_memory_cap_drops_cold_entries(self):
+        co = ContextOptimizer(top_k=2, max_entries=3)
+        co.evaluate_relevance("a", "q1", 0.9)
+        co.evaluate_relevance("b", "q1", 0.8)
+        co.evaluate_relevance("a", "q2", 0.9)
+        co.evaluate_relevance("c", "q1", 0.1)  # drops ("a", "q1"); "a" still has a pair
+        co.evaluate_relevance("c", "q2", 0.1)  # drops ("b", "q1"), the last pair of "b"
+
+        self.assertEqual(set(co.example_performance), {"a", "c"})
+        self.assertIsNone(co.get_stats("b"))
+        co.adjust_contexts()
+        self.assertEqual(co.get_optimized_context(), ["a", "c"])
+
+    def assert_same_statistics(self, batch, sequential):
+        self.assertEqual(batch.get_optimized_context(), sequential.get_optimized_context())
+        self.assertEqual(list(batch.example_performance), list(sequential.example_performance))
+        self.assertEqual(list(batch._pair_stats), list(sequential._pair_stats))
+        for example in sequential.example_performance:
+            for name, value in sequential.get_stats(example).items():
+                self.assertAlmostEqual(batch.get_stats(example)[name], value)
+        for example, query in sequential._pair_stats:
+            for name, value in sequential.get_stats(example, query).items():
+                self.assertAlmostEqual(batch.get_stats(example, query)[name], value)
+
+    def test_evaluate_many_matches_evaluate_relevance(self):
+        rng = random.Random(9)
+        examples = [f"example{rng.randrange(15)}" for _ in range(400)]
+        queries = [f"query{rng.randrange(4)}" for _ in range(400)]
+        metrics = [rng.randint(0, 20) / 20 for _ in range(400)]
+
+        sequential = ContextOptimizer(top_k=5, ema_alpha=0.3)
+        sequential.evaluate_relevance("example3", "query0", 0.5)
+        for example, query, metric in zip(examples, queries, metrics):
+            sequential.evaluate_relevance(example, query, metric)
+        sequential.adjust_contexts()
+
+        for numpy_available in (True, False):
+            batch = ContextOptimizer(top_k=5, ema_alpha=0.3)
+            batch.evaluate_relevance("example3", "query0", 0.5)
+            with mock.patch.dict("sys.modules", {} if numpy_available else {"numpy": None}):
+                batch.evaluate_many(examples, metrics, queries)
+            self.assert_same_statistics(batch, sequential)
+
+    def test_evaluate_many_shared_query(self):
+        sequential = ContextOptimizer()
+        for example, metric in [(1, 0.5), (2, 0.7), (1, 0.9)]:
+            sequential.evaluate_relevance(example, "query", metric)
+        sequential.adjust_contexts()
+
+        batch = ContextOptimizer()
+        batch.evaluate_many([1, 2, 1], [0.5, 0.7, 0.9], queries="query")
+        self.assert_same_statistics(batch, sequential)
+
+        with self.assertRaises(ValueError):
+            batch.evaluate_many([1, 2], [0.5])
+
+    def test_experiment_successive_halving(self):
+        candidates = [["a b", "c d"], ["a b", "a c"], ["x y", "z w"], ["a", "a b"]]
+        queries = ["a", "b", "c"] * 20
+        co = ContextOptimizer()
+        co.contexts = ["kept"]
+        results = co.experiment(candidates, overlap_scorer, queries, min_evaluations=3, workers=2)
+
+        self.assertEqual(co.contexts, ["kept"])
+        self.assertEqual([result["candidate"] for result in results], [0, 1, 2, 3])
+        winner = [result for result in results if result["eliminated_in_round"] is None]
+        self.assertEqual(len(winner), 1)
+        # Losers stop being scored early, the winner is scored on every query
+        self.assertEqual(winner[0]["evaluations"], len(queries))
+        self.assertTrue(all(result["evaluations"] == 3 for result in results if result["eliminated_in_round"] == 0))
+        for result, candidate in zip(results, candidates):
+            expected = statistics.fmean(overlap_scorer(candidate, query) for query in queries[:result["evaluations"]])
+            self.assertAlmostEqual(result["mean_score"], expected)
+            self.assertGreaterEqual(result["wall_time"], 0.0)
+
+    def test_experiment_executors_agree(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        candidates = [[f"w{i} w{j}" for j in range(i, i + 3)] for i in range(6)]
+        queries = [f"w{i % 8}" for i in range(40)]
+        co = ContextOptimizer()
+        expected = co.experiment(candidates, overlap_scorer, queries, executor="thread")
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            given = co.experiment(candidates, overlap_scorer, queries, executor=executor)
+        processes = co.experiment(candidates, overlap_scorer, queries, executor="process", workers=2)
+        for results in (given, processes):
+            self.assertEqual([(r["mean_score"], r["evaluations"], r["eliminated_in_round"]) for r in results],
+                             [(r["mean_score"], r["evaluations"], r["eliminated_in_round"]) for r in expected])
+
+        with self.assertRaises(ValueError):
+            co.experiment(candidates, overlap_scorer, queries, executor="fiber")
+
+    def test_experiment_picks_a_winner_when_queries_run_out(self):
+        candidates = [["a b"], ["a"], ["b"], ["a c"], ["x"], ["a b c"], ["y"], ["z"]]
+        co = ContextOptimizer()
+        # 8 candidates are halved to 4 after 2 queries, and the last 4 queries end the experiment
+        results = co.experiment(candidates, overlap_scorer, ["a", "b", "a", "b", "a", "b"], min_evaluations=2)
+        winners = [result for result in results if result["eliminated_in_round"] is None]
+        self.assertEqual(len(winners), 1)
+        finalists = [result for result in results if result["eliminated_in_round"] == 1]
+        self.assertEqual(len(finalists), 3)
+        self.assertTrue(all(winners[0]["mean_score"] >= result["mean_score"] for result in finalists))
+
+        with self.assertRaises(ValueError):
+            co.experiment(candidates, overlap_scorer, ["a"], min_evaluations=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
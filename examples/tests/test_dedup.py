@@ -0,0 +1,80 @@
+import sys
+import unittest
+from unittest import mock
+from synapsense import ContextManager
+from synapsense.dedup import MinHashLSH
+
+
+class TestDeduplication(unittest.TestCase):
+    def setUp(self):
+        self.cm = ContextManager(dedup_threshold=0.8)
+        self.cm.add_context("test", [
+            "one two three four five six seven eight nine ten",
+            "alpha beta gamma delta",
+        ])
+
+    def test_near_duplicates_are_dropped(self):
+        duplicate = "one two three four five six seven eight nine ten eleven"
+        self.cm.add_context("test", [duplicate, "alpha beta gamma epsilon"])
+        self.assertEqual(self.cm.get_context("test"), [
+            "one two three four five six seven eight nine ten",
+            "alpha beta gamma delta",
+            "alpha beta gamma epsilon",
+        ])
+        self.assertEqual(self.cm.dedup_stats, {"checked": 4, "duplicates": 1, "bytes_saved": sys.getsizeof(duplicate)})
+
+    def test_duplicates_within_one_list_keep_the_first_copy(self):
+        self.cm.add_context("other", ["x y z w", "x y z w", "w z y x", "x y"])
+        self.assertEqual(self.cm.get_context("other"), ["x y z w", "x y"])
+        self.assertEqual(self.cm.rank_examples("other", ["x", "y"], top_k=2, threshold=0.1), [(1, 1.0), (0, 0.5)])
+
+    def test_contexts_are_deduplicated_separately(self):
+        self.cm.add_context("other", ["alpha beta gamma delta"])
+        self.assertEqual(self.cm.get_context("other"), ["alpha beta gamma delta"])
+
+    def test_examples_added_outside_add_context_are_seen(self):
+        self.cm.contexts["test"].append("red green blue")
+        self.cm.add_context("test", ["blue green red"])
+        self.assertEqual(len(self.cm.get_context("test")), 3)
+
+    def test_removed_contexts_are_forgotten(self):
+        self.cm.remove_context("test")
+        self.cm.add_context("test", ["alpha beta gamma delta"])
+        self.assertEqual(self.cm.get_context("test"), ["alpha beta gamma delta"])
+
+    def test_empty_examples(self):
+        self.cm.add_context("test", ["", " "])
+        self.assertEqual(self.cm.get_context("test")[2:], [""])
+
+    def test_disabled_by_default(self):
+        cm = ContextManager()
+        cm.add_context("test", ["a b", "a b"])
+        self.assertEqual(len(cm.get_context("test")), 2)
+        with self.assertRaises(ValueError):
+            ContextManager(dedup_threshold=0)
+
+
+class TestMinHashLSH(unittest.TestCase):
+    def test_signatures_do_not_depend_on_numpy(self):
+        lsh = MinHashLSH(0.9)
+        token_sets = [frozenset("the quick brown fox".split()), frozenset(), frozenset(["fox"])]
+        with mock.patch.dict(sys.modules, {"numpy": None}):
+            pure = lsh.signatures(token_sets)
+        self.assertEqual(lsh.signatures(token_sets), pure)
+        self.assertEqual(len(pure[0]), lsh.num_perm // lsh.rows)
+
+    def test_near_duplicates_are_candidates(self):
+        lsh = MinHashLSH(0.8)
+        base = [f"token{i}" for i in range(50)]
+        examples = [frozenset(base[:48]), frozenset(base[2:])]
+        unrelated = [frozenset(f"other{i}-{j}" for j in range(48)) for i in range(100)]
+        for example_id, signature in enumerate(lsh.signatures(unrelated + examples[:1])):
+            lsh.insert(example_id, signature)
+        # The examples share 46 of 50 tokens, a Jaccard similarity of 0.92: they are missed
+        # with a probability below 1e-7
+        self.assertEqual(lsh.candidates(lsh.signatures(examples[1:])[0]), {100})
+        self.assertEqual(len(lsh), 101)
+
+
+if __name__ == '__main__':
+    unittest.main()
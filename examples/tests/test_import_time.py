@@ -0,0 +1,28 @@
+import subprocess
+import sys
+import unittest
+
+# Modules that importing synapsense must not load: optional dependencies, standard library
+# modules that are slow to import and only needed by some features, and the alternative backends.
+HEAVY_MODULES = ("nltk", "openai", "numpy", "tiktoken", "sqlite3", "multiprocessing", "asyncio",
+                 "concurrent.futures", "json", "synapsense.sqlite_context_manager", "synapsense.sharded")
+
+
+class TestImportTime(unittest.TestCase):
+    def import_synapsense(self, code=""):
+        return subprocess.run(
+            [sys.executable, "-c", "import synapsense\n" + code],
+            capture_output=True, text=True, check=True,
+        )
+
+    def test_no_heavy_modules_imported(self):
+        result = self.import_synapsense(
+            "import sys\n"
+            "synapsense.PromptBuilder(synapsense.ContextManager()).extract_keywords('the patient')\n"
+            f"print(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import json
+import os
+import tempfile
+import unittest
+from synapsense import ContextManager, SQLiteContextManager
+
+
+class TestIngest(unittest.TestCase):
+    def setUp(self):
+        self.records = [{"context": f"context{i % 3}", "example": f"example number {i}"} for i in range(25)]
+        self.expected = ContextManager()
+        for record in self.records:
+            self.expected.add_context(record["context"], [record["example"]])
+
+    def test_ingest_iterable(self):
+        cm = ContextManager()
+        progress = []
+        stats = cm.ingest(iter(self.records), chunk_size=4, progress=lambda rows, rate: progress.append(rows))
+
+        self.assertEqual(stats["rows"], 25)
+        self.assertEqual(progress, [4, 8, 12, 16, 20, 24, 25])
+        self.assertEqual(cm.contexts, self.expected.contexts)
+        self.assertEqual(cm.rank_examples("context1", ["example", "number", "4"]),
+                         self.expected.rank_examples("context1", ["example", "number", "4"]))
+
+    def test_ingest_jsonl_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "examples.jsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                for record in self.records:
+                    f.write(json.dumps(record) + "\n")
+
+            cm = ContextManager()
+            self.assertEqual(cm.ingest(path, chunk_size=10)["rows"], 25)
+            self.assertEqual(cm.contexts, self.expected.contexts)
+
+            sqlite_cm = SQLiteContextManager(os.path.join(directory, "contexts.db"))
+            try:
+                sqlite_cm.ingest(path, chunk_size=10)
+                self.assertEqual(sqlite_cm.contexts, self.expected.contexts)
+            finally:
+                sqlite_cm.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
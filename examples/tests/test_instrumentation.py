@@ -0,0 +1,104 @@
+import json
+import pickle
+import unittest
+from synapsense import ContextManager, Instrumentation, Metrics, PromptBuilder, PromptCache
+
+
+class Recorder(Instrumentation):
+    def __init__(self):
+        self.calls = []
+
+    def timing(self, stage, seconds):
+        self.calls.append(("timing", stage))
+
+    def observe(self, name, value):
+        self.calls.append(("observe", name, value))
+
+    def increment(self, name, amount=1):
+        self.calls.append(("increment", name, amount))
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.examples = ["patient fever headache", "patient chest pain", "fever cough", "invoice overdue"]
+
+    def test_hooks_see_every_stage(self):
+        recorder = Recorder()
+        cm = ContextManager(instrumentation=recorder)
+        cm.add_context("medical", self.examples)
+        pb = PromptBuilder(cm, similarity_threshold=0.1, cache=PromptCache(), instrumentation=recorder)
+        prompt = pb.build_prompt("medical", "patient fever")
+        self.assertEqual(prompt, PromptBuilder(self._plain(), similarity_threshold=0.1)
+                         .build_prompt("medical", "patient fever"))
+        self.assertEqual(recorder.calls, [
+            ("timing", "extract_keywords"),
+            ("increment", "cache_misses", 1),
+            # Three examples share a keyword with the query
+            ("observe", "candidates_scored", 3),
+            ("timing", "rank_examples"),
+            ("timing", "find_relevant_examples"),
+            ("observe", "examples_returned", 3),
+            ("timing", "generate_prompt"),
+            ("timing", "build_prompt"),
+        ])
+        recorder.calls.clear()
+        pb.build_prompt("medical", "fever patient")
+        self.assertIn(("increment", "cache_hits", 1), recorder.calls)
+        self.assertNotIn(("timing", "rank_examples"), recorder.calls)
+
+    def test_candidates_of_each_strategy(self):
+        recorder = Recorder()
+        cm = ContextManager(instrumentation=recorder, compact=True)
+        cm.add_context("medical", self.examples)
+        cm.rank_examples("medical", ["fever"], 3, 0.0, "inverted")
+        cm.rank_examples("medical", ["fever"], 3, 0.0, "scan")
+        cm.rank_examples("missing", ["fever"])
+        observed = [call[2] for call in recorder.calls if call[0] == "observe"]
+        self.assertEqual(observed, [2, 4])
+        self.assertEqual(recorder.calls.count(("timing", "rank_examples")), 3)
+
+    def test_metrics_export(self):
+        metrics = Metrics()
+        cm = ContextManager(instrumentation=metrics)
+        cm.add_context("medical", self.examples)
+        pb = PromptBuilder(cm, similarity_threshold=0.1, cache=PromptCache(), instrumentation=metrics)
+        for user_input in ["patient fever", "fever patient", "invoice"]:
+            pb.build_prompt("medical", user_input)
+
+        snapshot = json.loads(metrics.to_json())
+        self.assertEqual(snapshot["counters"], {"cache_misses": 2, "cache_hits": 1})
+        self.assertEqual(snapshot["stages"]["build_prompt"]["count"], 3)
+        self.assertEqual(snapshot["stages"]["rank_examples"]["count"], 2)
+        self.assertEqual(snapshot["histograms"]["examples_returned"]["sum"], 7)
+        self.assertEqual(snapshot["histograms"]["candidates_scored"]["buckets"]["+Inf"], 2)
+        self.assertEqual(snapshot["histograms"]["candidates_scored"]["p50"], 1)
+
+        text = metrics.to_prometheus()
+        self.assertIn("# TYPE synapsense_stage_seconds histogram", text)
+        self.assertIn('synapsense_stage_seconds_count{stage="generate_prompt"} 3', text)
+        self.assertIn('synapsense_examples_returned_bucket{le="2"} 1', text)
+        self.assertIn('synapsense_examples_returned_bucket{le="+Inf"} 3', text)
+        self.assertIn("synapsense_examples_returned_sum 7", text)
+        self.assertIn("synapsense_cache_hits_total 1", text)
+
+        # Copies sent to worker processes start empty
+        self.assertEqual(pickle.loads(pickle.dumps(metrics)).snapshot(),
+                         {"stages": {}, "histograms": {}, "counters": {}})
+        metrics.reset()
+        self.assertEqual(metrics.to_prometheus(), "")
+
+    def test_disabled_by_default(self):
+        cm = self._plain()
+        pb = PromptBuilder(cm, similarity_threshold=0.1)
+        self.assertIsNone(cm.instrumentation)
+        self.assertIsNone(pb.instrumentation)
+        self.assertIsNone(cm.merge_contexts(ContextManager()).instrumentation)
+
+    def _plain(self):
+        cm = ContextManager()
+        cm.add_context("medical", self.examples)
+        return cm
+
+
+if __name__ == '__main__':
+    unittest.main()
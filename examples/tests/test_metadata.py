@@ -0,0 +1,115 @@
+import random
+import unittest
+from synapsense import ContextManager
+from synapsense.metadata_index import MetadataIndex
+
+
+class TestMetadata(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.examples = [f"example {i}" for i in range(200)]
+        self.metadata = [None if i % 7 == 0 else
+                         {"lang": rng.choice(["pt", "en", "es"]), "tags": rng.sample(["faq", "billing", "api"], 2),
+                          "timestamp": i} for i in range(200)]
+        self.cm = ContextManager()
+        self.cm.add_context("plain", ["no metadata"])
+        self.cm.add_context("test", self.examples[:50])
+        self.cm.add_context("test", self.examples[50:], self.metadata[50:])
+
+    def expected(self, predicate):
+        return [example for example, record in zip(self.examples, self.metadata)
+                if example in self.examples[50:] and record and predicate(record)]
+
+    def test_where_matches_the_metadata(self):
+        self.assertEqual(self.cm.filter_contexts(where={"lang": "pt"}),
+                         {"test": self.expected(lambda r: r["lang"] == "pt")})
+        self.assertEqual(self.cm.filter_contexts(where={"lang": ("pt", "es"), "tags": "faq"}),
+                         {"test": self.expected(lambda r: r["lang"] in ("pt", "es") and "faq" in r["tags"])})
+        self.assertEqual(self.cm.filter_contexts(where={"timestamp": lambda t: t >= 150, "tags": ["api"]}),
+                         {"test": self.expected(lambda r: r["timestamp"] >= 150 and "api" in r["tags"])})
+        self.assertEqual(self.cm.filter_contexts(where={"lang": "fr"}), {})
+        self.assertEqual(self.cm.filter_contexts(where={"missing": 1}), {})
+
+    def test_callable_filter_still_works(self):
+        self.assertEqual(self.cm.filter_contexts(lambda e: e.endswith("7")),
+                         {"test": [e for e in self.examples if e.endswith("7")]})
+        self.assertEqual(self.cm.filter_contexts(lambda e: e.endswith("7"), where={"lang": "en"}),
+                         {"test": [e for e in self.expected(lambda r: r["lang"] == "en") if e.endswith("7")]})
+
+    def test_lazy_variant(self):
+        results = self.cm.iter_filter_contexts(where={"tags": "billing"})
+        self.assertNotIsInstance(results, (list, dict))
+        self.assertEqual(next(results)[0], "test")
+        self.assertEqual(sum(1 for _ in self.cm.iter_filter_contexts()), 201)
+
+    def test_get_metadata(self):
+        self.assertEqual(self.cm.get_metadata("test", [0, 51, 70]), [None, self.metadata[51], None])
+        self.assertEqual(self.cm.get_metadata("plain", [0]), [None])
+        with self.assertRaises(KeyError):
+            self.cm.get_metadata("missing", [0])
+
+    def test_metadata_follows_deduplication_and_ingest(self):
+        cm = ContextManager(dedup_threshold=0.9)
+        cm.add_context("test", ["alpha beta", "alpha beta", "gamma"], [{"n": 1}, {"n": 2}, {"n": 3}])
+        self.assertEqual(cm.get_metadata("test", [0, 1]), [{"n": 1}, {"n": 3}])
+        cm = ContextManager()
+        cm.ingest([{"context": "a", "example": "one"}, {"context": "a", "example": "two", "metadata": {"lang": "pt"}}])
+        self.assertEqual(cm.filter_contexts(where={"lang": "pt"}), {"a": ["two"]})
+        with self.assertRaises(ValueError):
+            cm.add_context("a", ["three"], [])
+
+    def test_rejected_metadata_leaves_the_index_unchanged(self):
+        before = self.cm.filter_contexts(where={"lang": "pt"})
+        for metadata in ([{"lang": "pt"}, {"lang": {"nested": 1}}], [{"lang": "pt"}, {"tags": [["faq"]]}],
+                         [{"lang": "pt"}, "pt"]):
+            with self.assertRaises(TypeError):
+                self.cm.add_context("test", ["first", "second"], metadata)
+            with self.assertRaises(TypeError):
+                self.cm.add_context("new", ["first", "second"], metadata)
+        self.assertNotIn("new", self.cm.list_contexts())
+        # The examples added next take the ids the rejected ones would have had
+        self.cm.add_context("test", ["no metadata"])
+        self.assertEqual(self.cm.filter_contexts(where={"lang": "pt"}), before)
+        self.assertEqual(len(self.cm.get_context("test")), 201)
+
+    def test_overlay_filters_every_layer(self):
+        tenant = ContextManager()
+        tenant.add_context("test", ["tenant example"], [{"lang": "pt"}])
+        overlay = self.cm.merge_contexts(tenant)
+        self.assertEqual(overlay.filter_contexts(where={"lang": "pt"}),
+                         {"test": self.expected(lambda r: r["lang"] == "pt") + ["tenant example"]})
+        self.assertEqual(overlay.get_metadata("test", [200, 51]), [{"lang": "pt"}, self.metadata[51]])
+
+    def test_materialize_keeps_metadata(self):
+        tenant = ContextManager()
+        tenant.add_context("test", ["tenant example"], [{"lang": "pt", "tags": ["faq"]}])
+        tenant.add_context("tenant only", ["no metadata"])
+        overlay = self.cm.merge_contexts(tenant)
+        merged = overlay.materialize()
+        self.assertEqual(merged.get_metadata("test", range(201)), overlay.get_metadata("test", range(201)))
+        self.assertEqual(merged.filter_contexts(where={"lang": "pt", "tags": "faq"}),
+                         overlay.filter_contexts(where={"lang": "pt", "tags": "faq"}))
+        self.assertEqual(merged.get_metadata("tenant only", [0]), [None])
+
+    def test_select_intersects_postings(self):
+        rng = random.Random(1)
+        records = [{"a": rng.randrange(3), "b": rng.randrange(5), "c": rng.sample(range(4), 2)} for _ in range(500)]
+        index = MetadataIndex()
+        index.add(records, 0)
+        where = {"a": 1, "b": (0, 4), "c": 3}
+        self.assertEqual(index.select(where), [i for i, r in enumerate(records)
+                                               if r["a"] == 1 and r["b"] in (0, 4) and 3 in r["c"]])
+        self.assertEqual(index.select(where, 250), [i for i in index.select(where) if i < 250])
+
+    def test_index_respects_limit(self):
+        index = MetadataIndex()
+        index.add([{"tags": ["a", "a"]}, None, {"tags": "a"}], 0)
+        self.assertEqual(index.select({"tags": "a"}), [0, 2])
+        self.assertEqual(index.select({"tags": "a"}, 2), [0])
+        index.add([{"tags": "a"}], 5)
+        self.assertEqual(index.get(4), None)
+        self.assertEqual(index.select({"tags": "a"}), [0, 2, 5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import importlib.util
+import random
+import unittest
+from synapsense import ContextManager, ContextOverlay, Metrics, PromptBuilder
+
+
+class TestContextOverlay(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        words = [f"w{i}" for i in range(20)]
+        self.examples = [" ".join(rng.choices(words, k=rng.randint(1, 5))) for _ in range(300)]
+        self.queries = [rng.choices(words, k=rng.randint(1, 3)) for _ in range(20)]
+        self.base = ContextManager()
+        self.base.add_context("shared", self.examples[:120])
+        self.base.add_context("base only", ["base example"])
+        self.tenant = ContextManager(compact=True)
+        self.tenant.add_context("shared", self.examples[120:])
+        self.tenant.add_context("tenant only", ["tenant example"])
+        self.merged = ContextManager()
+        self.merged.add_context("shared", self.examples)
+
+    def test_merge_does_not_change_the_layers(self):
+        overlay = self.base.merge_contexts(self.tenant)
+        self.assertIsInstance(overlay, ContextOverlay)
+        self.assertEqual(len(self.base.get_context("shared")), 120)
+        self.assertEqual(len(self.tenant.get_context("shared")), 180)
+        self.assertEqual(overlay.list_contexts(), ["shared", "base only", "tenant only"])
+        self.assertEqual(overlay.get_context("shared"), self.examples)
+        self.assertEqual(overlay.get_context("shared")[119:121], self.examples[119:121])
+        self.assertEqual(overlay.get_context("missing"), [])
+        with self.assertRaises(TypeError):
+            overlay.add_context("shared", ["new"])
+
+    def test_rankings_match_the_merged_context(self):
+        overlay = self.base.merge_contexts(self.tenant)
+        for keywords in self.queries:
+            for strategy in ("inverted", "scan"):
+                self.assertEqual(overlay.rank_examples("shared", keywords, 5, 0.1, strategy),
+                                 self.merged.rank_examples("shared", keywords, 5, 0.1, strategy))
+        example_ids = [299, 0, 120, 119, 120]
+        self.assertEqual(overlay.get_examples("shared", example_ids), self.merged.get_examples("shared", example_ids))
+        self.assertEqual(overlay.get_token_counts("shared", example_ids),
+                         self.merged.get_token_counts("shared", example_ids))
+        self.assertEqual(overlay.get_token_sets("shared"), self.merged.get_token_sets("shared"))
+        with self.assertRaises(IndexError):
+            overlay.get_examples("shared", [300])
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "NumPy is not installed")
+    def test_sparse_and_ann_query_every_layer(self):
+        overlay = self.base.merge_contexts(self.tenant)
+        for keywords in self.queries[:5]:
+            self.assertEqual(overlay.rank_examples("shared", keywords, 5, 0.1, "sparse"),
+                             self.merged.rank_examples("shared", keywords, 5, 0.1, "sparse"))
+        ranked = overlay.rank_examples("shared", ["tenant", "example"], 1, 0.0, "ann")
+        self.assertEqual(len(ranked), 1)
+
+    def test_prompts_match_the_merged_context(self):
+        overlay = PromptBuilder(self.base.merge_contexts(self.tenant), similarity_threshold=0.1, max_prompt_tokens=40)
+        merged = PromptBuilder(self.merged, similarity_threshold=0.1, max_prompt_tokens=40)
+        for keywords in self.queries[:5]:
+            user_input = " ".join(keywords)
+            self.assertEqual(overlay.build_prompt("shared", user_input), merged.build_prompt("shared", user_input))
+
+    def test_overlay_is_stable_while_layers_change(self):
+        overlay = self.base.merge_contexts(self.tenant)
+        version = overlay.get_version("shared")
+        self.base.add_context("shared", ["w1 w2"])
+        self.assertEqual(len(overlay.get_context("shared")), 300)
+        self.assertEqual(overlay.get_version("shared"), version)
+        updated = self.base.merge_contexts(self.tenant)
+        self.assertEqual(len(updated.get_context("shared")), 301)
+        self.assertNotEqual(updated.get_version("shared"), version)
+        self.assertEqual(overlay.get_version("missing"), 0)
+
+    def test_overlays_flatten_and_materialize(self):
+        extra = ContextManager()
+        extra.add_context("shared", ["w3 w4"])
+        overlay = self.base.merge_contexts(self.tenant).merge_contexts(extra)
+        self.assertEqual(overlay.layers, [self.base, self.tenant, extra])
+        materialized = overlay.materialize()
+        self.assertIsInstance(materialized, ContextManager)
+        self.assertNotIsInstance(materialized, ContextOverlay)
+        self.assertEqual(materialized.get_context("shared"), self.examples + ["w3 w4"])
+        self.assertEqual(materialized.get_context("tenant only"), ["tenant example"])
+        self.assertEqual(overlay.search_context("example"),
+                         [("base only", "base example"), ("tenant only", "tenant example")])
+
+    def test_empty_contexts_are_kept(self):
+        empty = ContextManager()
+        empty.add_context("empty", [])
+        overlay = self.base.merge_contexts(empty)
+        self.assertIn("empty", overlay.list_contexts())
+        self.assertEqual(list(overlay.contexts["empty"]), [])
+        self.assertIn("empty", overlay.materialize().list_contexts())
+
+    def test_instrumentation_is_forwarded(self):
+        metrics = Metrics()
+        tenant = ContextManager(instrumentation=metrics)
+        tenant.add_context("shared", ["w1 w2"])
+        overlay = self.base.merge_contexts(tenant)
+        self.assertIs(overlay.instrumentation, metrics)
+        overlay.rank_examples("shared", ["w1"])
+        self.assertEqual(metrics.snapshot()["stages"]["rank_examples"]["count"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from synapsense import ContextManager, PromptBuilder, PromptCache
+
+
+class TestPromptCache(unittest.TestCase):
+    def setUp(self):
+        self.cm = ContextManager()
+        self.cm.add_context("medical", ["patient fever headache", "patient chest pain"])
+
+    def test_hits_and_invalidation(self):
+        cache = PromptCache()
+        pb = PromptBuilder(self.cm, cache=cache)
+        uncached = PromptBuilder(self.cm)
+
+        first = pb.build_prompt("medical", "patient fever headache")
+        self.assertEqual(first, uncached.build_prompt("medical", "patient fever headache"))
+        # Same keywords in another order hit the cache
+        self.assertEqual(pb.build_prompt("medical", "headache fever patient"),
+                         uncached.build_prompt("medical", "headache fever patient"))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        version = self.cm.get_version("medical")
+        self.cm.add_context("medical", ["patient fever headache cough"])
+        self.assertGreater(self.cm.get_version("medical"), version)
+        self.assertEqual(pb.build_prompt("medical", "patient fever headache"),
+                         uncached.build_prompt("medical", "patient fever headache"))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+        self.cm.remove_context("medical")
+        self.assertEqual(self.cm.get_version("medical"), 0)
+        self.cm.add_context("medical", ["patient fever headache"])
+        self.assertGreater(self.cm.get_version("medical"), version)
+
+    def test_bounded_size(self):
+        cache = PromptCache(max_entries=2, max_bytes=40)
+        cache.put(("a",), ("x" * 4,))
+        cache.put(("b",), ("y" * 4,))
+        cache.get(("a",))
+        cache.put(("c",), ("z" * 4,))
+        self.assertIsNone(cache.get(("b",)))
+        self.assertEqual(cache.get(("a",)), ("xxxx",))
+        self.assertEqual(cache.evictions, 1)
+
+        cache.put(("d",), ("w" * 40,))
+        self.assertLessEqual(cache.size_bytes, 40)
+        self.assertEqual(len(cache), 0)
+
+    def test_ttl(self):
+        now = [0.0]
+        cache = PromptCache(ttl=10, clock=lambda: now[0])
+        cache.put(("a",), ())
+        now[0] = 5
+        self.assertEqual(cache.get(("a",)), ())
+        now[0] = 20
+        self.assertIsNone(cache.get(("a",)))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
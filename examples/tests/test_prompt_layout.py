@@ -0,0 +1,54 @@
+import os
+import unittest
+from synapsense import ContextManager, ContextOptimizer, PromptBuilder
+
+
+class TestPromptLayout(unittest.TestCase):
+    def setUp(self):
+        self.cm = ContextManager()
+        self.cm.add_context("test", ["red apple", "green apple", "red car", "blue car"])
+
+    def test_query_first_layout_is_unchanged(self):
+        pb = PromptBuilder(self.cm, similarity_threshold=0.1)
+        self.assertEqual(pb.build_prompt("test", "red apple"),
+                         "Example: red apple\nExample: green apple\nExample: red car\n"
+                         "User Input: red apple\nPlease respond based on the above context")
+        self.assertEqual(pb.shared_prefix_bytes("test"), 0)
+
+    def test_prefix_stable_layout(self):
+        optimizer = ContextOptimizer(top_k=2)
+        for example, metric in [("blue car", 0.9), ("red car", 0.8), ("green apple", 0.1)]:
+            optimizer.evaluate_relevance(example, "query", metric)
+        optimizer.adjust_contexts()
+
+        pb = PromptBuilder(self.cm, similarity_threshold=0.1, layout="prefix_stable", instructions="Be brief.")
+        pb.pin_examples("test", optimizer.get_optimized_context())
+        prefix = "Be brief.\nExample: blue car\nExample: red car\n"
+        self.assertEqual(pb.shared_prefix("test"), prefix)
+        self.assertEqual(pb.shared_prefix_bytes("test"), len(prefix.encode("utf-8")))
+
+        prompts = [pb.build_prompt("test", user_input) for user_input in ("red apple", "green car", "blue")]
+        for prompt in prompts:
+            self.assertTrue(prompt.startswith(prefix))
+        self.assertEqual(len(os.path.commonprefix(prompts)), len(prefix))
+        # Pinned examples are not repeated among the retrieved ones
+        self.assertEqual(prompts[0], prefix + "Example: red apple\nExample: green apple\n"
+                                              "User Input: red apple\nPlease respond based on the above context")
+
+        pb.pin_examples("test", [])
+        self.assertEqual(pb.shared_prefix("test"), "Be brief.\n")
+
+    def test_pinned_examples_in_query_first_layout(self):
+        pb = PromptBuilder(self.cm, similarity_threshold=0.1, instructions="Be brief.")
+        pb.pin_examples("test", ["blue car"])
+        self.assertEqual(pb.shared_prefix("test"), "Be brief.\n")
+        self.assertEqual(pb.build_prompt("test", "unrelated"),
+                         "Be brief.\nExample: blue car\nUser Input: unrelated\nPlease respond based on the above context")
+
+    def test_unknown_layout(self):
+        with self.assertRaises(ValueError):
+            PromptBuilder(self.cm, layout="sideways")
+
+
+if __name__ == '__main__':
+    unittest.main()
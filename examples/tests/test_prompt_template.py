@@ -0,0 +1,60 @@
+import unittest
+from synapsense import ContextManager, PromptBuilder, PromptTemplate
+
+
+def concatenated_prompt(relevant_examples, user_input):
+    # The prompt as generate_prompt built it before templates
+    prompt = ""
+    for example in relevant_examples:
+        prompt += f"Example: {example}\n"
+    prompt += f"User Input: {user_input}\n"
+    prompt += "Please respond based on the above context"
+    return prompt
+
+
+class TestPromptTemplate(unittest.TestCase):
+    def test_default_template_reproduces_concatenation(self):
+        pb = PromptBuilder(ContextManager())
+        for examples in ([], ["one"], ["a {b}", "ünïcode", "x\ny"] * 50):
+            self.assertEqual(pb.generate_prompt(examples, "what {now}?"), concatenated_prompt(examples, "what {now}?"))
+
+    def test_compiled_segments(self):
+        template = PromptTemplate("Q: {user_input}{{literal}}\n{examples}A:", example="- {example}\n")
+        self.assertEqual(template.segments, ["Q: ", "{literal}\n", "A:"])
+        self.assertEqual(template.slots, ["user_input", "examples"])
+        self.assertEqual(template.example_frame, "- \n")
+        self.assertEqual(template.render({"user_input": "hi", "examples": ["a", "b"]}), "Q: hi{literal}\n- a\n- b\nA:")
+
+    def test_bind_merges_static_slots(self):
+        template = PromptTemplate("{context_name}: {instructions}{pinned}{examples}{user_input}")
+        bound = template.bind(context_name="math", instructions="Add.", pinned=["1+1=2"])
+        self.assertEqual(bound.segments, ["math: Add.\nExample: 1+1=2\n", "", ""])
+        self.assertEqual(bound.slots, ["examples", "user_input"])
+        self.assertEqual(bound.render({"examples": ["2+2=4"], "user_input": "3+3"}),
+                         template.render({"context_name": "math", "instructions": "Add.", "pinned": ["1+1=2"],
+                                          "examples": ["2+2=4"], "user_input": "3+3"}))
+
+    def test_invalid_templates(self):
+        for template in ("{unknown}", "{user_input:>10}", "{user_input!r}"):
+            with self.assertRaises(ValueError):
+                PromptTemplate(template)
+        with self.assertRaises(ValueError):
+            PromptTemplate(example="no slot")
+
+    def test_custom_template_in_builder(self):
+        cm = ContextManager()
+        cm.add_context("test", ["red apple", "green apple"])
+        pb = PromptBuilder(cm, similarity_threshold=0.1, instructions="Be brief.",
+                           template="[{context_name}] {instructions}{pinned}{examples}> {user_input}")
+        pb.pin_examples("test", ["always"])
+        self.assertEqual(pb.shared_prefix("test"), "[test] Be brief.\nExample: always\n")
+        self.assertEqual(pb.build_prompt("test", "red apple"),
+                         "[test] Be brief.\nExample: always\nExample: red apple\nExample: green apple\n> red apple")
+
+        # The bound template follows changes to the instructions
+        pb.instructions = "Be precise."
+        self.assertTrue(pb.build_prompt("test", "red apple").startswith("[test] Be precise.\n"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import random
+import threading
+import unittest
+from synapsense import ContextManager, PromptBuilder, ShardedContextManager
+
+
+def count_words(text):
+    if "boom" in text:
+        raise ValueError("cannot count the tokens of a boom")
+    return len(text.split())
+
+
+class TestShardedContextManager(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(0)
+        cls.words = [f"w{i}" for i in range(30)]
+        cls.examples = [" ".join(rng.choices(cls.words, k=rng.randint(1, 6))) for _ in range(500)]
+        cls.queries = [rng.choices(cls.words, k=rng.randint(1, 3)) for _ in range(30)]
+        cls.local = ContextManager()
+        cls.sharded = ShardedContextManager(shards=3)
+        for cm in (cls.local, cls.sharded):
+            # Uneven batches, so that the shards do not all start a batch at the same offset
+            cm.add_context("test", cls.examples[:100])
+            cm.add_context("test", cls.examples[100:251])
+            cm.add_context("test", cls.examples[251:])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.sharded.close()
+
+    def test_rankings_match_a_single_process(self):
+        for keywords in self.queries:
+            for strategy in ("inverted", "scan"):
+                self.assertEqual(self.sharded.rank_examples("test", keywords, 5, 0.1, strategy),
+                                 self.local.rank_examples("test", keywords, 5, 0.1, strategy))
+
+    def test_prompts_match_a_single_process(self):
+        for max_prompt_tokens in (None, 30):
+            sharded = PromptBuilder(self.sharded, similarity_threshold=0.1, max_prompt_tokens=max_prompt_tokens)
+            local = PromptBuilder(self.local, similarity_threshold=0.1, max_prompt_tokens=max_prompt_tokens)
+            for keywords in self.queries[:5]:
+                user_input = " ".join(keywords)
+                self.assertEqual(sharded.build_prompt("test", user_input), local.build_prompt("test", user_input))
+
+    def test_examples_token_sets_and_counts(self):
+        self.assertEqual(self.sharded.get_context("test"), self.examples)
+        self.assertEqual(self.sharded.get_token_sets("test"), self.local.get_token_sets("test"))
+        example_ids = [499, 0, 4, 4, 250]
+        self.assertEqual(self.sharded.get_token_counts("test", example_ids),
+                         self.local.get_token_counts("test", example_ids))
+
+    def test_errors_are_raised_in_the_parent(self):
+        with self.assertRaises(ValueError):
+            self.sharded.rank_examples("test", ["w1"], strategy="unknown")
+        self.assertEqual(self.sharded.rank_examples("test", ["w1"], 1, 0.0), self.local.rank_examples("test", ["w1"], 1, 0.0))
+
+    def test_remove_context(self):
+        with ShardedContextManager(shards=2) as cm:
+            cm.add_context("other", ["a b", "a c", "a d"])
+            version = cm.get_version("other")
+            self.assertEqual(cm.rank_examples("other", ["a", "d"], 1, 0.0), [(2, 1.0)])
+            cm.remove_context("other")
+            self.assertEqual(cm.rank_examples("other", ["a"]), [])
+            cm.add_context("other", ["a d"])
+            self.assertGreater(cm.get_version("other"), version)
+            self.assertEqual(cm.rank_examples("other", ["a", "d"], 1, 0.0), [(0, 1.0)])
+
+    def test_concurrent_queries_and_writes(self):
+        expected = [self.local.rank_examples("test", keywords, 5, 0.1) for keywords in self.queries]
+        failures = []
+
+        def query():
+            for _ in range(3):
+                for keywords, ranked in zip(self.queries, expected):
+                    if self.sharded.rank_examples("test", keywords, 5, 0.1) != ranked:
+                        failures.append(keywords)
+
+        threads = [threading.Thread(target=query) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        # Writes to another context interleave with the queries
+        for i in range(20):
+            self.sharded.add_context("concurrent", [f"x{i} y", "y"])
+        for thread in threads:
+            thread.join()
+        self.assertEqual(failures, [])
+        self.assertEqual(len(self.sharded.get_context("concurrent")), 40)
+        self.sharded.remove_context("concurrent")
+
+    def test_older_snapshots_rank_their_own_examples(self):
+        with ShardedContextManager(shards=3) as cm:
+            local = ContextManager()
+            for manager in (cm, local):
+                manager.add_context("test", [f"a b{i}" for i in range(10)])
+            # An overlay ranks the snapshot it captured when it first read the context
+            sharded_view = cm.merge_contexts(ContextManager())
+            local_view = local.merge_contexts(ContextManager())
+            self.assertEqual(len(sharded_view.get_context("test")), len(local_view.get_context("test")))
+            for manager in (cm, local):
+                # Exact matches, ranked above every example of the snapshot
+                manager.add_context("test", ["a"] * 9)
+            ranked = sharded_view.rank_examples("test", ["a"], 3, 0.0)
+            self.assertEqual(ranked, local_view.rank_examples("test", ["a"], 3, 0.0))
+            self.assertEqual([example_id for example_id, _ in ranked], [0, 1, 2])
+            self.assertEqual(cm.rank_examples("test", ["a"], 3, 0.0), [(10, 1.0), (11, 1.0), (12, 1.0)])
+
+    def test_failed_add_is_rolled_back(self):
+        with ShardedContextManager(shards=3, token_counter=count_words) as cm:
+            local = ContextManager(token_counter=count_words)
+            for manager in (cm, local):
+                manager.add_context("test", ["a b", "a c", "a d", "b c"])
+            version = cm.get_version("test")
+            with self.assertRaises(ValueError):
+                cm.add_context("test", ["a e", "boom", "a f"])
+            with self.assertRaises(ValueError):
+                cm.add_context("new", ["a", "boom"])
+            # Metadata is checked before the shards see the examples
+            with self.assertRaises(TypeError):
+                cm.add_context("test", ["a g"], [{"lang": {"nested": 1}}])
+            self.assertEqual(cm.get_version("test"), version)
+            self.assertEqual(cm.list_contexts(), ["test"])
+            self.assertEqual(cm.get_context("test"), local.get_context("test"))
+            self.assertEqual(cm.get_token_sets("test"), local.get_token_sets("test"))
+
+            for manager in (cm, local):
+                manager.add_context("test", ["a e", "a f"])
+            self.assertEqual(cm.rank_examples("test", ["a", "f"], 3, 0.0), local.rank_examples("test", ["a", "f"], 3, 0.0))
+            self.assertEqual(cm.get_token_counts("test", [5, 0]), [2, 2])
+            self.assertEqual(cm.rank_examples("new", ["a"]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import threading
+import time
+import unittest
+from synapsense import ContextManager, PromptBuilder
+
+
+class TestSnapshots(unittest.TestCase):
+    def test_snapshot_is_stable(self):
+        cm = ContextManager()
+        cm.add_context("test", ["alpha beta", "alpha"])
+        snapshot = cm.snapshot("test")
+        cm.add_context("test", ["alpha gamma"])
+        self.assertEqual(list(snapshot), ["alpha beta", "alpha"])
+        self.assertEqual(len(snapshot), 2)
+        self.assertEqual(snapshot[1], "alpha")
+        with self.assertRaises(IndexError):
+            snapshot[2]
+        self.assertLess(snapshot.version, cm.get_version("test"))
+        self.assertEqual(len(cm.snapshot("test")), 3)
+        self.assertIsNone(cm.snapshot("missing"))
+
+    def test_batch_is_published_at_once(self):
+        cm = ContextManager()
+        cm.add_context("a", ["alpha"])
+        seen = []
+
+        def read():
+            seen.append((cm.snapshot("a").size, cm.snapshot("b"), cm.rank_examples("a", ["alpha"], 5, 0.0)))
+
+        with cm.batch():
+            cm.add_context("a", ["alpha beta"])
+            cm.add_context("b", ["beta"])
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join()
+        self.assertEqual(seen, [(1, None, [(0, 1.0)])])
+        self.assertEqual(len(cm.snapshot("a")), 2)
+        self.assertEqual(list(cm.snapshot("b")), ["beta"])
+
+    def test_replaced_context_is_reindexed(self):
+        cm = ContextManager()
+        cm.add_context("test", ["alpha"])
+        cm.contexts["test"] = ["beta", "beta gamma"]
+        self.assertEqual(cm.rank_examples("test", ["beta"], 5, 0.0), [(0, 1.0), (1, 0.5)])
+
+    def test_reads_are_consistent_while_writing(self):
+        cm = ContextManager()
+        batch_size = 7
+        errors = []
+        reading = threading.Event()
+        readers_done = threading.Barrier(4)
+
+        def write():
+            batch = 0
+            while batch < 50 or reading.is_set():
+                cm.add_context("live", [f"common batch{batch} item{i}" for i in range(batch_size)])
+                batch += 1
+                time.sleep(0.0001)
+
+        def read(strategy):
+            pb = PromptBuilder(cm, strategy=strategy, top_k=batch_size, similarity_threshold=0.0)
+            try:
+                for _ in range(100):
+                    snapshot = cm.snapshot("live")
+                    # Every add_context is published whole
+                    self.assertEqual(len(snapshot) % batch_size, 0)
+                    self.assertEqual(len(list(snapshot)), len(snapshot))
+                    self.assertEqual(len(cm.search_context("common")) % batch_size, 0)
+                    ranked = cm.rank_examples("live", ["common", "item3"], batch_size, 0.0, strategy)
+                    cm.get_examples("live", [example_id for example_id, _ in ranked])
+                    pb.build_prompt("live", "common item3")
+            except Exception as error:
+                errors.append(error)
+            readers_done.wait()
+
+        cm.add_context("live", [f"common item{i}" for i in range(batch_size)])
+        reading.set()
+        readers = [threading.Thread(target=read, args=(strategy,)) for strategy in ("inverted", "scan", "inverted")]
+        writer = threading.Thread(target=write)
+        for thread in readers + [writer]:
+            thread.start()
+        readers_done.wait()
+        reading.clear()
+        for thread in readers + [writer]:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertGreater(cm.get_version("live"), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import random
+import unittest
+from synapsense import ContextManager, PromptBuilder
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipUnless(numpy, "NumPy is not installed")
+class TestSparseMatrix(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(11)
+        vocabulary = [f"word{i}" for i in range(30)]
+        self.examples = [" ".join(rng.choices(vocabulary, k=rng.randint(1, 7))) for _ in range(400)]
+        self.queries = [rng.sample(vocabulary + ["unseen"], rng.randint(1, 5)) for _ in range(200)]
+
+    def test_sparse_matches_calculate_similarity(self):
+        cm = ContextManager()
+        cm.add_context("test", self.examples)
+        pb = PromptBuilder(cm, strategy="sparse")
+
+        for keywords in self.queries:
+            self.assertEqual(
+                pb.find_relevant_examples(None, keywords, context_name="test"),
+                pb.find_relevant_examples(self.examples, keywords),
+            )
+
+    def test_sparse_top_k_ties(self):
+        cm = ContextManager()
+        cm.add_context("test", self.examples)
+
+        for keywords in self.queries:
+            for top_k in (1, 3, 25):
+                self.assertEqual(
+                    cm.rank_examples("test", keywords, top_k=top_k, threshold=0.1, strategy="sparse"),
+                    cm.rank_examples("test", keywords, top_k=top_k, threshold=0.1, strategy="inverted"),
+                )
+
+    def test_matrix_is_extended_by_add_context(self):
+        cm = ContextManager()
+        cm.add_context("test", self.examples[:100])
+        cm.rank_examples("test", self.queries[0], strategy="sparse")
+        cm.add_context("test", self.examples[100:])
+
+        for keywords in self.queries:
+            self.assertEqual(
+                cm.rank_examples("test", keywords, top_k=10, strategy="sparse"),
+                cm.rank_examples("test", keywords, top_k=10, strategy="inverted"),
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from synapsense import ContextManager, Metrics, PromptBuilder, SQLiteContextManager
+
+
+class TestSQLiteContextManager(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "contexts.db")
+        self.cm = SQLiteContextManager(self.path)
+
+        rng = random.Random(3)
+        vocabulary = [f"word{i}" for i in range(30)]
+        self.examples = [" ".join(rng.choices(vocabulary, k=rng.randint(1, 6))) for _ in range(300)]
+        self.queries = [rng.sample(vocabulary, rng.randint(1, 4)) for _ in range(100)]
+
+    def tearDown(self):
+        self.cm.close()
+        self.directory.cleanup()
+
+    def test_same_api_as_context_manager(self):
+        memory = ContextManager()
+        for cm in (self.cm, memory):
+            cm.add_context("a", self.examples[:150])
+            cm.add_context("b", self.examples[150:200])
+            cm.add_context("a", self.examples[200:])
+
+        self.assertEqual(self.cm.list_contexts(), memory.list_contexts())
+        self.assertEqual(self.cm.get_context("a"), memory.get_context("a"))
+        self.assertEqual(self.cm.search_context("word1"), memory.search_context("word1"))
+        self.assertEqual(self.cm.get_context("missing"), [])
+
+        for keywords in self.queries:
+            ranked = self.cm.rank_examples("a", keywords, top_k=5, threshold=0.2)
+            self.assertEqual(ranked, memory.rank_examples("a", keywords, top_k=5, threshold=0.2))
+            ids = [example_id for example_id, _ in ranked]
+            self.assertEqual(self.cm.get_examples("a", ids), memory.get_examples("a", ids))
+            self.assertEqual(self.cm.get_token_counts("a", ids), memory.get_token_counts("a", ids))
+
+        version = self.cm.get_version("a")
+        self.cm.remove_context("a")
+        self.assertEqual(self.cm.list_contexts(), ["b"])
+        self.assertEqual(self.cm.get_version("a"), 0)
+        self.cm.add_context("a", ["word1"])
+        self.assertGreater(self.cm.get_version("a"), version)
+
+    def test_shared_read_only_file(self):
+        self.cm.add_context("medical", ["patient fever headache", "patient chest pain"])
+        reader = SQLiteContextManager(self.path, read_only=True)
+        try:
+            pb = PromptBuilder(reader)
+            self.assertEqual(pb.build_prompt("medical", "patient fever headache"),
+                             PromptBuilder(self.cm).build_prompt("medical", "patient fever headache"))
+        finally:
+            reader.close()
+
+    def test_in_memory_methods_raise_type_error(self):
+        self.cm.add_context("a", ["word1 word2"])
+        for call in (lambda: self.cm.snapshot("a"), self.cm.batch, lambda: self.cm.merge_contexts(ContextManager())):
+            with self.assertRaises(TypeError):
+                call()
+        # The inherited methods built on add_context work
+        self.cm.ingest([{"context": "a", "example": "word3"}, {"context": "b", "example": "word4"}])
+        self.assertEqual(self.cm.get_context("a"), ["word1 word2", "word3"])
+        self.assertEqual(self.cm.list_contexts(), ["a", "b"])
+
+    def test_rank_examples_is_always_timed(self):
+        metrics = Metrics()
+        self.cm.instrumentation = metrics
+        self.cm.add_context("a", ["word1 word2"])
+        self.cm.rank_examples("a", ["word1"], threshold=0.0)
+        self.cm.rank_examples("missing", ["word1"])
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["stages"]["rank_examples"]["count"], 2)
+        self.assertEqual(snapshot["histograms"]["candidates_scored"]["count"], 1)
+
+    def test_migrates_files_without_prompt_tokens(self):
+        self.cm.close()
+        os.remove(self.path)
+        # The schema of files written before prompt token counts were stored
+        connection = sqlite3.connect(self.path)
+        connection.executescript("""
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            CREATE TABLE contexts (context_id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL,
+                                   size INTEGER NOT NULL, version INTEGER NOT NULL);
+            CREATE TABLE examples (context_id INTEGER NOT NULL, example_id INTEGER NOT NULL, text TEXT NOT NULL,
+                                   n_tokens INTEGER NOT NULL, PRIMARY KEY (context_id, example_id)) WITHOUT ROWID;
+            CREATE TABLE postings (context_id INTEGER NOT NULL, token TEXT NOT NULL, example_id INTEGER NOT NULL,
+                                   PRIMARY KEY (context_id, token, example_id)) WITHOUT ROWID;
+            INSERT INTO meta VALUES ('version', 1);
+            INSERT INTO contexts VALUES (1, 'medical', 1, 1);
+            INSERT INTO examples VALUES (1, 0, 'patient fever headache', 3);
+            INSERT INTO postings VALUES (1, 'patient', 0), (1, 'fever', 0), (1, 'headache', 0);
+        """)
+        connection.close()
+
+        with self.assertRaises(ValueError):
+            SQLiteContextManager(self.path, read_only=True)
+
+        self.cm = SQLiteContextManager(self.path, token_counter=lambda text: len(text.split()))
+        self.cm.add_context("medical", ["patient chest pain now"])
+        self.assertEqual(self.cm.get_token_counts("medical", [0, 1]), [3, 4])
+        self.assertEqual(self.cm.rank_examples("medical", ["patient", "fever"], threshold=0.0)[0][0], 0)
+        reader = SQLiteContextManager(self.path, read_only=True)
+        try:
+            self.assertEqual(reader.get_context("medical"), ["patient fever headache", "patient chest pain now"])
+        finally:
+            reader.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import random
+import unittest
+from synapsense import ContextManager
+from synapsense.substring_index import TrigramIndex
+
+
+def naive_search(cm, query):
+    return [(context_name, example) for context_name in cm.contexts for example in cm.contexts[context_name]
+            if query in example]
+
+
+class TestSubstringIndex(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        words = ["".join(rng.choices("abcdeçã", k=rng.randint(1, 6))) for _ in range(200)]
+        self.queries = ["", "a", "çã", " a", "abc", "bcd e", "ab ab"] + [rng.choice(words) for _ in range(30)]
+        self.queries += [rng.choice(words)[-2:] + " " + rng.choice(words)[:2] for _ in range(30)]
+        self.contexts = {name: [" ".join(rng.choices(words, k=rng.randint(0, 8))) for _ in range(150)]
+                         for name in ("first", "second")}
+
+    def test_candidates_contain_every_match(self):
+        index = TrigramIndex()
+        examples = self.contexts["first"]
+        index.add(examples[:100])
+        index.add(examples[100:])
+        self.assertEqual(len(index), 150)
+        for query in self.queries:
+            if len(query) < 3:
+                continue
+            candidates = index.candidates(query)
+            self.assertEqual(candidates, sorted(candidates))
+            self.assertEqual([i for i in candidates if query in examples[i]],
+                             [i for i, example in enumerate(examples) if query in example])
+            self.assertTrue(all(i < 40 for i in index.candidates(query, 40)))
+
+    def test_search_matches_a_scan(self):
+        for compact in (False, True):
+            cm = ContextManager(compact=compact)
+            for name, examples in self.contexts.items():
+                cm.add_context(name, examples[:100])
+            for query in self.queries:
+                self.assertEqual(cm.search_context(query), naive_search(cm, query))
+            # The trigram index is kept up to date once built
+            for name, examples in self.contexts.items():
+                cm.add_context(name, examples[100:])
+            for query in self.queries:
+                self.assertEqual(cm.search_context(query), naive_search(cm, query))
+
+    def test_batch_matches_single_queries(self):
+        cm = ContextManager()
+        for name, examples in self.contexts.items():
+            cm.add_context(name, examples)
+        queries = self.queries + self.queries[:5]
+        self.assertEqual(cm.search_contexts(queries), [cm.search_context(query) for query in queries])
+        self.assertEqual(cm.search_contexts([]), [])
+
+    def test_overlay_searches_every_layer(self):
+        base = ContextManager()
+        tenant = ContextManager()
+        merged = ContextManager()
+        for name, examples in self.contexts.items():
+            base.add_context(name, examples[:70])
+            tenant.add_context(name, examples[70:])
+            merged.add_context(name, examples)
+        overlay = base.merge_contexts(tenant)
+        for query in self.queries:
+            self.assertEqual(overlay.search_context(query), merged.search_context(query))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from unittest import mock
+from synapsense import ContextManager, PromptBuilder, PromptCache
+from synapsense.tokens import TiktokenCounter, estimate_tokens, pack_to_budget
+
+
+class TestTokenBudget(unittest.TestCase):
+    def setUp(self):
+        self.cm = ContextManager(token_counter=lambda text: len(text.split()))
+        self.cm.add_context("test", [
+            "alpha beta gamma delta epsilon zeta eta theta",
+            "alpha beta",
+            "alpha beta gamma",
+            "alpha",
+        ])
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("abcd"), 1)
+        self.assertEqual(estimate_tokens("abcde"), 2)
+
+    def test_pack_to_budget_skips_items_that_do_not_fit(self):
+        self.assertEqual(pack_to_budget([5, 3, 8, 1], 9), [0, 1, 3])
+        self.assertEqual(pack_to_budget([5, 3], 0), [])
+
+    def test_token_counts_are_cached_when_added(self):
+        counter = mock.Mock(side_effect=lambda text: len(text))
+        cm = ContextManager(token_counter=counter)
+        cm.add_context("test", ["ab", "abcd"])
+        self.assertEqual(counter.call_count, 2)
+        self.assertEqual(cm.get_token_counts("test", [1, 0]), [4, 2])
+        self.assertEqual(counter.call_count, 2)
+
+    def test_build_prompt_packs_within_budget(self):
+        unlimited = PromptBuilder(self.cm, top_k=4, similarity_threshold=0.1)
+        self.assertEqual(unlimited.build_prompt("test", "alpha beta").count("Example:"), 4)
+
+        # "User Input: alpha beta\nPlease respond based on the above context" counts 11 tokens,
+        # and every example counts one more for its "Example:" prefix
+        pb = PromptBuilder(self.cm, top_k=4, similarity_threshold=0.1, max_prompt_tokens=11 + 3 + 2)
+        prompt = pb.build_prompt("test", "alpha beta")
+        self.assertEqual(prompt, "Example: alpha beta\nExample: alpha\nUser Input: alpha beta\n"
+                                 "Please respond based on the above context")
+        self.assertLessEqual(self.cm.token_counter(prompt), pb.max_prompt_tokens)
+
+        examples = self.cm.get_context("test")
+        self.assertEqual(pb.find_relevant_examples(examples, ["alpha", "beta"], max_tokens=5),
+                         ["alpha beta", "alpha"])
+
+    def test_budget_decides_how_many_examples_without_top_k(self):
+        cm = ContextManager(token_counter=lambda text: len(text.split()))
+        cm.add_context("test", [f"alpha w{i}" for i in range(40)])
+        self.assertEqual(PromptBuilder(cm, similarity_threshold=0.1).build_prompt("test", "alpha").count("Example:"), 3)
+
+        # 10 tokens of user input and instructions, then 3 per framed example
+        pb = PromptBuilder(cm, similarity_threshold=0.1, max_prompt_tokens=2000)
+        self.assertEqual(pb.build_prompt("test", "alpha").count("Example:"), 40)
+        pb.max_prompt_tokens = 10 + 3 * 20 + 2
+        self.assertEqual(pb.build_prompt("test", "alpha").count("Example:"), 20)
+        self.assertEqual(pb.find_relevant_examples(cm.get_context("test"), ["alpha"], max_tokens=3 * 25),
+                         pb.find_relevant_examples(None, ["alpha"], "test", max_tokens=3 * 25))
+        # An explicit top_k still caps the number of examples
+        pb.top_k = 5
+        self.assertEqual(pb.build_prompt("test", "alpha").count("Example:"), 5)
+
+    def test_cache_is_keyed_by_budget(self):
+        pb = PromptBuilder(self.cm, top_k=4, similarity_threshold=0.1, cache=PromptCache(), max_prompt_tokens=16)
+        short = pb.build_prompt("test", "alpha beta")
+        pb.max_prompt_tokens = 100
+        self.assertNotEqual(pb.build_prompt("test", "alpha beta"), short)
+
+    def test_tiktoken_counter(self):
+        try:
+            counter = TiktokenCounter()
+        except Exception as error:
+            self.skipTest(f"tiktoken encoding unavailable: {error}")
+        self.assertGreater(counter("hello world"), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
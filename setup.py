@@ -10,7 +10,9 @@ setup(
     long_description_content_type='text/markdown',
     url='https://github.com/richardsonlima/synapsense.git',
     packages=find_packages(include=['synapsense', 'synapsense.*']),
-    install_requires=['openai>=1.46.0', 'nltk', 'stopwords'],
+    package_data={'synapsense': ['data/stopwords/*']},
+    install_requires=['openai>=1.46.0'],
+    extras_require={'nltk': ['nltk'], 'numpy': ['numpy'], 'tiktoken': ['tiktoken']},
     license='BSD License',
     python_requires='>=3.8',
     classifiers=[
@@ -1,5 +1,31 @@
 from .context_manager import ContextManager
 from .prompt_builder import PromptBuilder
 from .context_optimizer import ContextOptimizer
+from .prompt_cache import PromptCache
+from .prompt_template import PromptTemplate
 
-__all__ = ["ContextManager", "PromptBuilder", "ContextOptimizer"]
+__all__ = ["ContextManager", "PromptBuilder", "ContextOptimizer", "PromptCache", "PromptTemplate", "SQLiteContextManager",
+           "ShardedContextManager", "Instrumentation", "Metrics", "ContextOverlay", "AsyncPipeline"]
+
+
+def __getattr__(name):
+    # asyncio is slow to import, so the async pipeline is only loaded when used
+    if name == "AsyncPipeline":
+        from .async_pipeline import AsyncPipeline
+        return AsyncPipeline
+    # Instrumentation is opt-in, so its hooks are only loaded when used
+    if name in ("Instrumentation", "Metrics"):
+        from . import instrumentation
+        return getattr(instrumentation, name)
+    # The SQLite and sharded context managers are alternative backends, loaded when used
+    if name == "SQLiteContextManager":
+        from .sqlite_context_manager import SQLiteContextManager
+        return SQLiteContextManager
+    if name == "ShardedContextManager":
+        from .sharded import ShardedContextManager
+        return ShardedContextManager
+    # Overlays are created by merge_contexts, which imports them itself
+    if name == "ContextOverlay":
+        from .overlay import ContextOverlay
+        return ContextOverlay
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,26 +1,17 @@
+import asyncio
 import os
-import openai
 from synapsense import ContextManager, PromptBuilder, ContextOptimizer
-import nltk
-nltk.download('stopwords')
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-
-
-def call_openai_api(model, prompt, max_tokens, temperature):
-    """Calls the OpenAI API and returns the response."""
-    try:
-        response = openai.ChatCompletion.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=max_tokens,
-            temperature=temperature
-        )
-        return response.choices[0].message['content']
-    except Exception as e:
-        print(f"Error while calling OpenAI API: {e}")
-        return None
+from synapsense.async_pipeline import AsyncPipeline
+
+
+async def call_openai_api(pipeline, prompt):
+    """Calls the OpenAI API through the pipeline's shared client and returns the response."""
+    async with pipeline:
+        try:
+            return await pipeline.complete(prompt)
+        except Exception as e:
+            print(f"Error while calling OpenAI API: {e}")
+            return None
 
 
 def main():
@@ -30,8 +21,6 @@ def main():
         print("Error: OPENAI_API_KEY environment variable is not set.")
         return
 
-    openai.api_key = api_key
-
     # Create a ContextManager instance
     context_manager = ContextManager()
 
@@ -58,11 +47,9 @@ def main():
         # For demonstration purposes, assume a performance metric of 0.5
         context_optimizer.evaluate_relevance(example, "medical", 0.5)
 
-    # Adjust the context examples based on their relevance
+    # Adjust the context examples based on their relevance and print the optimized ones
     context_optimizer.adjust_contexts()
-
-    # Get the optimized context examples
-    optimized_context = context_optimizer.get_optimized_context()
+    print(f"Optimized context: {context_optimizer.get_optimized_context()}")
 
     # Build a prompt for the "medical" context with a user input
     user_input = "A patient is experiencing symptoms of chest pain and shortness of breath."
@@ -76,7 +63,9 @@ def main():
     model = "gpt-3.5-turbo"
     max_tokens = 2048
     temperature = 0.7
-    response = call_openai_api(model, prompt, max_tokens, temperature)
+    pipeline = AsyncPipeline(prompt_builder, model=model, api_key=api_key, max_tokens=max_tokens,
+                             temperature=temperature)
+    response = asyncio.run(call_openai_api(pipeline, prompt))
 
     # Print the model's response
     if response is not None:
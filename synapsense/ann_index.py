@@ -0,0 +1,406 @@
+import os
+
+from .context_index import select_top_k
+
+# Odd 64-bit constants of the n-gram hash.
+_MULTIPLIER = 0x100000001B3
+_MIXER = 0xBF58476D1CE4E5B9
+
+
+def hash_embed(texts: list, dim: int = 256, ngram_range: tuple = (3, 5)):
+    """
+    Embeds texts with a hashing vectorizer over their character n-grams.
+
+    Every n-gram of the UTF-8 bytes of the lowercased text, padded with a space on each
+    side, is hashed into one of dim columns, with a sign taken from another bit of the
+    hash so that collisions tend to cancel out. The rows are normalized to unit length,
+    so the dot product of two rows is their cosine similarity. The hash is computed with
+    vectorized integer arithmetic over all texts at once, is stable across processes and
+    needs no model or vocabulary.
+
+    Args:
+    ----
+    texts (list): The texts to embed.
+    dim (int): The number of dimensions of the embeddings.
+    ngram_range (tuple): The smallest and largest n-gram lengths.
+
+    Returns:
+    -------
+    numpy.ndarray: A float32 array of shape (len(texts), dim).
+    """
+    np = _numpy()
+    encoded = [f" {text.lower()} ".encode("utf-8") for text in texts]
+    n_rows = len(encoded)
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+    rows = np.repeat(np.arange(n_rows, dtype=np.int64), [len(text) for text in encoded])
+
+    vectors = np.zeros(n_rows * dim, dtype=np.float64)
+    smallest, largest = ngram_range
+    with np.errstate(over="ignore"):
+        for n in range(smallest, largest + 1):
+            size = len(data) - n + 1
+            if size <= 0:
+                continue
+            # Polynomial hash of the n bytes starting at every position, then mixed
+            hashes = np.zeros(size, dtype=np.uint64)
+            for offset in range(n):
+                hashes = hashes * np.uint64(_MULTIPLIER) + data[offset:offset + size]
+            hashes ^= hashes >> np.uint64(29)
+            hashes *= np.uint64(_MIXER)
+            hashes ^= hashes >> np.uint64(32)
+            # Only n-grams that lie within a single text count
+            inside = rows[:size] == rows[n - 1:]
+            cells = rows[:size][inside] * dim + (hashes[inside] % np.uint64(dim)).astype(np.int64)
+            signs = np.where(hashes[inside] >> np.uint64(63), 1.0, -1.0)
+            vectors += np.bincount(cells, weights=signs, minlength=n_rows * dim)
+
+    vectors = vectors.reshape(n_rows, dim).astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def _numpy():
+    """
+    Imports NumPy, which the ANN retrieval strategy requires.
+
+    Returns:
+    -------
+    module: The numpy module.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("The ann retrieval strategy requires NumPy: pip install synapsense[numpy]") from None
+    return np
+
+
+def _popcount(np, words):
+    """
+    Counts the set bits of every element of an array of unsigned 64-bit integers.
+
+    Args:
+    ----
+    np (module): The numpy module.
+    words (numpy.ndarray): The integers.
+
+    Returns:
+    -------
+    numpy.ndarray: The number of set bits of each integer, as uint8.
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    # NumPy < 2.0 has no popcount; count the bits of each byte with a lookup table
+    table = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+    return table[words.view(np.uint8)].reshape(*words.shape, 8).sum(axis=-1, dtype=np.uint8)
+
+
+class LSHIndex:
+    """
+    A class used to find the examples whose embeddings are closest to a query's.
+
+    Every embedding is reduced to a sketch of n_bits bits, the signs of its projections
+    on random hyperplanes, as in SimHash: the fraction of bits two sketches differ in
+    estimates the angle between their embeddings. A query scans the sketches, which are
+    n_bits / 8 bytes per example instead of 4 * dim, by Hamming distance with XOR and
+    popcount, then scores the closest candidates exactly with the float32 embeddings.
+    The scores returned are exact, but a true neighbour whose sketch is not among the
+    closest candidates is missed. The embeddings and sketches can be saved and
+    memory-mapped back.
+
+    Despite the name, this is not a sublinear index: every query scans all the sketches,
+    O(n * n_bits / 64) word operations for n examples, then scores the candidates exactly.
+    It reads 32 * dim / n_bits times less data than an exact scan. Banded sketch buckets,
+    the usual sublinear scheme, are not used: the embeddings of related texts have a cosine
+    similarity of about 0.3, too low for buckets to find them without gathering a large
+    part of the corpus too.
+
+    Attributes:
+    ----------
+    dim : int
+        The number of dimensions of the embeddings.
+    n_bits : int
+        The number of bits of the sketches, a multiple of 64.
+    candidates : int
+        The number of examples with the closest sketches that are scored exactly.
+    vectors : numpy.ndarray
+        The float32 embeddings of the examples, one row per example id.
+    sketches : numpy.ndarray
+        The sketches of the examples, as n_bits / 64 rows of uint64 with one column per example id.
+
+    Methods:
+    -------
+    add(texts)
+        Embeds and indexes texts, giving them the next example ids.
+    rank(text, top_k, threshold)
+        Ranks the indexed examples by approximate cosine similarity with a text.
+    exact_rank(text, top_k, threshold)
+        Ranks the indexed examples by scoring all of them.
+    save(directory)
+        Saves the index as .npy files.
+    load(directory, mmap_mode)
+        Loads an index saved with save, memory-mapping its arrays.
+    """
+
+    def __init__(self, dim: int = 256, n_bits: int = 1024, candidates: int = 1000, ngram_range: tuple = (3, 5),
+                 seed: int = 0):
+        """
+        Initializes an empty index.
+
+        Args:
+        ----
+        dim (int): The number of dimensions of the embeddings.
+        n_bits (int): The number of bits of the sketches, a multiple of 64. More bits
+            estimate similarities better and cost more per query.
+        candidates (int): The number of examples with the closest sketches that are scored
+            exactly. More candidates raise recall and query time.
+        ngram_range (tuple): The smallest and largest character n-gram lengths.
+        seed (int): The seed of the random hyperplanes.
+
+        Returns:
+        -------
+        None
+        """
+        if n_bits % 64:
+            raise ValueError("n_bits must be a multiple of 64")
+        np = _numpy()
+        self._np = np
+        self.dim = dim
+        self.n_bits = n_bits
+        self.candidates = candidates
+        self.ngram_range = tuple(ngram_range)
+        self.planes = np.random.default_rng(seed).standard_normal((n_bits, dim)).astype(np.float32)
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._sketches = np.empty((n_bits // 64, 0), dtype=np.uint64)
+        self._n = 0
+
+    @property
+    def vectors(self):
+        """
+        Returns the embeddings of the indexed examples.
+
+        Returns:
+        -------
+        numpy.ndarray: A float32 array with one row per example id.
+        """
+        return self._vectors[:self._n]
+
+    @property
+    def sketches(self):
+        """
+        Returns the sketches of the indexed examples.
+
+        Returns:
+        -------
+        numpy.ndarray: A uint64 array with one column per example id.
+        """
+        return self._sketches[:, :self._n]
+
+    def __len__(self) -> int:
+        """
+        Returns the number of indexed examples.
+
+        Returns:
+        -------
+        int: The number of indexed examples.
+        """
+        return self._n
+
+    def add(self, texts: list, batch_size: int = 4096):
+        """
+        Embeds and indexes texts, giving them the next example ids.
+
+        Args:
+        ----
+        texts (list): The texts to index.
+        batch_size (int): The number of texts embedded at once, which bounds the memory used.
+
+        Returns:
+        -------
+        None
+        """
+        texts = list(texts)
+        for start in range(0, len(texts), batch_size):
+            vectors = hash_embed(texts[start:start + batch_size], self.dim, self.ngram_range)
+            size = self._n + len(vectors)
+            self._vectors = self._reserve(self._vectors, size, axis=0)
+            self._sketches = self._reserve(self._sketches, size, axis=1)
+            self._vectors[self._n:size] = vectors
+            self._sketches[:, self._n:size] = self._sketch(vectors).T
+            self._n = size
+
+    def _reserve(self, buffer, size: int, axis: int):
+        """
+        Returns the buffer, or a larger copy of it if it cannot hold size items or is read-only.
+
+        The buffer grows geometrically, so appending is amortized linear.
+
+        Args:
+        ----
+        buffer (numpy.ndarray): The buffer, whose first len(self) items along axis are used.
+        size (int): The number of items the buffer must hold.
+        axis (int): The axis items are stored along.
+
+        Returns:
+        -------
+        numpy.ndarray: A writable buffer that can hold size items.
+        """
+        capacity = buffer.shape[axis]
+        if size <= capacity and buffer.flags.writeable:
+            return buffer
+        shape = list(buffer.shape)
+        shape[axis] = max(size, 2 * capacity)
+        grown = self._np.empty(shape, dtype=buffer.dtype)
+        used = (slice(None),) * axis + (slice(0, self._n),)
+        grown[used] = buffer[used]
+        return grown
+
+    def _sketch(self, vectors):
+        """
+        Returns the sketches of vectors.
+
+        Args:
+        ----
+        vectors (numpy.ndarray): The vectors, one per row.
+
+        Returns:
+        -------
+        numpy.ndarray: A uint64 array with one row per vector and n_bits / 64 columns.
+        """
+        np = self._np
+        bits = np.packbits(vectors @ self.planes.T > 0, axis=1)
+        return np.ascontiguousarray(bits).view(np.uint64)
+
+    def rank(self, text: str, top_k: int = 3, threshold: float = 0.5, limit: int = None) -> list:
+        """
+        Ranks the indexed examples by approximate cosine similarity with a text.
+
+        The sketches of all the examples are scanned, so the time taken grows linearly with
+        the number of examples. Examples are appended after the existing ones and the buffers are only replaced by
+        larger copies, so the first limit examples can be ranked while examples are added.
+
+        Args:
+        ----
+        text (str): The query text.
+        top_k (int): The maximum number of examples to return.
+        threshold (float): The similarity an example must exceed to be returned.
+        limit (int, optional): Only the examples with a lower id are ranked. Defaults to all
+            the indexed examples.
+
+        Returns:
+        -------
+        list: A list of (example_id, similarity) tuples, most similar first.
+        """
+        np = self._np
+        n = self._n if limit is None else min(limit, self._n)
+        vectors, sketches = self._vectors[:n], self._sketches[:, :n]
+        query = hash_embed([text], self.dim, self.ngram_range)[0]
+        n_candidates = max(self.candidates, top_k)
+        if n <= n_candidates:
+            return self._score(vectors, None, query, top_k, threshold)
+
+        sketch = self._sketch(query[None, :])[0]
+        distance = _popcount(np, sketches[0] ^ sketch[0]).astype(np.uint16)
+        for word in range(1, len(sketch)):
+            distance += _popcount(np, sketches[word] ^ sketch[word])
+        candidates = np.argpartition(distance, n_candidates)[:n_candidates]
+        candidates.sort()
+        return self._score(vectors, candidates, query, top_k, threshold)
+
+    def exact_rank(self, text: str, top_k: int = 3, threshold: float = 0.5) -> list:
+        """
+        Ranks the indexed examples by scoring all of them, as a reference for rank.
+
+        Args:
+        ----
+        text (str): The query text.
+        top_k (int): The maximum number of examples to return.
+        threshold (float): The similarity an example must exceed to be returned.
+
+        Returns:
+        -------
+        list: A list of (example_id, similarity) tuples, most similar first.
+        """
+        query = hash_embed([text], self.dim, self.ngram_range)[0]
+        return self._score(self.vectors, None, query, top_k, threshold)
+
+    def _score(self, vectors, candidates, query, top_k: int, threshold: float) -> list:
+        """
+        Scores candidate examples against a query embedding and selects the best.
+
+        Args:
+        ----
+        vectors (numpy.ndarray): The embeddings of the examples that can be returned.
+        candidates (numpy.ndarray): The candidate example ids, or None to score every example.
+        query (numpy.ndarray): The query embedding.
+        top_k (int): The maximum number of examples to return.
+        threshold (float): The similarity an example must exceed to be returned.
+
+        Returns:
+        -------
+        list: A list of (example_id, similarity) tuples, most similar first.
+        """
+        if candidates is None:
+            similarity = vectors @ query
+            candidates = self._np.flatnonzero(similarity > threshold)
+            similarity = similarity[candidates]
+        else:
+            similarity = vectors[candidates] @ query
+            keep = similarity > threshold
+            candidates, similarity = candidates[keep], similarity[keep]
+        if len(similarity) > top_k > 0:
+            # Keep everything tied with the k-th best score, so ties are broken by id below
+            kth = self._np.partition(similarity, len(similarity) - top_k)[len(similarity) - top_k]
+            candidates, similarity = candidates[similarity >= kth], similarity[similarity >= kth]
+        ranked = zip(candidates.tolist(), similarity.tolist())
+        return select_top_k(ranked, top_k)
+
+    def save(self, directory: str):
+        """
+        Saves the index as .npy files in a directory, creating it if needed.
+
+        Args:
+        ----
+        directory (str): The directory.
+
+        Returns:
+        -------
+        None
+        """
+        np = self._np
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "vectors.npy"), self.vectors)
+        np.save(os.path.join(directory, "sketches.npy"), self.sketches)
+        np.save(os.path.join(directory, "planes.npy"), self.planes)
+        np.save(os.path.join(directory, "settings.npy"),
+                np.array([self.candidates, *self.ngram_range], dtype=np.int64))
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: str = "r") -> 'LSHIndex':
+        """
+        Loads an index saved with save, memory-mapping its arrays.
+
+        Several processes loading the same directory share the pages of its embeddings
+        through the operating system's page cache. Adding to a read-only index copies its
+        arrays into memory first.
+
+        Args:
+        ----
+        directory (str): The directory.
+        mmap_mode (str): The numpy.load memory-map mode, or None to read the arrays into memory.
+
+        Returns:
+        -------
+        LSHIndex: The loaded index.
+        """
+        np = _numpy()
+        index = object.__new__(cls)
+        index._np = np
+        index._vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode=mmap_mode)
+        index._sketches = np.load(os.path.join(directory, "sketches.npy"), mmap_mode=mmap_mode)
+        index.planes = np.load(os.path.join(directory, "planes.npy"))
+        index.candidates, smallest, largest = np.load(os.path.join(directory, "settings.npy")).tolist()
+        index.ngram_range = (smallest, largest)
+        index.n_bits, index.dim = index.planes.shape
+        index._n = len(index._vectors)
+        return index
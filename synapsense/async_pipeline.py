@@ -0,0 +1,241 @@
+import asyncio
+import random
+
+from .prompt_builder import PromptBuilder
+
+
+def _is_retryable(error: Exception) -> bool:
+    """
+    Tells whether a failed completion call is worth retrying.
+
+    Args:
+    ----
+    error (Exception): The error raised by the call.
+
+    Returns:
+    -------
+    bool: True for timeouts, connection errors, rate limits and server errors.
+    """
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError))
+
+
+class AsyncPipeline:
+    """
+    A class used to build prompts and get completions for them concurrently with asyncio.
+
+    Prompts are built on an executor, off the event loop. Completions go through one
+    shared async OpenAI client, whose HTTP connection pool is reused by every call,
+    with a bounded number of calls in flight, a timeout per call and retries with
+    exponential backoff and jitter. Any OpenAI-compatible endpoint can be used by
+    passing its base_url.
+
+    The limit on calls in flight and the created client belong to an event loop. When the
+    pipeline is used from another loop, such as a second asyncio.run, it starts a new limit
+    and a new client; call aclose before the first loop ends to close the old client. A
+    client passed in is used as is, so it must belong to the loop the pipeline runs on.
+
+    Attributes:
+    ----------
+    prompt_builder : PromptBuilder
+        The prompt builder used to build prompts.
+    client : openai.AsyncOpenAI
+        The shared async client, created on first use unless one is given.
+    model : str
+        The model to request completions from.
+
+    Methods:
+    -------
+    build_prompt(context_name, user_input)
+        Builds a prompt without blocking the event loop.
+    complete(prompt)
+        Requests a completion for a prompt.
+    run(context_name, user_input)
+        Builds a prompt and requests a completion for it.
+    run_many(context_name, user_inputs, return_exceptions)
+        Builds prompts and requests completions for many user inputs concurrently.
+    aclose()
+        Closes the client, if the pipeline created it.
+    """
+
+    def __init__(self, prompt_builder: PromptBuilder, model: str = "gpt-4o-mini", client=None,
+                 api_key: str = None, base_url: str = None, max_concurrency: int = 16, max_retries: int = 3,
+                 backoff: float = 0.5, max_backoff: float = 8.0, timeout: float = 30.0, max_tokens: int = 2048,
+                 temperature: float = 0.7, system_prompt: str = None, executor=None):
+        """
+        Initializes a pipeline around a prompt builder.
+
+        Args:
+        ----
+        prompt_builder (PromptBuilder): The prompt builder used to build prompts.
+        model (str): The model to request completions from.
+        client (openai.AsyncOpenAI, optional): A shared async client, bound to the event loop the pipeline
+            runs on. One is created on first use in each event loop if omitted.
+        api_key (str, optional): The API key of the created client.
+        base_url (str, optional): The base URL of the created client, for OpenAI-compatible endpoints.
+        max_concurrency (int): The maximum number of completion calls in flight.
+        max_retries (int): The number of times a failed call is retried.
+        backoff (float): The delay before the first retry, in seconds, doubled after every retry.
+        max_backoff (float): The maximum delay between retries, in seconds.
+        timeout (float): The timeout of each call, in seconds.
+        max_tokens (int): The maximum number of tokens of each completion.
+        temperature (float): The sampling temperature.
+        system_prompt (str, optional): A system message sent before every prompt.
+        executor (concurrent.futures.Executor, optional): The executor prompts are built on.
+            Defaults to the event loop's default executor.
+
+        Returns:
+        -------
+        None
+        """
+        self.prompt_builder = prompt_builder
+        self.model = model
+        self.client = client
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.system_prompt = system_prompt
+        self.executor = executor
+        self._owns_client = client is None
+        self._semaphore = None
+        self._loop = None
+
+    async def __aenter__(self) -> 'AsyncPipeline':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _get_client(self):
+        """
+        Returns the shared client, creating it on first use in the running event loop.
+
+        The limit on calls in flight is created again as well when the event loop changes.
+
+        Returns:
+        -------
+        openai.AsyncOpenAI: The shared client.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            if self._owns_client:
+                # The client of a previous loop cannot be used, or closed, from this one
+                self.client = None
+        if self.client is None:
+            from openai import AsyncOpenAI
+
+            # Retries and timeouts are handled by the pipeline
+            self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self.client
+
+    async def build_prompt(self, context_name: str, user_input: str) -> str:
+        """
+        Builds a prompt without blocking the event loop.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        user_input (str): The user's input.
+
+        Returns:
+        -------
+        str: The prompt.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.prompt_builder.build_prompt, context_name, user_input)
+
+    async def complete(self, prompt: str) -> str:
+        """
+        Requests a completion for a prompt.
+
+        Args:
+        ----
+        prompt (str): The prompt.
+
+        Returns:
+        -------
+        str: The content of the completion.
+
+        Raises:
+        ------
+        Exception: The last error, once a call failed and was retried max_retries times,
+            or the first error that is not worth retrying.
+        """
+        client = self._get_client()
+        messages = [{"role": "user", "content": prompt}]
+        if self.system_prompt is not None:
+            messages.insert(0, {"role": "system", "content": self.system_prompt})
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    response = await asyncio.wait_for(
+                        client.chat.completions.create(model=self.model, messages=messages,
+                                                       max_tokens=self.max_tokens, temperature=self.temperature),
+                        self.timeout,
+                    )
+                return response.choices[0].message.content
+            except Exception as error:
+                if attempt == self.max_retries or not _is_retryable(error):
+                    raise
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+    async def run(self, context_name: str, user_input: str) -> str:
+        """
+        Builds a prompt and requests a completion for it.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        user_input (str): The user's input.
+
+        Returns:
+        -------
+        str: The content of the completion.
+        """
+        prompt = await self.build_prompt(context_name, user_input)
+        return await self.complete(prompt)
+
+    async def run_many(self, context_name: str, user_inputs: list, return_exceptions: bool = False) -> list:
+        """
+        Builds prompts and requests completions for many user inputs concurrently.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        user_inputs (list): A list of user inputs.
+        return_exceptions (bool): Whether to return the error of a failed input in place of its
+            completion, instead of raising it.
+
+        Returns:
+        -------
+        list: The completions, in the same order as the user inputs.
+        """
+        return await asyncio.gather(*(self.run(context_name, user_input) for user_input in user_inputs),
+                                    return_exceptions=return_exceptions)
+
+    async def aclose(self):
+        """
+        Closes the client, if the pipeline created it.
+
+        Returns:
+        -------
+        None
+        """
+        if self._owns_client and self.client is not None:
+            await self.client.close()
+            self.client = None
@@ -0,0 +1,460 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain, islice
+
+from .context_index import select_top_k
+from .tokens import estimate_tokens
+
+
+class Vocabulary:
+    """
+    A class used to intern the tokens of the examples of a context manager to integer ids.
+
+    Attributes:
+    ----------
+    ids : dict
+        A dictionary where the keys are tokens and the values are their ids.
+    tokens : list
+        The token of each id.
+
+    Methods:
+    -------
+    intern(tokens)
+        Returns the sorted ids of distinct tokens, assigning ids to new ones.
+    lookup(tokens)
+        Returns the ids of the tokens that have one.
+    """
+
+    __slots__ = ("ids", "tokens")
+
+    def __init__(self):
+        """
+        Initializes an empty vocabulary.
+
+        Returns:
+        -------
+        None
+        """
+        self.ids = {}
+        self.tokens = []
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def intern(self, tokens) -> list:
+        """
+        Returns the sorted ids of distinct tokens, assigning ids to new ones.
+
+        Args:
+        ----
+        tokens (set): The distinct tokens of an example.
+
+        Returns:
+        -------
+        list: The ids of the tokens, in ascending order.
+        """
+        ids = self.ids
+        run = []
+        for token in tokens:
+            token_id = ids.get(token)
+            if token_id is None:
+                token_id = ids[token] = len(self.tokens)
+                self.tokens.append(token)
+            run.append(token_id)
+        run.sort()
+        return run
+
+    def lookup(self, tokens) -> list:
+        """
+        Returns the ids of the tokens that have one.
+
+        Args:
+        ----
+        tokens (iterable): The tokens to look up.
+
+        Returns:
+        -------
+        list: The ids of the known tokens.
+        """
+        ids = self.ids
+        return [ids[token] for token in tokens if token in ids]
+
+
+class CompactExamples:
+    """
+    A class used to store the examples of a context in a single UTF-8 buffer.
+
+    It behaves as the list of examples of a context: examples are appended, and read
+    back by position, as strings decoded when they are accessed. Each example costs its
+    encoded length plus an 8-byte offset, instead of a string object and a list slot.
+
+    Methods:
+    -------
+    append(example)
+        Appends an example.
+    extend(examples)
+        Appends examples.
+    """
+
+    __slots__ = ("_text", "_offsets")
+
+    def __init__(self, examples=()):
+        """
+        Initializes the store with the given examples.
+
+        Args:
+        ----
+        examples (iterable): The initial examples.
+
+        Returns:
+        -------
+        None
+        """
+        self._text = bytearray()
+        self._offsets = array("Q", [0])
+        self.extend(examples)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._decode(i) for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("example index out of range")
+        return self._decode(position)
+
+    def __iter__(self):
+        return map(self._decode, range(len(self)))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (CompactExamples, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CompactExamples({list(self)!r})"
+
+    def _decode(self, position: int) -> str:
+        return self._text[self._offsets[position]:self._offsets[position + 1]].decode("utf-8")
+
+    def append(self, example: str):
+        """
+        Appends an example.
+
+        Args:
+        ----
+        example (str): The example.
+
+        Returns:
+        -------
+        None
+        """
+        self._text += example.encode("utf-8")
+        self._offsets.append(len(self._text))
+
+    def extend(self, examples):
+        """
+        Appends examples.
+
+        Args:
+        ----
+        examples (iterable): The examples.
+
+        Returns:
+        -------
+        None
+        """
+        for example in examples:
+            self.append(example)
+
+
+class CompactIndex:
+    """
+    A class used to index the examples of a single context with integer token ids.
+
+    It offers the interface of ContextIndex and returns the same rankings, but every
+    example is kept as a run of sorted, distinct token ids in a single array('I') buffer,
+    delimited by offsets, and the postings are arrays of example ids. The number of
+    distinct tokens of an example is the length of its run, and the Jaccard similarity
+    with a query is computed from the run, by binary search for each keyword id, or from
+    the postings. Token sets are rebuilt from the runs when they are accessed.
+
+    Attributes:
+    ----------
+    vocabulary : Vocabulary
+        The vocabulary shared by the contexts of a context manager.
+    postings : dict
+        A dictionary where the keys are token ids and the values are arrays of example ids.
+    token_sets : sequence
+        The frozen set of distinct tokens of each example, rebuilt when accessed.
+    token_counts : array
+        The number of prompt tokens of each example, as counted by the token counter.
+    matrix : SparseMatrix
+        The examples compiled into a sparse matrix, or None until compile_matrix is called.
+    ann : LSHIndex
+        The embeddings of the examples and their sketches, scanned by each ann query, or None
+        until compile_ann is called.
+    substrings : TrigramIndex
+        The character trigrams of the examples, to search them for substrings, or None until
+        compile_substrings is called.
+
+    Methods:
+    -------
+    add(examples, start)
+        Indexes the examples from position start onwards.
+    rank(keywords, top_k, threshold, limit)
+        Ranks the examples by Jaccard similarity with the keywords.
+    scan(keywords, top_k, threshold, limit)
+        Ranks the examples by scoring every token id run.
+    compile_matrix()
+        Compiles the examples into a sparse matrix, kept up to date by add.
+    compile_ann(examples)
+        Embeds and sketches the examples for the ann strategy, kept up to date by add.
+    compile_substrings(examples)
+        Indexes the character trigrams of the examples, kept up to date by add.
+    """
+
+    __slots__ = ("vocabulary", "postings", "token_counts", "token_counter", "matrix", "ann", "substrings", "_ids",
+                 "_offsets")
+
+    def __init__(self, vocabulary: Vocabulary, token_counter: callable = estimate_tokens):
+        """
+        Initializes an empty compact index.
+
+        Args:
+        ----
+        vocabulary (Vocabulary): The vocabulary to intern tokens with.
+        token_counter (callable): A function returning the number of prompt tokens of an example.
+
+        Returns:
+        -------
+        None
+        """
+        self.vocabulary = vocabulary
+        self.postings = {}
+        self.token_counts = array("I")
+        self.token_counter = token_counter
+        self.matrix = None
+        self.ann = None
+        self.substrings = None
+        self._ids = array("I")
+        self._offsets = array("Q", [0])
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    @property
+    def token_sets(self) -> '_TokenSets':
+        return _TokenSets(self)
+
+    def add(self, examples, start: int = 0):
+        """
+        Indexes the examples from position start onwards.
+
+        Args:
+        ----
+        examples (sequence): The examples of the context.
+        start (int): The id of the first example to index.
+
+        Returns:
+        -------
+        None
+        """
+        postings = self.postings
+        intern = self.vocabulary.intern
+        ids = self._ids
+        offsets = self._offsets
+        token_counts = self.token_counts
+        token_counter = self.token_counter
+        for example_id, example in enumerate(examples[start:], start):
+            run = intern(set(example.split()))
+            for token_id in run:
+                posting = postings.get(token_id)
+                if posting is None:
+                    postings[token_id] = array("I", (example_id,))
+                else:
+                    posting.append(example_id)
+            ids.extend(run)
+            offsets.append(len(ids))
+            token_counts.append(token_counter(example))
+        if self.matrix is not None:
+            self.matrix.add(self.token_sets[len(self.matrix):])
+        if self.ann is not None:
+            self.ann.add(examples[len(self.ann):])
+        if self.substrings is not None:
+            self.substrings.add(examples[len(self.substrings):])
+
+    def rank(self, keywords: list, top_k: int = 3, threshold: float = 0.5, limit: int = None,
+             stats: dict = None) -> list:
+        """
+        Ranks the examples by Jaccard similarity with the keywords.
+
+        Only examples sharing at least one keyword are scored, with the same similarity
+        and ordering as ContextIndex.rank.
+
+        Args:
+        ----
+        keywords (list): A list of keywords.
+        top_k (int): The maximum number of examples to return.
+        threshold (float): The similarity an example must exceed to be returned.
+        limit (int, optional): Only the examples with a lower id are ranked, so that examples
+            indexed while ranking are ignored. Defaults to all the indexed examples.
+        stats (dict, optional): If given, the number of candidates scored is stored under "scored".
+
+        Returns:
+        -------
+        list: A list of (example_id, similarity) tuples, most similar first.
+        """
+        keyword_tokens = set(keywords)
+        postings = self.postings
+        offsets = self._offsets
+        if limit is None:
+            limit = len(self)
+        counts = Counter(chain.from_iterable(postings.get(token_id, ())
+                                             for token_id in self.vocabulary.lookup(keyword_tokens)))
+        n_keywords = len(keyword_tokens)
+        if stats is not None:
+            stats["scored"] = len(counts)
+
+        ranked = []
+        for example_id, intersection in counts.items():
+            if example_id >= limit:
+                continue
+            size = offsets[example_id + 1] - offsets[example_id]
+            similarity = intersection / (size + n_keywords - intersection)
+            if similarity > threshold:
+                ranked.append((example_id, similarity))
+
+        return select_top_k(ranked, top_k)
+
+    def scan(self, keywords: list, top_k: int = 3, threshold: float = 0.5, limit: int = None) -> list:
+        """
+        Ranks the examples by scoring every token id run.
+
+        This returns the same results as rank, without using the postings. Each keyword
+        id is looked up in the sorted run of every example by binary search, in place in
+        the buffer.
+
+        Args:
+        ----
+        keywords (list): A list of keywords.
+        top_k (int): The maximum number of examples to return.
+        threshold (float): The similarity an example must exceed to be returned.
+        limit (int, optional): Only the examples with a lower id are ranked, so that examples
+            indexed while ranking are ignored. Defaults to all the indexed examples.
+
+        Returns:
+        -------
+        list: A list of (example_id, similarity) tuples, most similar first.
+        """
+        keyword_tokens = set(keywords)
+        keyword_ids = self.vocabulary.lookup(keyword_tokens)
+        n_keywords = len(keyword_tokens)
+        ids = self._ids
+        offsets = self._offsets
+
+        ranked = []
+        if keyword_ids:
+            for example_id in range(len(self) if limit is None else limit):
+                start, end = offsets[example_id], offsets[example_id + 1]
+                intersection = 0
+                for token_id in keyword_ids:
+                    position = bisect_left(ids, token_id, start, end)
+                    if position < end and ids[position] == token_id:
+                        intersection += 1
+                if intersection:
+                    similarity = intersection / (end - start + n_keywords - intersection)
+                    if similarity > threshold:
+                        ranked.append((example_id, similarity))
+
+        return select_top_k(ranked, top_k)
+
+    def compile_matrix(self):
+        """
+        Compiles the examples into a sparse matrix, kept up to date by add.
+
+        Returns:
+        -------
+        SparseMatrix: The compiled matrix.
+        """
+        if self.matrix is None:
+            from .sparse_index import SparseMatrix
+
+            matrix = SparseMatrix()
+            matrix.add(self.token_sets)
+            self.matrix = matrix
+        return self.matrix
+
+    def compile_ann(self, examples):
+        """
+        Embeds and sketches the examples for the ann strategy, kept up to date by add.
+
+        Args:
+        ----
+        examples (sequence): The examples of the context.
+
+        Returns:
+        -------
+        LSHIndex: The compiled index.
+        """
+        if self.ann is None:
+            from .ann_index import LSHIndex
+
+            ann = LSHIndex()
+            ann.add(islice(examples, len(self)))
+            self.ann = ann
+        return self.ann
+
+    def compile_substrings(self, examples):
+        """
+        Indexes the character trigrams of the examples, kept up to date by add.
+
+        Args:
+        ----
+        examples (sequence): The examples of the context.
+
+        Returns:
+        -------
+        TrigramIndex: The compiled index.
+        """
+        if self.substrings is None:
+            from .substring_index import TrigramIndex
+
+            substrings = TrigramIndex()
+            substrings.add(islice(examples, len(self)))
+            self.substrings = substrings
+        return self.substrings
+
+
+class _TokenSets:
+    """A read-only sequence of the token sets of the examples of a CompactIndex."""
+
+    __slots__ = ("_index",)
+
+    def __init__(self, index: CompactIndex):
+        self._index = index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._tokens(i) for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("example index out of range")
+        return self._tokens(position)
+
+    def __iter__(self):
+        return map(self._tokens, range(len(self)))
+
+    def _tokens(self, position: int) -> frozenset:
+        index = self._index
+        tokens = index.vocabulary.tokens
+        return frozenset([tokens[token_id]
+                          for token_id in index._ids[index._offsets[position]:index._offsets[position + 1]]])
@@ -0,0 +1,271 @@
+import heapq
+from collections import Counter
+from itertools import chain, islice
+
+from .sparse_index import SparseMatrix
+from .tokens import estimate_tokens
+
+
+def select_top_k(ranked: list, top_k: int) -> list:
+    """
+    Selects the k most similar examples without sorting all of them.
+
+    Args:
+    ----
+    ranked (list): A list of (example_id, similarity) tuples.
+    top_k (int): The number of examples to select.
+
+    Returns:
+    -------
+    list: The selected tuples, most similar first, ties broken by ascending example id.
+    """
+    return heapq.nsmallest(top_k, ranked, key=lambda x: (-x[1], x[0]))
+
+
+class ContextIndex:
+    """
+    A class used to index the examples of a single context for fast retrieval.
+
+    The index maps every whitespace token to the ids of the examples that contain it,
+    so that retrieval only scores examples sharing at least one keyword with the query.
+    The token set of every example is tokenized once, when the example is added, and
+    kept alongside its size and its number of prompt tokens. Example ids are positions in
+    the context's list of examples.
+
+    Attributes:
+    ----------
+    postings : dict
+        A dictionary where the keys are tokens and the values are lists of example ids.
+    token_sets : list
+        The frozen set of distinct tokens of each example.
+    sizes : list
+        The number of distinct tokens of each example.
+    token_counts : list
+        The number of prompt tokens of each example, as counted by the token counter.
+    matrix : SparseMatrix
+        The examples compiled into a sparse matrix, or None until compile_matrix is called.
+    ann : LSHIndex
+        The embeddings of the examples and their sketches, scanned by each ann query, or None
+        until compile_ann is called.
+    substrings : TrigramIndex
+        The character trigrams of the examples, to search them for substrings, or None until
+        compile_substrings is called.
+
+    Methods:
+    -------
+    add(examples, start)
+        Indexes the examples from position start onwards.
+    rank(keywords, top_k, threshold, limit)
+        Ranks the examples by Jaccard similarity with the keywords.
+    scan(keywords, top_k, threshold, limit)
+        Ranks the examples by scoring every cached token set.
+    compile_matrix()
+        Compiles the examples into a sparse matrix, kept up to date by add.
+    compile_ann(examples)
+        Embeds and sketches the examples for the ann strategy, kept up to date by add.
+    compile_substrings(examples)
+        Indexes the character trigrams of the examples, kept up to date by add.
+    """
+
+    def __init__(self, token_counter: callable = estimate_tokens):
+        """
+        Initializes an empty context index.
+
+        Args:
+        ----
+        token_counter (callable): A function returning the number of prompt tokens of an example.
+
+        Returns:
+        -------
+        None
+        """
+        self.postings = {}
+        self.token_sets = []
+        self.sizes = []
+        self.token_counts = []
+        self.token_counter = token_counter
+        self.matrix = None
+        self.ann = None
+        self.substrings = None
+
+    def __len__(self) -> int:
+        """
+        Returns the number of indexed examples.
+
+        Returns:
+        -------
+        int: The number of indexed examples.
+        """
+        return len(self.sizes)
+
+    def add(self, examples: list, start: int = 0):
+        """
+        Indexes the examples from position start onwards.
+
+        Args:
+        ----
+        examples (list): The list of examples of the context.
+        start (int): The id of the first example to index.
+
+        Returns:
+        -------
+        None
+        """
+        postings = self.postings
+        token_sets = self.token_sets
+        sizes = self.sizes
+        token_counts = self.token_counts
+        token_counter = self.token_counter
+        for example_id, example in enumerate(examples[start:], start):
+            tokens = frozenset(example.split())
+            for token in tokens:
+                posting = postings.get(token)
+                if posting is None:
+                    postings[token] = [example_id]
+                else:
+                    posting.append(example_id)
+            token_sets.append(tokens)
+            sizes.append(len(tokens))
+            token_counts.append(token_counter(example))
+        if self.matrix is not None:
+            self.matrix.add(token_sets[len(self.matrix):])
+        if self.ann is not None:
+            self.ann.add(examples[len(self.ann):])
+        if self.substrings is not None:
+            self.substrings.add(examples[len(self.substrings):])
+
+    def rank(self, keywords: list, top_k: int = 3, threshold: float = 0.5, limit: int = None,
+             stats: dict = None) -> list:
+        """
+        Ranks the examples by Jaccard similarity with the keywords.
+
+        Only examples sharing at least one keyword are scored. The similarity is computed
+        exactly as in PromptBuilder.calculate_similarity, and ties keep the order in which
+        the examples were added.
+
+        Args:
+        ----
+        keywords (list): A list of keywords.
+        top_k (int): The maximum number of examples to return.
+        threshold (float): The similarity an example must exceed to be returned.
+        limit (int, optional): Only the examples with a lower id are ranked, so that examples
+            indexed while ranking are ignored. Defaults to all the indexed examples.
+        stats (dict, optional): If given, the number of candidates scored is stored under "scored".
+
+        Returns:
+        -------
+        list: A list of (example_id, similarity) tuples, most similar first.
+        """
+        keyword_tokens = set(keywords)
+        postings = self.postings
+        sizes = self.sizes
+        if limit is None:
+            limit = len(sizes)
+        counts = Counter(chain.from_iterable(postings.get(token, ()) for token in keyword_tokens))
+        n_keywords = len(keyword_tokens)
+        if stats is not None:
+            stats["scored"] = len(counts)
+
+        ranked = []
+        for example_id, intersection in counts.items():
+            if example_id >= limit:
+                continue
+            similarity = intersection / (sizes[example_id] + n_keywords - intersection)
+            if similarity > threshold:
+                ranked.append((example_id, similarity))
+
+        return select_top_k(ranked, top_k)
+
+    def scan(self, keywords: list, top_k: int = 3, threshold: float = 0.5, limit: int = None) -> list:
+        """
+        Ranks the examples by scoring every cached token set.
+
+        This returns the same results as rank, without using the postings. Each score is
+        a membership test of each keyword in the cached token set, for the examples sharing
+        one, plus arithmetic on the cached sizes, so no set is allocated per example.
+
+        Args:
+        ----
+        keywords (list): A list of keywords.
+        top_k (int): The maximum number of examples to return.
+        threshold (float): The similarity an example must exceed to be returned.
+        limit (int, optional): Only the examples with a lower id are ranked, so that examples
+            indexed while ranking are ignored. Defaults to all the indexed examples.
+
+        Returns:
+        -------
+        list: A list of (example_id, similarity) tuples, most similar first.
+        """
+        keyword_tokens = frozenset(keywords)
+        keyword_list = tuple(keyword_tokens)
+        n_keywords = len(keyword_tokens)
+        sizes = self.sizes
+
+        ranked = []
+        for example_id, tokens in enumerate(islice(self.token_sets, limit)):
+            if tokens.isdisjoint(keyword_tokens):
+                continue
+            # Queries have a few keywords, so testing each of them allocates nothing
+            intersection = 0
+            for token in keyword_list:
+                if token in tokens:
+                    intersection += 1
+            similarity = intersection / (sizes[example_id] + n_keywords - intersection)
+            if similarity > threshold:
+                ranked.append((example_id, similarity))
+
+        return select_top_k(ranked, top_k)
+
+    def compile_matrix(self) -> SparseMatrix:
+        """
+        Compiles the examples into a sparse matrix, kept up to date by add.
+
+        Returns:
+        -------
+        SparseMatrix: The compiled matrix.
+        """
+        if self.matrix is None:
+            matrix = SparseMatrix()
+            matrix.add(self.token_sets)
+            self.matrix = matrix
+        return self.matrix
+
+    def compile_ann(self, examples: list):
+        """
+        Embeds and sketches the examples for the ann strategy, kept up to date by add.
+
+        Args:
+        ----
+        examples (list): The list of examples of the context.
+
+        Returns:
+        -------
+        LSHIndex: The compiled index.
+        """
+        if self.ann is None:
+            from .ann_index import LSHIndex
+
+            ann = LSHIndex()
+            ann.add(islice(examples, len(self)))
+            self.ann = ann
+        return self.ann
+
+    def compile_substrings(self, examples: list):
+        """
+        Indexes the character trigrams of the examples, kept up to date by add.
+
+        Args:
+        ----
+        examples (list): The list of examples of the context.
+
+        Returns:
+        -------
+        TrigramIndex: The compiled index.
+        """
+        if self.substrings is None:
+            from .substring_index import TrigramIndex
+
+            substrings = TrigramIndex()
+            substrings.add(islice(examples, len(self)))
+            self.substrings = substrings
+        return self.substrings
@@ -1,16 +1,89 @@
+import os
+import sys
+import threading
+import time
+from itertools import count, islice
+
+from .context_index import ContextIndex
+from .snapshot import ContextSnapshot
+from .tokens import estimate_tokens
+
+
+class _WriteBatch:
+    """
+    A class used to group the writes of a context manager into a single publication.
+
+    While a batch is open, the thread that opened it holds the manager's write lock, and
+    the snapshots of the contexts it changes are published together when the outermost
+    batch closes, so readers never see part of a batch.
+
+    Methods:
+    -------
+    __enter__()
+        Opens the batch.
+    __exit__(*exc_info)
+        Closes the batch and publishes the changed contexts.
+    """
+
+    __slots__ = ("_manager",)
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __enter__(self):
+        manager = self._manager
+        manager._write_lock.acquire()
+        manager._batch_depth += 1
+        return manager
+
+    def __exit__(self, *exc_info):
+        manager = self._manager
+        try:
+            manager._batch_depth -= 1
+            if not manager._batch_depth:
+                pending = manager._pending
+                manager._pending = set()
+                for context_name in pending:
+                    manager._publish(context_name)
+        finally:
+            manager._write_lock.release()
+
+
 class ContextManager:
     """
     A class used to manage contexts and their corresponding examples.
 
+    Contexts can be read by many threads while another writes to them. Writes are
+    serialized by a lock, append to the examples and index of a context, and then
+    publish a ContextSnapshot of the context. Reads use the last published snapshot
+    and take no lock, so they neither wait for writes nor see them half done. Examples
+    appended to a context outside of add_context are picked up by the next read that
+    finds no write in progress.
+
     Attributes:
     ----------
     contexts : dict
-        A dictionary where the keys are context names and the values are lists of examples.
+        A dictionary where the keys are context names and the values are lists of examples,
+        or CompactExamples in compact mode.
+    token_counter : callable
+        The function counting the prompt tokens of each example when it is added.
+    dedup_threshold : float
+        The Jaccard similarity from which an added example is dropped as a near-duplicate
+        of an example of its context, or None to keep every example.
+    dedup_stats : dict
+        The number of examples checked for near-duplicates, the number dropped, and the
+        bytes of example strings that were not stored.
+    vocabulary : Vocabulary
+        The token ids shared by the contexts in compact mode, or None.
+    instrumentation : Instrumentation
+        An optional hook timing rank_examples and told the number of candidates it scores, or None.
 
     Methods:
     -------
-    add_context(context_name, examples)
+    add_context(context_name, examples, metadata)
         Adds a new list of examples for a specific context.
+    ingest(source, chunk_size, progress)
+        Adds examples streamed from an iterable of records or a JSONL file.
     remove_context(context_name)
         Removes a context by name.
     get_context(context_name)
@@ -19,39 +92,174 @@ class ContextManager:
         Lists all available contexts.
     search_context(query)
         Searches for contexts that match a query.
-    filter_contexts(filter_func)
-        Filters contexts using a custom function.
+    search_contexts(queries)
+        Searches for contexts that match each of several queries.
+    filter_contexts(filter_func, where)
+        Filters contexts using a custom function, the metadata of the examples, or both.
+    iter_filter_contexts(filter_func, where)
+        Yields the examples of filter_contexts one at a time, without building lists.
     merge_contexts(other)
-        Merges two context managers into one.
+        Returns a read-only view of the contexts of this context manager followed by those of another.
+    rank_examples(context_name, keywords, top_k, threshold, strategy)
+        Ranks the examples of a context by similarity with the keywords.
+    get_examples(context_name, example_ids)
+        Retrieves examples of a context by id.
+    get_token_sets(context_name)
+        Retrieves the cached token sets of the examples of a context.
+    get_token_counts(context_name, example_ids)
+        Retrieves the cached number of prompt tokens of examples of a context by id.
+    get_metadata(context_name, example_ids)
+        Retrieves the metadata of examples of a context by id.
+    get_version(context_name)
+        Returns the version of a context, which changes whenever the context does.
+    snapshot(context_name)
+        Returns the last published snapshot of a context.
+    batch()
+        Groups writes so that readers see all of them or none.
     """
 
-    def __init__(self):
+    def __init__(self, token_counter: callable = estimate_tokens, dedup_threshold: float = None,
+                 compact: bool = False, instrumentation=None):
         """
         Initializes an empty context manager.
 
+        Args:
+        ----
+        token_counter (callable): A function returning the number of prompt tokens of an example,
+            called once per example when it is added. Defaults to a fast estimate; pass a
+            synapsense.tokens.TiktokenCounter to count exactly.
+        dedup_threshold (float, optional): If given, add_context drops every example whose token
+            set has at least this Jaccard similarity with an example already in its context.
+        compact (bool): Whether to store the examples of each context in a single UTF-8 buffer
+            and index them as runs of interned token ids, which takes several times less
+            memory than strings and token sets, at the cost of decoding examples on access.
+        instrumentation (Instrumentation, optional): A hook told the duration of each call to
+            rank_examples and the number of examples it scores, such as a synapsense.Metrics.
+            Nothing is measured if omitted.
+
         Returns:
         -------
         None
         """
         self.contexts = {}
+        self.token_counter = token_counter
+        self._indexes = {}
+        self._versions = {}
+        self._version_counter = count(1)
+        self._snapshots = {}
+        self._metadata = {}
+        self._write_lock = threading.RLock()
+        self._batch_depth = 0
+        self._pending = set()
+        self.dedup_threshold = dedup_threshold
+        self.dedup_stats = {"checked": 0, "duplicates": 0, "bytes_saved": 0}
+        self.instrumentation = instrumentation
+        self._deduplicators = {}
+        if dedup_threshold is not None and not 0 < dedup_threshold <= 1:
+            raise ValueError("dedup_threshold must be in (0, 1]")
+        self.vocabulary = None
+        if compact:
+            from .compact import Vocabulary
 
-    def add_context(self, context_name: str, examples: list):
+            self.vocabulary = Vocabulary()
+
+    def add_context(self, context_name: str, examples: list, metadata: list = None):
         """
         Adds a new list of examples for a specific context.
 
+        The examples are copied into the context and indexed for retrieval, which
+        tokenizes each of them once and counts its prompt tokens once. If the manager
+        deduplicates, near-duplicates of earlier examples of the context, including earlier
+        examples of the same list, are dropped and only the first copy is kept.
+
         Args:
         ----
         context_name (str): The name of the context.
         examples (list): A list of examples for the context.
+        metadata (list, optional): The metadata of each example, a dictionary of fields such as
+            tags, lang, source or timestamp, or None. The fields are indexed for filter_contexts.
 
         Returns:
         -------
         None
+
+        Raises:
+        ------
+        ValueError: If metadata is given and does not have one entry per example.
+        TypeError: If a metadata entry is not a dictionary or None, or has an unhashable value.
         """
-        if context_name in self.contexts:
-            self.contexts[context_name].extend(examples)
-        else:
-            self.contexts[context_name] = examples
+        with self._write_lock:
+            if metadata is not None:
+                examples = list(examples)
+                metadata = list(metadata)
+                if len(metadata) != len(examples):
+                    raise ValueError("metadata must have one entry per example")
+            if self.dedup_threshold is not None:
+                examples = list(examples)
+                kept = self._deduplicate(context_name, examples)
+                examples = [examples[position] for position in kept]
+                if metadata is not None:
+                    metadata = [metadata[position] for position in kept]
+            stored = self.contexts.get(context_name)
+            # Metadata is indexed first, as it may be rejected before anything else changes
+            if metadata is not None:
+                self._add_metadata(context_name, metadata, 0 if stored is None else len(stored))
+            if stored is None:
+                stored = self._new_examples()
+                # Readers may be iterating over the contexts, so the dictionary is replaced, not changed
+                self.contexts = {**self.contexts, context_name: stored}
+            stored.extend(examples)
+            self._sync_index(context_name)
+
+    def ingest(self, source, chunk_size: int = 10000, progress: callable = None) -> dict:
+        """
+        Adds examples streamed from an iterable of records or a JSONL file.
+
+        Each record is a dictionary with a "context" and an "example" key, and optionally a
+        "metadata" key with the metadata of the example, as in add_context. Records are
+        consumed in chunks of at most chunk_size, and each chunk is added with add_context,
+        so indexes are updated incrementally and memory use does not grow with the size
+        of the input beyond the stored examples themselves.
+
+        Args:
+        ----
+        source (iterable or str): An iterable of records, or the path of a JSONL file with one record per line.
+        chunk_size (int): The maximum number of records held in memory at once.
+        progress (callable, optional): A function called after each chunk with the number of
+            records ingested so far and the ingestion rate in records per second.
+
+        Returns:
+        -------
+        dict: The number of records ingested, the elapsed seconds and the rate in records per second.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            import json
+
+            with open(source, encoding="utf-8") as lines:
+                records = (json.loads(line) for line in lines if line.strip())
+                return self.ingest(records, chunk_size, progress)
+
+        records = iter(source)
+        rows = 0
+        start = time.perf_counter()
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            grouped = {}
+            for record in chunk:
+                examples, metadata = grouped.setdefault(record["context"], ([], []))
+                examples.append(record["example"])
+                metadata.append(record.get("metadata"))
+            del chunk
+            for context_name, (examples, metadata) in grouped.items():
+                rows += len(examples)
+                self.add_context(context_name, examples, metadata if any(metadata) else None)
+            if progress is not None:
+                progress(rows, rows / max(time.perf_counter() - start, 1e-9))
+
+        elapsed = time.perf_counter() - start
+        return {"rows": rows, "seconds": elapsed, "rows_per_second": rows / elapsed if elapsed > 0 else 0.0}
 
     def remove_context(self, context_name: str):
         """
@@ -65,7 +273,13 @@ class ContextManager:
         -------
         None
         """
-        self.contexts.pop(context_name, None)
+        with self._write_lock:
+            self.contexts = {name: examples for name, examples in self.contexts.items() if name != context_name}
+            self._indexes.pop(context_name, None)
+            self._versions.pop(context_name, None)
+            self._deduplicators.pop(context_name, None)
+            self._metadata.pop(context_name, None)
+            self._publish(context_name)
 
     def get_context(self, context_name: str) -> list:
         """
@@ -95,43 +309,161 @@ class ContextManager:
         """
         Searches for contexts that match a query.
 
+        Queries of at least three characters only check the examples containing all of
+        their character trigrams, found in a trigram index of each context. The index is
+        built by the first such search of a context and kept up to date by add_context.
+
         Args:
         ----
         query (str): The query to search for.
 
         Returns:
         -------
-        list: A list of tuples containing the context name and example.
+        list: A list of tuples containing the context name and example, for every example
+            containing the query, in the order of the contexts and then of the examples.
         """
-        results = []
-        for context_name, examples in self.contexts.items():
-            for example in examples:
-                if query in example:
-                    results.append((context_name, example))
+        return self.search_contexts([query])[0]
+
+    def search_contexts(self, queries: list) -> list:
+        """
+        Searches for contexts that match each of several queries.
+
+        Each context is read once for the whole batch: repeated queries are searched
+        once, and the queries too short for the trigram index are all checked in a
+        single pass over the examples.
+
+        Args:
+        ----
+        queries (list): The queries to search for.
+
+        Returns:
+        -------
+        list: For each query, the list of tuples that search_context returns for it.
+        """
+        results = [[] for _ in queries]
+        for context_name in self.contexts:
+            snapshot = self.snapshot(context_name)
+            if snapshot is None:
+                continue
+            for result, examples in zip(results, self._search(context_name, snapshot, queries)):
+                result.extend((context_name, example) for example in examples)
         return results
 
-    def filter_contexts(self, filter_func: callable) -> dict:
+    def _search(self, context_name: str, snapshot: ContextSnapshot, queries: list) -> list:
         """
-        Filters contexts using a custom function.
+        Finds the examples of a snapshot of a context that contain each of several queries.
 
         Args:
         ----
-        filter_func (callable): A function that takes an example and returns a boolean.
+        context_name (str): The name of the context.
+        snapshot (ContextSnapshot): A snapshot of the context.
+        queries (list): The queries.
+
+        Returns:
+        -------
+        list: For each query, the examples containing it, in order.
+        """
+        from .substring_index import GRAM
+
+        index = snapshot.index
+        examples = snapshot.examples
+        matches = {}
+        scanned = []
+        for query in queries:
+            if query in matches:
+                continue
+            if index is None or len(query) < GRAM:
+                matches[query] = []
+                scanned.append(query)
+                continue
+            if index.substrings is None:
+                with self._write_lock:
+                    index.compile_substrings(examples)
+            candidates = (examples[example_id] for example_id in index.substrings.candidates(query, snapshot.size))
+            matches[query] = [example for example in candidates if query in example]
+        if scanned:
+            for example in snapshot:
+                for query in scanned:
+                    if query in example:
+                        matches[query].append(example)
+        return [matches[query] for query in queries]
+
+    def filter_contexts(self, filter_func: callable = None, where: dict = None) -> dict:
+        """
+        Filters contexts using a custom function, the metadata of the examples, or both.
+
+        Conditions on metadata are looked up in the metadata index of each context, so
+        only the matching examples are read. The function, if given, is then called on
+        each of them.
+
+        Args:
+        ----
+        filter_func (callable, optional): A function that takes an example and returns a boolean.
+        where (dict, optional): Conditions on the metadata fields of the examples, as in
+            MetadataIndex.select: for example {"lang": "pt"}, {"tags": ["faq", "billing"]} or
+            {"timestamp": lambda t: t >= since}. Examples without the fields never match.
 
         Returns:
         -------
         dict: A dictionary of filtered contexts.
         """
         filtered_contexts = {}
-        for context_name, examples in self.contexts.items():
-            filtered_examples = [example for example in examples if filter_func(example)]
-            if filtered_examples:
-                filtered_contexts[context_name] = filtered_examples
+        for context_name, example in self.iter_filter_contexts(filter_func, where):
+            filtered_contexts.setdefault(context_name, []).append(example)
         return filtered_contexts
 
-    def merge_contexts(self, other: 'ContextManager') -> 'ContextManager':
+    def iter_filter_contexts(self, filter_func: callable = None, where: dict = None):
+        """
+        Yields the examples of filter_contexts one at a time, without building lists.
+
+        Args:
+        ----
+        filter_func (callable, optional): A function that takes an example and returns a boolean.
+        where (dict, optional): Conditions on the metadata fields of the examples, as in filter_contexts.
+
+        Yields:
+        ------
+        tuple: The context name and example of each matching example, in the order of the
+            contexts and then of the examples.
+        """
+        for context_name in self.contexts:
+            snapshot = self.snapshot(context_name)
+            if snapshot is None:
+                continue
+            for example in self._select(context_name, snapshot, where):
+                if filter_func is None or filter_func(example):
+                    yield context_name, example
+
+    def _select(self, context_name: str, snapshot: ContextSnapshot, where: dict):
         """
-        Merges two context managers into one.
+        Returns the examples of a snapshot of a context whose metadata matches conditions.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        snapshot (ContextSnapshot): A snapshot of the context.
+        where (dict): Conditions on the metadata fields of the examples, or None to select all of them.
+
+        Returns:
+        -------
+        iterator: The matching examples, in order.
+        """
+        if where is None:
+            return iter(snapshot)
+        if snapshot.metadata is None:
+            return iter(())
+        examples = snapshot.examples
+        return map(examples.__getitem__, snapshot.metadata.select(where, snapshot.size))
+
+    def merge_contexts(self, other: 'ContextManager'):
+        """
+        Returns a read-only view of the contexts of this context manager followed by those of another.
+
+        Neither context manager is changed, and no example is copied: each context of the
+        view reads the examples of this context manager, then those of the other, and is
+        ranked with the indexes of both. Call materialize on the view to get a new
+        ContextManager holding the merged contexts. The view reports to the instrumentation
+        of this context manager, or else to that of the other.
 
         Args:
         ----
@@ -139,17 +471,389 @@ class ContextManager:
 
         Returns:
         -------
-        ContextManager: A new context manager containing the merged contexts.
+        ContextOverlay: The merged view.
+        """
+        from .overlay import ContextOverlay
+
+        instrumentation = self.instrumentation if self.instrumentation is not None else other.instrumentation
+        return ContextOverlay([self, other], instrumentation)
+
+    def rank_examples(self, context_name: str, keywords: list, top_k: int = 3, threshold: float = 0.5,
+                      strategy: str = "inverted") -> list:
+        """
+        Ranks the examples of a context by similarity with the keywords.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        keywords (list): A list of keywords.
+        top_k (int): The maximum number of examples to return.
+        threshold (float): The similarity an example must exceed to be returned.
+        strategy (str): "inverted" to score only the candidates found in the inverted index,
+            "scan" to score the cached token sets of every example, "sparse" to score
+            every example in one sparse matrix-vector product, or "ann" to rank by the cosine
+            similarity of hashed character n-gram embeddings, which also matches inflections
+            and misspellings. "ann" scans compact sketches of every embedding, in time linear in
+            the size of the context, and scores the closest ones exactly. "sparse" and "ann"
+            require NumPy.
+
+        Returns:
+        -------
+        list: A list of (example_id, similarity) tuples, most similar first.
+        """
+        hook = self.instrumentation
+        if hook is not None:
+            started = time.perf_counter()
+        snapshot = self.snapshot(context_name)
+        if snapshot is None:
+            ranked = []
+        else:
+            ranked = self._rank(context_name, snapshot, keywords, top_k, threshold, strategy)
+        if hook is not None:
+            hook.timing("rank_examples", time.perf_counter() - started)
+        return ranked
+
+    def _rank(self, context_name: str, snapshot: ContextSnapshot, keywords: list, top_k: int, threshold: float,
+              strategy: str) -> list:
+        """
+        Ranks the examples of a snapshot of a context by similarity with the keywords.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        snapshot (ContextSnapshot): A snapshot of the context.
+        keywords (list): A list of keywords.
+        top_k (int): The maximum number of examples to return.
+        threshold (float): The similarity an example must exceed to be returned.
+        strategy (str): The retrieval strategy, as in rank_examples.
+
+        Returns:
+        -------
+        list: A list of (example_id, similarity) tuples of examples of the snapshot, most similar first.
+        """
+        index = snapshot.index
+        hook = self.instrumentation
+        if strategy == "inverted":
+            if hook is None:
+                return index.rank(keywords, top_k, threshold, snapshot.size)
+            stats = {}
+            ranked = index.rank(keywords, top_k, threshold, snapshot.size, stats)
+            hook.observe("candidates_scored", stats["scored"])
+            return ranked
+        if strategy == "scan":
+            ranked = index.scan(keywords, top_k, threshold, snapshot.size)
+            scored = snapshot.size
+        elif strategy == "sparse":
+            if index.matrix is None:
+                with self._write_lock:
+                    index.compile_matrix()
+            ranked = index.matrix.rank(keywords, top_k, threshold, snapshot.size)
+            scored = snapshot.size
+        elif strategy == "ann":
+            if index.ann is None:
+                with self._write_lock:
+                    index.compile_ann(snapshot.examples)
+            ranked = index.ann.rank(" ".join(keywords), top_k, threshold, snapshot.size)
+            # Only the examples with the closest sketches are scored exactly
+            scored = min(snapshot.size, max(index.ann.candidates, top_k))
+        else:
+            raise ValueError(f"Unknown retrieval strategy: {strategy}")
+        if hook is not None:
+            hook.observe("candidates_scored", scored)
+        return ranked
+
+    def get_examples(self, context_name: str, example_ids: list) -> list:
+        """
+        Retrieves examples of a context by id.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        example_ids (list): A list of example ids, as returned by rank_examples.
+
+        Returns:
+        -------
+        list: The examples with the given ids, in the same order.
+        """
+        snapshot = self.snapshot(context_name)
+        if snapshot is None:
+            raise KeyError(context_name)
+        examples = snapshot.examples
+        return [examples[example_id] for example_id in example_ids]
+
+    def get_token_sets(self, context_name: str) -> list:
+        """
+        Retrieves the cached token sets of the examples of a context.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        list: The frozen token set of each example, in the same order as get_context.
+        """
+        snapshot = self.snapshot(context_name)
+        if snapshot is None:
+            return []
+        return snapshot.index.token_sets
+
+    def get_token_counts(self, context_name: str, example_ids: list) -> list:
+        """
+        Retrieves the cached number of prompt tokens of examples of a context by id.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        example_ids (list): A list of example ids, as returned by rank_examples.
+
+        Returns:
+        -------
+        list: The number of prompt tokens of each example, in the same order as the ids.
+        """
+        snapshot = self.snapshot(context_name)
+        if snapshot is None:
+            raise KeyError(context_name)
+        token_counts = snapshot.index.token_counts
+        return [token_counts[example_id] for example_id in example_ids]
+
+    def get_metadata(self, context_name: str, example_ids: list) -> list:
+        """
+        Retrieves the metadata of examples of a context by id.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        example_ids (list): A list of example ids, as returned by rank_examples.
+
+        Returns:
+        -------
+        list: The metadata of each example, or None for examples without metadata, in the same
+            order as the ids.
+        """
+        snapshot = self.snapshot(context_name)
+        if snapshot is None:
+            raise KeyError(context_name)
+        if snapshot.metadata is None:
+            return [None] * len(example_ids)
+        return [snapshot.metadata.get(example_id) for example_id in example_ids]
+
+    def get_version(self, context_name: str) -> int:
+        """
+        Returns the version of a context, which changes whenever the context does.
+
+        Versions are drawn from a counter shared by all contexts of the manager, so a
+        context that is removed and added again never gets a version it had before.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        int: The version of the context, or 0 if the context does not exist.
         """
-        merged_contexts = {}
-        for context_name, examples in self.contexts.items():
-            merged_contexts[context_name] = examples
-        for context_name, examples in other.contexts.items():
-            if context_name in merged_contexts:
-                merged_contexts[context_name].extend(examples)
+        snapshot = self.snapshot(context_name)
+        return 0 if snapshot is None else snapshot.version
+
+    def snapshot(self, context_name: str) -> ContextSnapshot:
+        """
+        Returns the last published snapshot of a context.
+
+        The snapshot is a consistent, read-only view of the context, which later writes do
+        not change. Taking it does not wait for writes in progress.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        ContextSnapshot: The snapshot, or None if the context does not exist.
+        """
+        snapshot = self._snapshots.get(context_name)
+        examples = self.contexts.get(context_name)
+        if snapshot is not None and snapshot.examples is examples and snapshot.size == len(examples):
+            return snapshot
+        # The context was changed outside of add_context, or is being written: catch up
+        # unless a writer holds the lock, in which case it publishes the changes itself
+        if not self._write_lock.acquire(blocking=False):
+            return snapshot
+        try:
+            examples = self.contexts.get(context_name)
+            if examples is None:
+                self._publish(context_name)
+            else:
+                if snapshot is not None and snapshot.examples is not examples:
+                    # The list of examples was replaced: index the new one from scratch
+                    self._indexes.pop(context_name, None)
+                    self._versions.pop(context_name, None)
+                    self._deduplicators.pop(context_name, None)
+                    self._metadata.pop(context_name, None)
+                self._sync_index(context_name)
+            return self._snapshots.get(context_name)
+        finally:
+            self._write_lock.release()
+
+    def batch(self) -> '_WriteBatch':
+        """
+        Groups writes so that readers see all of them or none.
+
+        Within a with block on the returned batch, the calling thread holds the write lock,
+        and the contexts it changes are published together when the block exits.
+
+        Returns:
+        -------
+        _WriteBatch: The batch, to use in a with statement.
+        """
+        return _WriteBatch(self)
+
+    def _publish(self, context_name: str):
+        """
+        Publishes a new snapshot of a context, or defers it to the end of the current batch.
+
+        Must be called with the write lock held.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        None
+        """
+        if self._batch_depth:
+            self._pending.add(context_name)
+            return
+        examples = self.contexts.get(context_name)
+        if examples is None:
+            self._snapshots.pop(context_name, None)
+        else:
+            self._snapshots[context_name] = ContextSnapshot(examples, len(examples), self._versions[context_name],
+                                                            self._indexes.get(context_name),
+                                                            self._metadata.get(context_name))
+
+    def _add_metadata(self, context_name: str, metadata: list, start: int):
+        """
+        Indexes the metadata of examples about to be added to a context.
+
+        Must be called with the write lock held, before the examples are published.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        metadata (list): The metadata of each example, or None.
+        start (int): The id of the first example.
+
+        Returns:
+        -------
+        None
+
+        Raises:
+        ------
+        TypeError: If a metadata entry cannot be indexed, in which case nothing is indexed.
+        """
+        index = self._metadata.get(context_name)
+        if index is not None:
+            index.add(metadata, start)
+        elif any(metadata):
+            from .metadata_index import MetadataIndex
+
+            index = MetadataIndex()
+            index.add(metadata, start)
+            self._metadata[context_name] = index
+
+    def _new_examples(self):
+        """
+        Returns an empty store for the examples of a new context.
+
+        Returns:
+        -------
+        list or CompactExamples: An empty list, or empty CompactExamples in compact mode.
+        """
+        if self.vocabulary is None:
+            return []
+        from .compact import CompactExamples
+
+        return CompactExamples()
+
+    def _sync_index(self, context_name: str) -> ContextIndex:
+        """
+        Brings the index of a context up to date with its examples, publishes it, and returns it.
+
+        Must be called with the write lock held.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        ContextIndex: The index of the context.
+        """
+        index = self._indexes.get(context_name)
+        if index is None:
+            if self.vocabulary is None:
+                index = ContextIndex(self.token_counter)
+            else:
+                from .compact import CompactIndex
+
+                index = CompactIndex(self.vocabulary, self.token_counter)
+            self._indexes[context_name] = index
+        examples = self.contexts.get(context_name, ())
+        if len(index) < len(examples) or context_name not in self._versions:
+            index.add(examples, len(index))
+            self._versions[context_name] = next(self._version_counter)
+            self._publish(context_name)
+        return index
+
+    def _deduplicate(self, context_name: str, examples: list) -> list:
+        """
+        Drops the examples that are near-duplicates of earlier examples of a context.
+
+        Candidates are looked up in a MinHash LSH index of the context, in time independent
+        of its number of examples, and checked with the exact Jaccard similarity of their
+        token sets, so an example is never dropped for a signature collision.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        examples (list): The examples to add to the context.
+
+        Returns:
+        -------
+        list: The positions of the examples to keep, in ascending order.
+        """
+        token_sets = self._sync_index(context_name).token_sets if context_name in self.contexts else []
+        lsh = self._deduplicators.get(context_name)
+        if lsh is None:
+            from .dedup import MinHashLSH
+
+            lsh = self._deduplicators[context_name] = MinHashLSH(self.dedup_threshold)
+        for example_id, signature in enumerate(lsh.signatures(token_sets[len(lsh):]), len(lsh)):
+            lsh.insert(example_id, signature)
+
+        threshold = self.dedup_threshold
+        stats = self.dedup_stats
+        start = len(token_sets)
+        new_sets = [frozenset(example.split()) for example in examples]
+        kept = []
+        kept_sets = []
+        for position, (example, tokens, signature) in enumerate(zip(examples, new_sets, lsh.signatures(new_sets))):
+            stats["checked"] += 1
+            for candidate in lsh.candidates(signature):
+                other = token_sets[candidate] if candidate < start else kept_sets[candidate - start]
+                intersection = len(tokens & other)
+                union = len(tokens) + len(other) - intersection
+                if union == 0 or intersection / union >= threshold:
+                    stats["duplicates"] += 1
+                    stats["bytes_saved"] += sys.getsizeof(example)
+                    break
             else:
-                merged_contexts[context_name] = examples
-        return ContextManager(**merged_contexts)
+                lsh.insert(start + len(kept), signature)
+                kept.append(position)
+                kept_sets.append(tokens)
+        return kept
 
     def __str__(self) -> str:
         """
@@ -1,36 +1,81 @@
+import time
+from collections import OrderedDict
+
+from .online_stats import IncrementalTopK, RunningStats, summarize_batch
+
+# The fields of a batch summary, in the order RunningStats.merge takes them
+_SUMMARY = ("count", "mean", "m2", "decay", "weighted", "first", "last")
+
+
 class ContextOptimizer:
     """
     A class used to optimize the list of contextual examples based on their performance.
 
+    Every evaluation updates running statistics (count, mean, exponential moving average
+    and variance) of its (example, query) pair and of its example in constant time, and
+    the best performing examples are tracked incrementally, so adjusting the contexts
+    does not re-sort all examples.
+
     Attributes:
     ----------
     example_performance : dict
-        A dictionary storing the performance metrics for each example.
+        A dictionary storing the ranking score of each example, its statistic named by rank_by.
     contexts : list
         A list of contextual examples.
+    top_k : int
+        The number of best performing examples kept by adjust_contexts.
+    rank_by : str
+        The statistic examples are ranked by: "mean", "ema" or "last".
+    ema_alpha : float
+        The smoothing factor of the exponential moving averages.
+    max_entries : int
+        The maximum number of (example, query) pairs tracked, or None for no limit.
 
     Methods:
     -------
     evaluate_relevance(example, query, performance_metric)
         Evaluates the relevance of an example and updates its performance metrics.
+    evaluate_many(examples, performance_metrics, queries)
+        Evaluates a batch of examples and adjusts the contexts once.
     adjust_contexts()
         Refines the list of examples based on their performance metrics.
-    experiment(new_context)
+    experiment(candidates, scorer, queries, min_evaluations, eta, executor, workers)
         Allows users to experiment with different contexts and measures their impact.
     get_optimized_context()
         Returns the optimized list of contextual examples.
+    get_stats(example, query)
+        Returns the running statistics of an example, or of an (example, query) pair.
     """
 
-    def __init__(self):
+    def __init__(self, top_k: int = 10, rank_by: str = "mean", ema_alpha: float = 0.1, max_entries: int = None):
         """
         Initializes an empty context optimizer.
 
+        Args:
+        ----
+        top_k (int): The number of best performing examples kept by adjust_contexts.
+        rank_by (str): The statistic examples are ranked by: "mean", "ema" or "last".
+        ema_alpha (float): The smoothing factor of the exponential moving averages.
+        max_entries (int, optional): The maximum number of (example, query) pairs tracked. When it is
+            exceeded, the least recently evaluated pair is dropped, and so is its example once it
+            has no pair left.
+
         Returns:
         -------
         None
         """
+        if rank_by not in ("mean", "ema", "last"):
+            raise ValueError(f"Unknown statistic to rank by: {rank_by}")
         self.example_performance = {}  # store performance metrics for each example
         self.contexts = []  # store the list of contextual examples
+        self.top_k = top_k
+        self.rank_by = rank_by
+        self.ema_alpha = ema_alpha
+        self.max_entries = max_entries
+        self._example_stats = {}
+        self._pair_stats = OrderedDict()  # least recently evaluated first
+        self._pair_counts = {}  # example -> number of tracked pairs
+        self._top = IncrementalTopK(top_k)
 
     def evaluate_relevance(self, example: str, query: str, performance_metric: float):
         """
@@ -47,8 +92,160 @@ class ContextOptimizer:
         None
         """
         # assess the effectiveness of the example in improving model performance
-        # update the performance metrics for the example
-        self.example_performance[example] = performance_metric
+        # update the performance metrics for the example and the (example, query) pair
+        self._pair(example, query).update(performance_metric, self.ema_alpha)
+        example_stats = self._example(example)
+        example_stats.update(performance_metric, self.ema_alpha)
+        self._rank(example, example_stats)
+        self._enforce_max_entries()
+
+    def evaluate_many(self, examples, performance_metrics, queries=None):
+        """
+        Evaluates a batch of examples and adjusts the contexts once.
+
+        The input is columnar: lists or NumPy arrays with one item per evaluation, in the
+        order they were observed. With NumPy installed, the whole batch is summarized per
+        example and per (example, query) pair in one vectorized pass and folded into the
+        running statistics, which gives the same statistics as evaluating the items one by
+        one, up to floating-point rounding. The memory cap is applied after the batch.
+
+        Args:
+        ----
+        examples (list or numpy.ndarray): The evaluated examples, or their ids.
+        performance_metrics (list or numpy.ndarray): The performance metric of each evaluation.
+        queries (list or numpy.ndarray or str, optional): The query of each evaluation, or a single
+            query shared by the whole batch.
+
+        Returns:
+        -------
+        None
+        """
+        if len(examples) != len(performance_metrics) or (
+                queries is not None and not isinstance(queries, str) and len(queries) != len(examples)):
+            raise ValueError("examples, performance_metrics and queries must have the same length")
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+
+        if not len(examples):
+            pass
+        elif np is None:
+            self._fold_sequentially(examples, performance_metrics, queries)
+        else:
+            self._fold_vectorized(np, examples, performance_metrics, queries)
+        self._enforce_max_entries()
+        self.adjust_contexts()
+
+    def _fold_sequentially(self, examples, performance_metrics, queries):
+        """
+        Folds a batch into the statistics item by item, ranking each example once.
+        """
+        if queries is None or isinstance(queries, str):
+            queries = [queries] * len(examples)
+        touched = {}
+        for example, query, performance_metric in zip(examples, queries, performance_metrics):
+            self._pair(example, query).update(performance_metric, self.ema_alpha)
+            example_stats = touched.get(example)
+            if example_stats is None:
+                example_stats = touched[example] = self._example(example)
+            example_stats.update(performance_metric, self.ema_alpha)
+        for example, example_stats in touched.items():
+            self._rank(example, example_stats)
+
+    def _fold_vectorized(self, np, examples, performance_metrics, queries):
+        """
+        Folds a batch into the statistics with one summary per example and per (example, query) pair.
+        """
+        values = np.asarray(performance_metrics, dtype=np.float64)
+        example_keys, example_codes = np.unique(np.asarray(examples), return_inverse=True)
+        example_keys = example_keys.tolist()
+        if queries is None or isinstance(queries, str):
+            query_keys, query_codes = [queries], np.zeros(len(values), dtype=np.int64)
+        else:
+            query_keys, query_codes = np.unique(np.asarray(queries), return_inverse=True)
+            query_keys = query_keys.tolist()
+        pair_ids, pair_codes = np.unique(example_codes * len(query_keys) + query_codes, return_inverse=True)
+
+        # Pairs are folded in order of their last evaluation, to keep the least recently evaluated first
+        summary = summarize_batch(pair_codes.ravel(), values, self.ema_alpha)
+        order = np.argsort(summary["last_index"])
+        n_queries = len(query_keys)
+        for pair_id, *batch in zip(pair_ids[order].tolist(), *(summary[name][order].tolist() for name in _SUMMARY)):
+            example_code, query_code = divmod(pair_id, n_queries)
+            self._pair(example_keys[example_code], query_keys[query_code]).merge(*batch)
+
+        # Examples are folded in order of their first evaluation, which breaks ties in the ranking
+        summary = summarize_batch(example_codes.ravel(), values, self.ema_alpha)
+        order = np.argsort(summary["first_index"])
+        for example_code, *batch in zip(order.tolist(), *(summary[name][order].tolist() for name in _SUMMARY)):
+            example = example_keys[example_code]
+            example_stats = self._example(example)
+            example_stats.merge(*batch)
+            self._rank(example, example_stats)
+
+    def _pair(self, example, query) -> RunningStats:
+        """
+        Returns the statistics of an (example, query) pair, marking it as the most recently evaluated.
+        """
+        pair = (example, query)
+        pair_stats = self._pair_stats.get(pair)
+        if pair_stats is None:
+            pair_stats = self._pair_stats[pair] = RunningStats()
+            self._pair_counts[example] = self._pair_counts.get(example, 0) + 1
+        else:
+            self._pair_stats.move_to_end(pair)
+        return pair_stats
+
+    def _example(self, example) -> RunningStats:
+        """
+        Returns the statistics of an example.
+        """
+        example_stats = self._example_stats.get(example)
+        if example_stats is None:
+            example_stats = self._example_stats[example] = RunningStats()
+        return example_stats
+
+    def _enforce_max_entries(self):
+        """
+        Drops the least recently evaluated pairs until at most max_entries are tracked.
+        """
+        if self.max_entries is not None:
+            while len(self._pair_stats) > self.max_entries:
+                self._evict_oldest_pair()
+
+    def _rank(self, example: str, stats: RunningStats):
+        """
+        Updates the ranking score of an example from its statistics.
+
+        Args:
+        ----
+        example (str): The example.
+        stats (RunningStats): The statistics of the example.
+
+        Returns:
+        -------
+        None
+        """
+        score = getattr(stats, self.rank_by)
+        self.example_performance[example] = score
+        self._top.update(example, score)
+
+    def _evict_oldest_pair(self):
+        """
+        Drops the least recently evaluated (example, query) pair, and its example if it has no pair left.
+
+        Returns:
+        -------
+        None
+        """
+        (example, _), _ = self._pair_stats.popitem(last=False)
+        self._pair_counts[example] -= 1
+        if not self._pair_counts[example]:
+            del self._pair_counts[example]
+            del self._example_stats[example]
+            del self.example_performance[example]
+            self._top.remove(example)
 
     def adjust_contexts(self):
         """
@@ -59,29 +256,100 @@ class ContextOptimizer:
         None
         """
         # automatically refine the list of examples based on feedback and performance metrics
-        sorted_examples = sorted(self.example_performance, key=self.example_performance.get, reverse=True)
-        self.contexts = sorted_examples[:10]  # keep only the top 10 performing examples
+        if self._top.k != self.top_k:
+            # top_k was changed since the last adjustment; rebuild the top-k structure
+            self._top = IncrementalTopK(self.top_k)
+            for example, score in self.example_performance.items():
+                self._top.update(example, score)
+        # keep only the top k performing examples; ties keep the order in which examples were first evaluated
+        self.contexts = self._top.top()
 
-    def experiment(self, new_context: list):
+    def experiment(self, candidates: list, scorer: callable, queries: list, min_evaluations: int = 4,
+                   eta: int = 2, executor="thread", workers: int = 4) -> list:
         """
         Allows users to experiment with different contexts and measures their impact.
 
+        The candidate contexts are compared by successive halving: every surviving candidate
+        is scored on the next queries, concurrently, and only the best 1 / eta of them go on
+        to the next round, which scores eta times as many queries. Losing candidates thus
+        stop using the evaluation budget early, and the winner is scored on all the queries
+        (or as many as the rounds reach). The round that uses the last queries keeps only
+        the best candidate, so there is a single winner whenever a query is scored.
+
         Args:
         ----
-        new_context (list): The new context to experiment with.
+        candidates (list): The candidate contexts, each a list of examples.
+        scorer (callable): A function taking a context and a query and returning a score,
+            higher being better. It typically runs a model, or a local stub of one.
+        queries (list): The queries to score the candidates on, in the order they are used.
+        min_evaluations (int): The number of queries each candidate is scored on in the first round.
+        eta (int): The factor by which the candidates are reduced, and the queries per round
+            increased, after each round.
+        executor (str or concurrent.futures.Executor): "thread" or "process" to use a pool of
+            that kind, or an executor to use. A process pool needs a picklable scorer.
+        workers (int): The number of workers of the pool created for "thread" or "process".
 
         Returns:
         -------
-        None
+        list: A dictionary per candidate, in the order of the candidates, with its mean score,
+            its number of evaluations, the seconds spent scoring it and the round it was
+            eliminated in (None for the winner).
+
+        Raises:
+        ------
+        ValueError: If min_evaluations is less than 1, eta is less than 2, or the executor is unknown.
         """
         # allow users to experiment with different contexts and measure their impact
-        # temporarily replace the current context with the new one
-        original_context = self.contexts
-        self.contexts = new_context
-        # run the model with the new context and measure the performance
-        # ...
-        # restore the original context
-        self.contexts = original_context
+        from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+        if min_evaluations < 1:
+            raise ValueError("min_evaluations must be at least 1")
+        if eta < 2:
+            raise ValueError("eta must be at least 2")
+        results = [{"candidate": i, "mean_score": None, "evaluations": 0, "wall_time": 0.0, "eliminated_in_round": None}
+                   for i in range(len(candidates))]
+        totals = [0.0] * len(candidates)
+        if isinstance(executor, Executor):
+            pool, owns_pool = executor, False
+        elif executor == "thread":
+            pool, owns_pool = ThreadPoolExecutor(max_workers=workers), True
+        elif executor == "process":
+            pool, owns_pool = ProcessPoolExecutor(max_workers=workers), True
+        else:
+            raise ValueError(f"Unknown executor: {executor}")
+
+        try:
+            surviving = list(range(len(candidates)))
+            used = 0
+            n_queries = min_evaluations
+            round_number = 0
+            while surviving and used < len(queries):
+                # run the model with each surviving context and measure the performance
+                batch = queries[used:used + n_queries]
+                futures = {i: pool.submit(_score_queries, scorer, candidates[i], batch) for i in surviving}
+                for i, future in futures.items():
+                    scores, seconds = future.result()
+                    totals[i] += sum(scores)
+                    results[i]["evaluations"] += len(scores)
+                    results[i]["wall_time"] += seconds
+                    results[i]["mean_score"] = totals[i] / results[i]["evaluations"]
+                used += len(batch)
+                n_queries *= eta
+
+                if len(surviving) == 1:
+                    continue
+                # keep the best 1 / eta candidates, or only the best once the queries run out;
+                # ties keep the earlier candidate
+                keep = 1 if used >= len(queries) else max(1, len(surviving) // eta)
+                surviving.sort(key=lambda i: -results[i]["mean_score"])
+                for i in surviving[keep:]:
+                    results[i]["eliminated_in_round"] = round_number
+                surviving = sorted(surviving[:keep])
+                round_number += 1
+        finally:
+            if owns_pool:
+                pool.shutdown()
+        return results
 
     def get_optimized_context(self) -> list:
         """
@@ -92,4 +360,39 @@ class ContextOptimizer:
         list: The optimized list of contextual examples.
         """
         # return the optimized list of contextual examples
-        return self.contexts
\ No newline at end of file
+        return self.contexts
+
+    def get_stats(self, example: str, query: str = None) -> dict:
+        """
+        Returns the running statistics of an example, or of an (example, query) pair.
+
+        Args:
+        ----
+        example (str): The example.
+        query (str, optional): The query. When omitted, the statistics of the example over all queries are returned.
+
+        Returns:
+        -------
+        dict: The count, mean, EMA, variance and last value, or None if nothing is tracked.
+        """
+        stats = self._example_stats.get(example) if query is None else self._pair_stats.get((example, query))
+        return None if stats is None else stats.as_dict()
+
+
+def _score_queries(scorer: callable, context: list, queries: list) -> tuple:
+    """
+    Scores a context on a list of queries, in a worker of ContextOptimizer.experiment.
+
+    Args:
+    ----
+    scorer (callable): A function taking a context and a query and returning a score.
+    context (list): The context to score.
+    queries (list): The queries to score the context on.
+
+    Returns:
+    -------
+    tuple: The list of scores and the number of seconds it took.
+    """
+    start = time.perf_counter()
+    scores = [scorer(context, query) for query in queries]
+    return scores, time.perf_counter() - start
@@ -0,0 +1,174 @@
+import random
+
+_MASK = (1 << 64) - 1
+_MAX_HASH = (1 << 32) - 1
+# The signature value of an empty token set, larger than any hash.
+_EMPTY = 1 << 32
+
+
+class MinHashLSH:
+    """
+    A class used to find the examples whose token sets may be near-duplicates of a new one.
+
+    Each token set is summarized by a MinHash signature: for each of num_perm random hash
+    functions, the smallest hash of its tokens. Two sets agree on a signature value with
+    a probability equal to their Jaccard similarity. Signatures are cut into bands, and
+    examples sharing a whole band with a query are its candidates. The number of rows per
+    band is the largest that still finds 99% of the pairs at the threshold, so that few
+    near-duplicates are missed; candidates should then be checked exactly. Finding the
+    candidates of an example costs one dictionary lookup per band, whatever the number
+    of examples.
+
+    Attributes:
+    ----------
+    threshold : float
+        The Jaccard similarity from which two examples are near-duplicates.
+    num_perm : int
+        The number of hash functions of a signature.
+    rows : int
+        The number of signature values per band.
+
+    Methods:
+    -------
+    signatures(token_sets)
+        Returns the MinHash signatures of token sets.
+    candidates(signature)
+        Returns the ids of the examples sharing a band with a signature.
+    insert(example_id, signature)
+        Adds an example to the bands.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, seed: int = 1):
+        """
+        Initializes an empty index.
+
+        Args:
+        ----
+        threshold (float): The Jaccard similarity from which two examples are near-duplicates.
+        num_perm (int): The number of hash functions of a signature. More functions allow
+            more bands, which miss fewer near-duplicates, and cost more per example.
+        seed (int): The seed of the hash functions.
+
+        Returns:
+        -------
+        None
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        rng = random.Random(seed)
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self._permutations = [(rng.randrange(1, 1 << 64, 2), rng.randrange(1 << 64)) for _ in range(num_perm)]
+        self.rows = max(rows for rows in range(1, num_perm + 1)
+                        if num_perm % rows == 0 and 1 - (1 - threshold ** rows) ** (num_perm // rows) >= 0.99)
+        self._bands = [{} for _ in range(num_perm // self.rows)]
+        self._size = 0
+
+    def __len__(self) -> int:
+        """
+        Returns the number of inserted examples.
+
+        Returns:
+        -------
+        int: The number of inserted examples.
+        """
+        return self._size
+
+    def signatures(self, token_sets: list) -> list:
+        """
+        Returns the MinHash signatures of token sets.
+
+        Token hashes are mapped by multiply-shift hash functions, the high 32 bits of
+        (a * hash + b) modulo 2 ** 64. Tokens are hashed with the built-in hash, so
+        signatures can only be compared within a process. With NumPy, the signatures of all the sets are computed
+        together, one hash function at a time; without it, in pure Python, with the same result.
+
+        Args:
+        ----
+        token_sets (list): The distinct tokens of each example.
+
+        Returns:
+        -------
+        list: The signature of each set: the smallest hash of its tokens under each hash
+            function, cut into a tuple of hashed bands.
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            return [self._signature(tokens) for tokens in token_sets]
+
+        lengths = [len(tokens) for tokens in token_sets]
+        hashes = np.fromiter((hash(token) & _MAX_HASH for tokens in token_sets for token in tokens),
+                             dtype=np.uint64, count=sum(lengths))
+        lengths = np.array(lengths, dtype=np.int64)
+        nonempty = lengths > 0
+        starts = (np.cumsum(lengths) - lengths)[nonempty]
+        values = np.full((len(token_sets), self.num_perm), _EMPTY, dtype=np.uint64)
+        if len(hashes):
+            shift = np.uint64(32)
+            for column, (a, b) in enumerate(self._permutations):
+                hashed = (hashes * np.uint64(a) + np.uint64(b)) >> shift
+                values[nonempty, column] = np.minimum.reduceat(hashed, starts)
+        return [self._banded(row) for row in values.tolist()]
+
+    def _signature(self, tokens) -> tuple:
+        """
+        Returns the MinHash signature of a token set, in pure Python.
+
+        Args:
+        ----
+        tokens (set): The distinct tokens of an example.
+
+        Returns:
+        -------
+        tuple: The smallest hash of the tokens under each hash function, cut into hashed bands.
+        """
+        hashes = [hash(token) & _MAX_HASH for token in tokens]
+        if not hashes:
+            return self._banded([_EMPTY] * self.num_perm)
+        return self._banded([min([((a * h + b) & _MASK) >> 32 for h in hashes]) for a, b in self._permutations])
+
+    def _banded(self, values: list) -> tuple:
+        # Bands are keyed by the hash of their values: a collision only adds a candidate.
+        rows = self.rows
+        return tuple([hash(tuple(values[start:start + rows])) for start in range(0, self.num_perm, rows)])
+
+    def candidates(self, signature: tuple) -> set:
+        """
+        Returns the ids of the examples sharing a band with a signature.
+
+        Args:
+        ----
+        signature (tuple): A signature returned by signatures.
+
+        Returns:
+        -------
+        set: The candidate example ids.
+        """
+        found = set()
+        for band, key in zip(self._bands, signature):
+            bucket = band.get(key)
+            if bucket is not None:
+                found.update(bucket)
+        return found
+
+    def insert(self, example_id: int, signature: tuple):
+        """
+        Adds an example to the bands.
+
+        Args:
+        ----
+        example_id (int): The id of the example.
+        signature (tuple): The signature of the example.
+
+        Returns:
+        -------
+        None
+        """
+        for band, key in zip(self._bands, signature):
+            bucket = band.get(key)
+            if bucket is None:
+                band[key] = [example_id]
+            else:
+                bucket.append(example_id)
+        self._size += 1
@@ -0,0 +1,373 @@
+import threading
+from bisect import bisect_left
+
+# The upper bounds of the buckets of stage durations, in seconds.
+TIME_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The upper bounds of the buckets of observed counts, such as the number of candidates scored.
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000,
+                 500000, 1000000)
+
+
+class Instrumentation:
+    """
+    The interface of the hooks called by PromptBuilder and ContextManager when instrumentation is enabled.
+
+    Every method does nothing; subclass it and override the methods you need to forward
+    measurements to your own metrics system. Hooks are called on the thread doing the
+    work, so they must be fast and thread-safe.
+
+    Methods:
+    -------
+    timing(stage, seconds)
+        Records the duration of a stage.
+    observe(name, value)
+        Records a value, such as the number of candidates scored by a query.
+    increment(name, amount)
+        Increments a counter, such as the number of cache hits.
+    """
+
+    def timing(self, stage: str, seconds: float):
+        """
+        Records the duration of a stage: "extract_keywords", "find_relevant_examples",
+        "generate_prompt" or "build_prompt" from PromptBuilder.build_prompt, "build_prompts" from
+        PromptBuilder.build_prompts, and "rank_examples" from ContextManager.rank_examples.
+
+        Args:
+        ----
+        stage (str): The name of the stage.
+        seconds (float): The duration of the stage, in seconds.
+
+        Returns:
+        -------
+        None
+        """
+
+    def observe(self, name: str, value: float):
+        """
+        Records a value: "candidates_scored" from ContextManager, or "examples_returned" and
+        "distinct_keyword_sets" from PromptBuilder.
+
+        Args:
+        ----
+        name (str): The name of the value.
+        value (float): The value.
+
+        Returns:
+        -------
+        None
+        """
+
+    def increment(self, name: str, amount: int = 1):
+        """
+        Increments a counter: "cache_hits" or "cache_misses" from PromptBuilder.
+
+        Args:
+        ----
+        name (str): The name of the counter.
+        amount (int): The amount to add.
+
+        Returns:
+        -------
+        None
+        """
+
+
+class Histogram:
+    """
+    A class used to count observations in fixed buckets, as Prometheus histograms do.
+
+    Attributes:
+    ----------
+    buckets : tuple
+        The ascending upper bounds of the buckets; larger values fall in a last, unbounded bucket.
+    counts : list
+        The number of observations in each bucket, not cumulated.
+    count : int
+        The number of observations.
+    sum : float
+        The sum of the observations.
+
+    Methods:
+    -------
+    observe(value)
+        Adds an observation.
+    quantile(q)
+        Returns the upper bound of the bucket holding a quantile of the observations.
+    """
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: tuple):
+        """
+        Initializes an empty histogram.
+
+        Args:
+        ----
+        buckets (tuple): The ascending upper bounds of the buckets.
+
+        Returns:
+        -------
+        None
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value: float):
+        """
+        Adds an observation.
+
+        Args:
+        ----
+        value (float): The observed value.
+
+        Returns:
+        -------
+        None
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        Returns the upper bound of the bucket holding a quantile of the observations.
+
+        Args:
+        ----
+        q (float): The quantile, between 0 and 1.
+
+        Returns:
+        -------
+        float: The upper bound of the bucket, infinity for the last bucket, or None if there
+            is no observation.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self) -> dict:
+        """
+        Returns the histogram as a dictionary that can be serialized to JSON.
+
+        Returns:
+        -------
+        dict: The count, sum, median and 99th percentile bucket bounds, None if unbounded or
+            empty, and the cumulative count of each bucket, keyed by its upper bound.
+        """
+        cumulative = {}
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            cumulative[str(bound)] = seen
+        cumulative["+Inf"] = self.count
+        # JSON has no infinity, so quantiles in the unbounded bucket are reported as None
+        p50, p99 = (None if bound == float("inf") else bound for bound in (self.quantile(0.5), self.quantile(0.99)))
+        return {"count": self.count, "sum": self.sum, "p50": p50, "p99": p99, "buckets": cumulative}
+
+
+class Metrics(Instrumentation):
+    """
+    An instrumentation hook that keeps the measurements in memory and exports them.
+
+    Stage durations and observed values are kept in histograms and counters in plain
+    integers, under a lock. Pass the same object to a PromptBuilder and its ContextManager
+    to collect all the stages together, then export them with snapshot, to_json or
+    to_prometheus. Copies sent to other processes, such as the workers of
+    PromptBuilder.build_prompts, start empty.
+
+    Attributes:
+    ----------
+    stages : dict
+        A dictionary where the keys are stage names and the values are Histograms of their durations.
+    histograms : dict
+        A dictionary where the keys are the names of observed values and the values are Histograms.
+    counters : dict
+        A dictionary where the keys are counter names and the values are their totals.
+
+    Methods:
+    -------
+    snapshot()
+        Returns the measurements as a dictionary that can be serialized to JSON.
+    to_json()
+        Returns the measurements as a JSON document.
+    to_prometheus(prefix)
+        Returns the measurements in the Prometheus text exposition format.
+    reset()
+        Discards all measurements.
+    """
+
+    def __init__(self, time_buckets: tuple = TIME_BUCKETS, count_buckets: tuple = COUNT_BUCKETS):
+        """
+        Initializes an empty set of metrics.
+
+        Args:
+        ----
+        time_buckets (tuple): The upper bounds of the buckets of stage durations, in seconds.
+        count_buckets (tuple): The upper bounds of the buckets of observed values.
+
+        Returns:
+        -------
+        None
+        """
+        self.time_buckets = time_buckets
+        self.count_buckets = count_buckets
+        self.stages = {}
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        """
+        Returns the settings of the metrics, so that a copy sent to another process starts empty.
+
+        Returns:
+        -------
+        dict: The settings of the metrics.
+        """
+        return {"time_buckets": self.time_buckets, "count_buckets": self.count_buckets}
+
+    def __setstate__(self, state: dict):
+        """
+        Initializes empty metrics from the settings returned by __getstate__.
+
+        Args:
+        ----
+        state (dict): The settings of the metrics.
+
+        Returns:
+        -------
+        None
+        """
+        self.__init__(**state)
+
+    def timing(self, stage: str, seconds: float):
+        """Adds the duration of a stage to the histogram of the stage."""
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(self.time_buckets)
+            histogram.observe(seconds)
+
+    def observe(self, name: str, value: float):
+        """Adds a value to the histogram of its name."""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.count_buckets)
+            histogram.observe(value)
+
+    def increment(self, name: str, amount: int = 1):
+        """Adds an amount to a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        """
+        Discards all measurements.
+
+        Returns:
+        -------
+        None
+        """
+        with self._lock:
+            self.stages = {}
+            self.histograms = {}
+            self.counters = {}
+
+    def snapshot(self) -> dict:
+        """
+        Returns the measurements as a dictionary that can be serialized to JSON.
+
+        Returns:
+        -------
+        dict: A dictionary with the histogram of each stage under "stages", the histogram of
+            each observed value under "histograms", and the counters under "counters".
+        """
+        with self._lock:
+            return {
+                "stages": {stage: histogram.to_dict() for stage, histogram in self.stages.items()},
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+                "counters": dict(self.counters),
+            }
+
+    def to_json(self) -> str:
+        """
+        Returns the measurements as a JSON document.
+
+        Returns:
+        -------
+        str: The snapshot of the measurements, serialized to JSON.
+        """
+        import json
+
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self, prefix: str = "synapsense") -> str:
+        """
+        Returns the measurements in the Prometheus text exposition format.
+
+        Stage durations are exported as the histogram <prefix>_stage_seconds with a stage
+        label, observed values as the histograms <prefix>_<name>, and counters as
+        <prefix>_<name>_total.
+
+        Args:
+        ----
+        prefix (str): The prefix of the metric names.
+
+        Returns:
+        -------
+        str: The metrics, one sample per line.
+        """
+        lines = []
+        with self._lock:
+            if self.stages:
+                name = f"{prefix}_stage_seconds"
+                lines.append(f"# HELP {name} Duration of each stage of building a prompt.")
+                lines.append(f"# TYPE {name} histogram")
+                for stage, histogram in sorted(self.stages.items()):
+                    lines.extend(_histogram_lines(name, histogram, f'stage="{stage}",'))
+            for observed, histogram in sorted(self.histograms.items()):
+                name = f"{prefix}_{observed}"
+                lines.append(f"# TYPE {name} histogram")
+                lines.extend(_histogram_lines(name, histogram, ""))
+            for counter, total in sorted(self.counters.items()):
+                name = f"{prefix}_{counter}_total"
+                lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name} {total}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+def _histogram_lines(name: str, histogram: Histogram, labels: str) -> list:
+    """
+    Returns the samples of a histogram in the Prometheus text exposition format.
+
+    Args:
+    ----
+    name (str): The name of the metric.
+    histogram (Histogram): The histogram.
+    labels (str): The labels of every sample, each followed by a comma, or an empty string.
+
+    Returns:
+    -------
+    list: The lines of the samples.
+    """
+    lines = []
+    seen = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        seen += count
+        lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {seen}')
+    lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {histogram.count}')
+    label_set = f"{{{labels.rstrip(',')}}}" if labels else ""
+    lines.append(f"{name}_sum{label_set} {histogram.sum}")
+    lines.append(f"{name}_count{label_set} {histogram.count}")
+    return lines
@@ -0,0 +1,181 @@
+from array import array
+from bisect import bisect_left
+
+
+def check_records(records: list):
+    """
+    Checks that metadata can be indexed, before anything is written.
+
+    Args:
+    ----
+    records (list): The metadata of each example, or None.
+
+    Returns:
+    -------
+    None
+
+    Raises:
+    ------
+    TypeError: If a record is not a dictionary, or a value, or an element of a list, tuple or
+        set value, is not hashable.
+    """
+    for record in records:
+        if not record:
+            continue
+        if not isinstance(record, dict):
+            raise TypeError(f"metadata must be a dictionary or None, not {type(record).__name__}")
+        for field, value in record.items():
+            for key in value if isinstance(value, (list, tuple, set, frozenset)) else (value,):
+                try:
+                    hash(key)
+                except TypeError:
+                    raise TypeError(f"metadata field {field!r} has an unhashable value: {key!r}") from None
+
+
+class MetadataIndex:
+    """
+    A class used to find the examples of a context by the values of their metadata fields.
+
+    The metadata of an example is a dictionary such as {"lang": "pt", "tags": ["faq"],
+    "source": "docs", "timestamp": 1700000000}. Every field maps each of its values to
+    the ascending ids of the examples having it; the elements of list, tuple and set
+    values are indexed one by one, so an example tagged ["faq", "billing"] is found
+    under both tags. Examples without metadata are stored as None.
+
+    Attributes:
+    ----------
+    fields : dict
+        A dictionary where the keys are field names and the values are dictionaries mapping
+        each value of the field to an array of example ids.
+    records : list
+        The metadata of each example, or None.
+
+    Methods:
+    -------
+    add(records, start)
+        Indexes the metadata of the examples from position start onwards.
+    get(example_id)
+        Returns the metadata of an example.
+    select(where, limit)
+        Returns the ids of the examples whose metadata matches every condition.
+    """
+
+    __slots__ = ("fields", "records")
+
+    def __init__(self):
+        """
+        Initializes an empty metadata index.
+
+        Returns:
+        -------
+        None
+        """
+        self.fields = {}
+        self.records = []
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def add(self, records: list, start: int):
+        """
+        Indexes the metadata of the examples from position start onwards.
+
+        Examples before start that were added without metadata are stored as None first. The
+        records are checked first, so nothing is indexed if one of them is rejected.
+
+        Args:
+        ----
+        records (list): The metadata of each example, or None.
+        start (int): The id of the first example.
+
+        Returns:
+        -------
+        None
+
+        Raises:
+        ------
+        TypeError: If a record cannot be indexed, as in check_records.
+        """
+        check_records(records)
+        fields = self.fields
+        if len(self.records) < start:
+            self.records.extend([None] * (start - len(self.records)))
+        for example_id, record in enumerate(records, start):
+            if record:
+                for field, value in record.items():
+                    postings = fields.get(field)
+                    if postings is None:
+                        postings = fields[field] = {}
+                    for key in value if isinstance(value, (list, tuple, set, frozenset)) else (value,):
+                        posting = postings.get(key)
+                        if posting is None:
+                            postings[key] = array("I", (example_id,))
+                        elif posting[-1] != example_id:
+                            posting.append(example_id)
+            self.records.append(record)
+
+    def get(self, example_id: int) -> dict:
+        """
+        Returns the metadata of an example.
+
+        Args:
+        ----
+        example_id (int): The id of the example.
+
+        Returns:
+        -------
+        dict: The metadata of the example, or None if it has none.
+        """
+        return self.records[example_id] if example_id < len(self.records) else None
+
+    def select(self, where: dict, limit: int = None) -> list:
+        """
+        Returns the ids of the examples whose metadata matches every condition.
+
+        Args:
+        ----
+        where (dict): A dictionary where the keys are field names and the values are the
+            conditions on the field: a value the field must have, a list, tuple or set of
+            values of which it must have one, or a function returning whether a value
+            matches, which is called once per distinct value of the field.
+        limit (int, optional): Only the examples with a lower id are returned. Defaults to all
+            the indexed examples.
+
+        Returns:
+        -------
+        list: The ids of the matching examples, in ascending order.
+        """
+        if limit is None:
+            limit = len(self.records)
+        matches = []
+        for field, condition in where.items():
+            postings = self.fields.get(field, {})
+            if callable(condition):
+                # Copied in one step, as writers may add values while the conditions are evaluated
+                found = [posting for value, posting in list(postings.items()) if condition(value)]
+            elif isinstance(condition, (list, tuple, set, frozenset)):
+                found = [postings[value] for value in condition if value in postings]
+            else:
+                found = [postings[condition]] if condition in postings else []
+            if not found:
+                return []
+            if len(found) == 1:
+                matches.append(found[0])
+            else:
+                matches.append(sorted(set().union(*found)))
+        matches.sort(key=len)
+        ids = list(matches[0][:bisect_left(matches[0], limit)]) if matches else list(range(limit))
+        for posting in matches[1:]:
+            # Both are ascending, so each id is searched for after the position of the previous one
+            kept = []
+            position = 0
+            for example_id in ids:
+                position = bisect_left(posting, example_id, position)
+                if position == len(posting):
+                    break
+                if posting[position] == example_id:
+                    kept.append(example_id)
+            ids = kept
+            if not ids:
+                break
+        return ids
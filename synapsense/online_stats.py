@@ -0,0 +1,320 @@
+import heapq
+from bisect import bisect_left, insort
+from itertools import count
+
+
+class RunningStats:
+    """
+    A class used to keep running statistics of a stream of values in constant memory.
+
+    Attributes:
+    ----------
+    count : int
+        The number of values.
+    mean : float
+        The mean of the values.
+    ema : float
+        The exponential moving average of the values.
+    m2 : float
+        The sum of squared deviations from the mean, from which the variance is derived.
+    last : float
+        The last value.
+
+    Methods:
+    -------
+    update(value, alpha)
+        Adds a value to the statistics.
+    merge(count, mean, m2, decay, weighted, first, last)
+        Adds a summarized batch of values to the statistics.
+    variance
+        The sample variance of the values.
+    as_dict()
+        Returns the statistics as a dictionary.
+    """
+
+    __slots__ = ("count", "mean", "ema", "m2", "last")
+
+    def __init__(self):
+        """
+        Initializes empty statistics.
+
+        Returns:
+        -------
+        None
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.ema = 0.0
+        self.m2 = 0.0
+        self.last = 0.0
+
+    def update(self, value: float, alpha: float):
+        """
+        Adds a value to the statistics, using Welford's algorithm for the mean and variance.
+
+        Args:
+        ----
+        value (float): The value to add.
+        alpha (float): The smoothing factor of the exponential moving average.
+
+        Returns:
+        -------
+        None
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.ema = value if self.count == 1 else self.ema + alpha * (value - self.ema)
+        self.last = value
+
+    def merge(self, count: int, mean: float, m2: float, decay: float, weighted: float, first: float, last: float):
+        """
+        Adds a summarized batch of values to the statistics, as if they were added one by one.
+
+        The mean and variance are combined with Chan's parallel algorithm. For a batch of m
+        values x_1..x_m and smoothing factor a, decay is (1 - a) ** m and weighted is the sum
+        of a * (1 - a) ** (m - i) * x_i.
+
+        Args:
+        ----
+        count (int): The number of values of the batch.
+        mean (float): The mean of the batch.
+        m2 (float): The sum of squared deviations from the mean of the batch.
+        decay (float): The factor the previous moving average decays by over the batch.
+        weighted (float): The contribution of the batch to the moving average.
+        first (float): The first value of the batch.
+        last (float): The last value of the batch.
+
+        Returns:
+        -------
+        None
+        """
+        total = self.count + count
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.mean += delta * count / total
+        # With no previous values, the moving average starts at the first value of the batch
+        self.ema = decay * (self.ema if self.count else first) + weighted
+        self.count = total
+        self.last = last
+
+    @property
+    def variance(self) -> float:
+        """
+        Returns the sample variance of the values.
+
+        Returns:
+        -------
+        float: The sample variance, or 0.0 for fewer than two values.
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def as_dict(self) -> dict:
+        """
+        Returns the statistics as a dictionary.
+
+        Returns:
+        -------
+        dict: The count, mean, EMA, variance and last value.
+        """
+        return {"count": self.count, "mean": self.mean, "ema": self.ema, "variance": self.variance, "last": self.last}
+
+
+def summarize_batch(codes, values, alpha: float) -> dict:
+    """
+    Summarizes groups of values in one vectorized pass, for RunningStats.merge.
+
+    Args:
+    ----
+    codes (numpy.ndarray): The group of each value, as integers from 0 to the number of groups - 1.
+    values (numpy.ndarray): The values, in the order they were observed.
+    alpha (float): The smoothing factor of the exponential moving average.
+
+    Returns:
+    -------
+    dict: Arrays indexed by group: count, mean, m2, decay, weighted, first and last, plus
+        first_index and last_index, the positions of the first and last value of each group.
+    """
+    import numpy as np
+
+    n_groups = int(codes.max()) + 1 if len(codes) else 0
+    count = np.bincount(codes, minlength=n_groups)
+    mean = np.bincount(codes, weights=values, minlength=n_groups) / count
+    m2 = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=n_groups)
+
+    # Position of each value within its group, in observation order
+    order = np.argsort(codes, kind="stable")
+    starts = np.cumsum(count) - count
+    position = np.empty(len(codes), dtype=np.int64)
+    position[order] = np.arange(len(codes)) - starts[codes[order]]
+
+    weights = alpha * (1 - alpha) ** (count[codes] - 1 - position)
+    first_index = order[starts]
+    last_index = order[starts + count - 1]
+    return {
+        "count": count,
+        "mean": mean,
+        "m2": m2,
+        "decay": (1 - alpha) ** count,
+        "weighted": np.bincount(codes, weights=weights * values, minlength=n_groups),
+        "first": values[first_index],
+        "last": values[last_index],
+        "first_index": first_index,
+        "last_index": last_index,
+    }
+
+
+class IncrementalTopK:
+    """
+    A class used to keep the k highest scoring keys while scores are updated.
+
+    The k best keys are kept sorted, and the other keys sit in a max-heap whose stale
+    entries are skipped lazily. Updates cost O(k + log n), and reading the top k costs O(k).
+    Ties are broken by the order in which keys were first seen, earlier first.
+
+    Attributes:
+    ----------
+    k : int
+        The number of keys to keep.
+
+    Methods:
+    -------
+    update(key, score)
+        Sets the score of a key.
+    remove(key)
+        Forgets a key.
+    top()
+        Returns the k best keys, best first.
+    """
+
+    def __init__(self, k: int):
+        """
+        Initializes an empty top-k structure.
+
+        Args:
+        ----
+        k (int): The number of keys to keep.
+
+        Returns:
+        -------
+        None
+        """
+        self.k = k
+        self._ranks = {}  # key -> (-score, first seen)
+        self._members = []  # the k best (-score, first seen, key), sorted
+        self._in_top = set()
+        self._outsiders = []  # heap of (-score, first seen, key), possibly stale
+        self._seen = count()
+
+    def __len__(self) -> int:
+        """
+        Returns the number of keys.
+
+        Returns:
+        -------
+        int: The number of keys.
+        """
+        return len(self._ranks)
+
+    def update(self, key, score: float):
+        """
+        Sets the score of a key.
+
+        Args:
+        ----
+        key (hashable): The key.
+        score (float): The new score of the key.
+
+        Returns:
+        -------
+        None
+        """
+        previous = self._ranks.get(key)
+        rank = (-score, previous[1] if previous is not None else next(self._seen))
+        self._ranks[key] = rank
+        if key in self._in_top:
+            self._remove_member(key, previous)
+        self._insert(key, rank)
+        self._promote()
+
+    def remove(self, key):
+        """
+        Forgets a key.
+
+        Args:
+        ----
+        key (hashable): The key.
+
+        Returns:
+        -------
+        None
+        """
+        rank = self._ranks.pop(key, None)
+        if rank is not None and key in self._in_top:
+            self._remove_member(key, rank)
+            self._promote()
+
+    def top(self) -> list:
+        """
+        Returns the k best keys, best first.
+
+        Returns:
+        -------
+        list: The k best keys.
+        """
+        return [key for _, _, key in self._members]
+
+    def _remove_member(self, key, rank: tuple):
+        del self._members[bisect_left(self._members, rank)]
+        self._in_top.discard(key)
+
+    def _insert(self, key, rank: tuple):
+        if len(self._members) < self.k:
+            insort(self._members, (*rank, key))
+            self._in_top.add(key)
+        elif self._members and rank < self._members[-1][:2]:
+            insort(self._members, (*rank, key))
+            self._in_top.add(key)
+            self._demote_last()
+        else:
+            self._push_outsider(key, rank)
+
+    def _demote_last(self):
+        negative_score, seen, key = self._members.pop()
+        self._in_top.discard(key)
+        self._push_outsider(key, (negative_score, seen))
+
+    def _push_outsider(self, key, rank: tuple):
+        heapq.heappush(self._outsiders, (*rank, key))
+        if len(self._outsiders) > 2 * len(self._ranks) + 64:
+            self._outsiders = [(*rank, key) for key, rank in self._ranks.items() if key not in self._in_top]
+            heapq.heapify(self._outsiders)
+
+    def _best_outsider(self):
+        """
+        Returns the best valid outsider entry, dropping stale entries, or None.
+        """
+        outsiders = self._outsiders
+        while outsiders:
+            negative_score, seen, key = outsiders[0]
+            if key not in self._in_top and self._ranks.get(key) == (negative_score, seen):
+                return outsiders[0]
+            heapq.heappop(outsiders)
+        return None
+
+    def _promote(self):
+        """
+        Moves the best outsiders into the top k while they beat a member or there is room.
+        """
+        while True:
+            best = self._best_outsider()
+            if best is None:
+                return
+            if len(self._members) >= self.k and (not self._members or best >= self._members[-1]):
+                return
+            heapq.heappop(self._outsiders)
+            insort(self._members, best)
+            self._in_top.add(best[2])
+            if len(self._members) > self.k:
+                self._demote_last()
@@ -0,0 +1,461 @@
+from bisect import bisect_right
+from itertools import chain, islice
+from time import perf_counter
+
+from .context_index import select_top_k
+from .context_manager import ContextManager
+from .snapshot import ContextSnapshot
+
+
+class LayeredExamples:
+    """
+    A read-only sequence of the examples of a context across the layers of an overlay.
+
+    It reads the snapshots of the context in each layer one after the other, without
+    copying them: the example with id i is found in the layer whose examples start at
+    the largest offset not above i.
+    """
+
+    __slots__ = ("_parts", "_offsets")
+
+    def __init__(self, parts: list):
+        """
+        Initializes the sequence.
+
+        Args:
+        ----
+        parts (list): The snapshots of the context in each layer that has it, in order.
+
+        Returns:
+        -------
+        None
+        """
+        self._parts = parts
+        self._offsets = [0]
+        for part in parts:
+            self._offsets.append(self._offsets[-1] + len(part))
+
+    def __len__(self) -> int:
+        return self._offsets[-1]
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._get(i) for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("example index out of range")
+        return self._get(position)
+
+    def __iter__(self):
+        return chain.from_iterable(self._parts)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (LayeredExamples, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"LayeredExamples({list(self)!r})"
+
+    def _get(self, position: int) -> str:
+        layer = bisect_right(self._offsets, position) - 1
+        return self._parts[layer][position - self._offsets[layer]]
+
+
+class ContextOverlay(ContextManager):
+    """
+    A read-only view of the contexts of several context managers, layered like a ChainMap.
+
+    Each context of the overlay holds the examples of that context in every layer, in
+    the order of the layers, and the examples of a layer are numbered after those of
+    the layers before it. Creating an overlay takes time proportional to the number of
+    layers and copies nothing: each layer keeps its examples and indexes, ranking runs
+    on the index of every layer, and the per-layer top k are merged by similarity and
+    then by id, so the results are the same as with a single context manager holding the
+    merged contexts. The layers of a context are captured the first time the overlay
+    reads it, so the example ids of the overlay stay valid for its whole life, while later
+    writes to the layers need a new overlay to be seen. Call materialize to get a
+    writable ContextManager with the merged contexts.
+
+    Attributes:
+    ----------
+    layers : list
+        The layered context managers, in order.
+    token_counter : callable
+        The token counter of the first layer.
+    instrumentation : Instrumentation
+        An optional hook timing rank_examples, or None. Each layer reports the candidates it scores to its own hook.
+
+    Methods:
+    -------
+    materialize()
+        Returns a new ContextManager holding the merged contexts.
+    """
+
+    def __init__(self, layers: list, instrumentation=None):
+        """
+        Initializes an overlay of context managers.
+
+        Args:
+        ----
+        layers (list): The context managers to layer, in order. The layers of overlays among
+            them are layered in their place.
+        instrumentation (Instrumentation, optional): A hook told the duration of each call to
+            rank_examples. Nothing is measured if omitted.
+
+        Returns:
+        -------
+        None
+
+        Raises:
+        ------
+        ValueError: If no layer is given.
+        """
+        self.layers = []
+        for layer in layers:
+            if isinstance(layer, ContextOverlay):
+                self.layers.extend(layer.layers)
+            else:
+                self.layers.append(layer)
+        if not self.layers:
+            raise ValueError("An overlay needs at least one layer")
+        self.token_counter = self.layers[0].token_counter
+        self.instrumentation = instrumentation
+        self._views = {}
+
+    @property
+    def contexts(self) -> dict:
+        """
+        Returns all contexts of the overlay.
+
+        Returns:
+        -------
+        dict: A dictionary where the keys are context names and the values are LayeredExamples.
+        """
+        contexts = {}
+        for layer in self.layers:
+            for context_name in layer.list_contexts():
+                # Empty contexts are kept; only contexts removed since they were listed are left out
+                if context_name not in contexts and self._view(context_name):
+                    contexts[context_name] = self.get_context(context_name)
+        return contexts
+
+    def _view(self, context_name: str) -> tuple:
+        """
+        Returns the layers of a context, captured the first time the context is read.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        tuple: For each layer that has the context, a (layer, snapshot, offset) tuple, where
+            offset is the id of the first example of the layer in the overlay.
+        """
+        view = self._views.get(context_name)
+        if view is None:
+            view = []
+            offset = 0
+            for layer in self.layers:
+                snapshot = layer.snapshot(context_name)
+                if snapshot is not None:
+                    view.append((layer, snapshot, offset))
+                    offset += len(snapshot)
+            # Threads reading a context for the first time all get the view stored first
+            view = self._views.setdefault(context_name, tuple(view))
+        return view
+
+    def _locate(self, context_name: str, example_ids: list) -> tuple:
+        """
+        Finds the layer and the id in that layer of example ids of the overlay.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        example_ids (list): A list of example ids of the overlay.
+
+        Returns:
+        -------
+        tuple: The layers of the context, as returned by _view, and for each example id a
+            (position of its layer in the view, id in the layer) tuple.
+
+        Raises:
+        ------
+        KeyError: If the context does not exist.
+        IndexError: If an example id is out of range.
+        """
+        view = self._view(context_name)
+        if not view:
+            raise KeyError(context_name)
+        offsets = [offset for _, _, offset in view]
+        size = offsets[-1] + len(view[-1][1])
+        located = []
+        for example_id in example_ids:
+            if not 0 <= example_id < size:
+                raise IndexError("example id out of range")
+            part = bisect_right(offsets, example_id) - 1
+            located.append((part, example_id - offsets[part]))
+        return view, located
+
+    def _read_only(self):
+        """Raises TypeError, as an overlay cannot be written to."""
+        raise TypeError("A ContextOverlay is read-only; call materialize() to get a writable ContextManager")
+
+    def add_context(self, context_name: str, examples: list):
+        """Raises TypeError, as an overlay cannot be written to."""
+        self._read_only()
+
+    def ingest(self, source, chunk_size: int = 10000, progress: callable = None) -> dict:
+        """Raises TypeError, as an overlay cannot be written to."""
+        self._read_only()
+
+    def remove_context(self, context_name: str):
+        """Raises TypeError, as an overlay cannot be written to."""
+        self._read_only()
+
+    def batch(self):
+        """Raises TypeError, as an overlay cannot be written to."""
+        self._read_only()
+
+    def get_context(self, context_name: str) -> LayeredExamples:
+        """
+        Retrieves the examples of a specific context across the layers.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        LayeredExamples: The examples of the context, or an empty list if no layer has it.
+        """
+        view = self._view(context_name)
+        if not view:
+            return []
+        return LayeredExamples([snapshot for _, snapshot, _ in view])
+
+    def list_contexts(self) -> list:
+        """
+        Lists all available contexts, in the order in which the layers first have them.
+
+        Returns:
+        -------
+        list: A list of context names.
+        """
+        return list(self.contexts)
+
+    def rank_examples(self, context_name: str, keywords: list, top_k: int = 3, threshold: float = 0.5,
+                      strategy: str = "inverted") -> list:
+        """
+        Ranks the examples of a context by similarity with the keywords, with the index of every layer.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        keywords (list): A list of keywords.
+        top_k (int): The maximum number of examples to return.
+        threshold (float): The similarity an example must exceed to be returned.
+        strategy (str): The retrieval strategy of each layer, as in ContextManager.rank_examples.
+
+        Returns:
+        -------
+        list: A list of (example_id, similarity) tuples, most similar first, ties broken by
+            ascending example id.
+        """
+        hook = self.instrumentation
+        if hook is not None:
+            started = perf_counter()
+        ranked = []
+        for layer, snapshot, offset in self._view(context_name):
+            ranked.extend((offset + example_id, similarity) for example_id, similarity
+                          in layer._rank(context_name, snapshot, keywords, top_k, threshold, strategy))
+        ranked = select_top_k(ranked, top_k)
+        if hook is not None:
+            hook.timing("rank_examples", perf_counter() - started)
+        return ranked
+
+    def _search(self, context_name: str, snapshot: ContextSnapshot, queries: list) -> list:
+        """
+        Finds the examples of a context that contain each of several queries, with the index of every layer.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        snapshot (ContextSnapshot): A snapshot of the context in the overlay.
+        queries (list): The queries.
+
+        Returns:
+        -------
+        list: For each query, the examples containing it, in order.
+        """
+        results = [[] for _ in queries]
+        for layer, layer_snapshot, _ in self._view(context_name):
+            for result, examples in zip(results, layer._search(context_name, layer_snapshot, queries)):
+                result.extend(examples)
+        return results
+
+    def _select(self, context_name: str, snapshot: ContextSnapshot, where: dict):
+        """
+        Returns the examples of a context whose metadata matches conditions, with the metadata index of every layer.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        snapshot (ContextSnapshot): A snapshot of the context in the overlay.
+        where (dict): Conditions on the metadata fields of the examples, or None to select all of them.
+
+        Returns:
+        -------
+        iterator: The matching examples, in order.
+        """
+        return chain.from_iterable(layer._select(context_name, layer_snapshot, where)
+                                   for layer, layer_snapshot, _ in self._view(context_name))
+
+    def get_examples(self, context_name: str, example_ids: list) -> list:
+        """
+        Retrieves examples of a context by id.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        example_ids (list): A list of example ids, as returned by rank_examples.
+
+        Returns:
+        -------
+        list: The examples with the given ids, in the same order.
+        """
+        view, located = self._locate(context_name, example_ids)
+        return [view[part][1][example_id] for part, example_id in located]
+
+    def get_token_counts(self, context_name: str, example_ids: list) -> list:
+        """
+        Retrieves the cached number of prompt tokens of examples of a context by id.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        example_ids (list): A list of example ids, as returned by rank_examples.
+
+        Returns:
+        -------
+        list: The number of prompt tokens of each example, in the same order as the ids.
+        """
+        view, located = self._locate(context_name, example_ids)
+        local_ids = [[] for _ in view]
+        for part, example_id in located:
+            local_ids[part].append(example_id)
+        results = []
+        for (layer, snapshot, _), ids in zip(view, local_ids):
+            if not ids:
+                results.append(iter(()))
+            elif snapshot.index is None:
+                results.append(iter(layer.get_token_counts(context_name, ids)))
+            else:
+                token_counts = snapshot.index.token_counts
+                results.append(iter([token_counts[example_id] for example_id in ids]))
+        return [next(results[part]) for part, _ in located]
+
+    def get_metadata(self, context_name: str, example_ids: list) -> list:
+        """
+        Retrieves the metadata of examples of a context by id.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        example_ids (list): A list of example ids, as returned by rank_examples.
+
+        Returns:
+        -------
+        list: The metadata of each example, or None for examples without metadata, in the same
+            order as the ids.
+        """
+        view, located = self._locate(context_name, example_ids)
+        return [None if view[part][1].metadata is None else view[part][1].metadata.get(example_id)
+                for part, example_id in located]
+
+    def get_token_sets(self, context_name: str) -> list:
+        """
+        Retrieves the cached token sets of the examples of a context across the layers.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        list: The frozen token set of each example, in the same order as get_context.
+        """
+        token_sets = []
+        for layer, snapshot, _ in self._view(context_name):
+            layer_sets = layer.get_token_sets(context_name) if snapshot.index is None else snapshot.index.token_sets
+            token_sets.extend(islice(layer_sets, len(snapshot)))
+        return token_sets
+
+    def get_version(self, context_name: str):
+        """
+        Returns the version of a context, which changes whenever the context does in any layer.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        tuple: The version of the context in each layer, 0 for layers without it, or 0 if no
+            layer has the context.
+        """
+        view = self._view(context_name)
+        if not view:
+            return 0
+        versions = {id(layer): snapshot.version for layer, snapshot, _ in view}
+        return tuple(versions.get(id(layer), 0) for layer in self.layers)
+
+    def snapshot(self, context_name: str) -> ContextSnapshot:
+        """
+        Returns a snapshot of a context across the layers.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        ContextSnapshot: The snapshot, with no index, or None if no layer has the context.
+        """
+        examples = self.get_context(context_name)
+        if not examples:
+            return None
+        return ContextSnapshot(examples, len(examples), self.get_version(context_name))
+
+    def materialize(self) -> ContextManager:
+        """
+        Returns a new ContextManager holding the merged contexts.
+
+        This copies the examples of every layer, and their metadata, into the new context
+        manager, which indexes them again.
+
+        Returns:
+        -------
+        ContextManager: The new context manager.
+        """
+        merged = ContextManager(self.token_counter)
+        with merged.batch():
+            for context_name, examples in self.contexts.items():
+                examples = list(examples)
+                metadata = None
+                if any(snapshot.metadata is not None for _, snapshot, _ in self._view(context_name)):
+                    metadata = self.get_metadata(context_name, range(len(examples)))
+                merged.add_context(context_name, examples, metadata)
+        return merged
+
+    def __str__(self) -> str:
+        """
+        Returns a string representation of the overlay.
+
+        Returns:
+        -------
+        str: A string representation of the overlay.
+        """
+        return f"ContextOverlay with {len(self.contexts)} contexts in {len(self.layers)} layers"
@@ -0,0 +1,107 @@
+import copy
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+from .context_manager import ContextManager
+
+# The context manager of the current worker process, set once by _init_worker.
+_worker_context_manager = None
+
+
+def _init_worker(context_name: str, examples: list, token_counter: callable):
+    """
+    Sets up a worker process with its own copy of a context.
+
+    Args:
+    ----
+    context_name (str): The name of the context.
+    examples (list): The examples of the context.
+    token_counter (callable): The token counter of the builder's context manager.
+
+    Returns:
+    -------
+    None
+    """
+    global _worker_context_manager
+    _worker_context_manager = ContextManager(token_counter)
+    _worker_context_manager.add_context(context_name, examples)
+
+
+def _build_chunk(builder, context_name: str, user_inputs: list) -> list:
+    """
+    Builds the prompts of a chunk of user inputs in a worker process.
+
+    Args:
+    ----
+    builder (PromptBuilder): A prompt builder without a context manager, with the current settings.
+    context_name (str): The name of the context.
+    user_inputs (list): A list of user inputs.
+
+    Returns:
+    -------
+    list: The prompts, in the same order as the user inputs.
+    """
+    builder.context_manager = _worker_context_manager
+    return builder._build_batch(context_name, user_inputs)
+
+
+def _pool_for(builder, context_name: str, workers: int) -> ProcessPoolExecutor:
+    """
+    Returns the worker pool of a builder for a context, starting a new one if the context,
+    its version or the number of workers changed since the last pool was started.
+
+    Args:
+    ----
+    builder (PromptBuilder): The prompt builder.
+    context_name (str): The name of the context.
+    workers (int): The number of worker processes.
+
+    Returns:
+    -------
+    ProcessPoolExecutor: The worker pool.
+    """
+    context_manager = builder.context_manager
+    key = (id(context_manager), context_name, context_manager.get_version(context_name), workers)
+    if builder._pool is not None and builder._pool[0] == key:
+        return builder._pool[2]
+
+    builder.close()
+    examples = list(context_manager.get_context(context_name))
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(context_name, examples, context_manager.token_counter))
+    # The finalizer stops the workers when the builder is closed or garbage collected
+    builder._pool = (key, weakref.finalize(builder, executor.shutdown), executor)
+    return executor
+
+
+def build_prompts_in_pool(builder, context_name: str, user_inputs: list, workers: int, chunks_per_worker: int = 4) -> list:
+    """
+    Builds prompts for many user inputs on a pool of worker processes.
+
+    The pool is kept on the builder and reused while the context does not change. The
+    examples of the context are sent to each worker once, when it starts, and every
+    worker builds its own index. Each task carries the settings of the builder, a chunk
+    of user inputs and, back, their prompts.
+
+    Args:
+    ----
+    builder (PromptBuilder): The prompt builder whose settings the workers copy.
+    context_name (str): The name of the context.
+    user_inputs (list): A list of user inputs.
+    workers (int): The number of worker processes.
+    chunks_per_worker (int): The number of tasks each worker gets, on average.
+
+    Returns:
+    -------
+    list: The prompts, in the same order as the user inputs.
+    """
+    user_inputs = list(user_inputs)
+    executor = _pool_for(builder, context_name, workers)
+    template = copy.copy(builder)
+    template.context_manager = None
+    template._pool = None
+
+    chunk_size = max(1, -(-len(user_inputs) // (workers * chunks_per_worker)))
+    chunks = [user_inputs[i:i + chunk_size] for i in range(0, len(user_inputs), chunk_size)]
+    results = executor.map(_build_chunk, [template] * len(chunks), [context_name] * len(chunks), chunks)
+    return [prompt for chunk in results for prompt in chunk]
@@ -1,8 +1,25 @@
-import nltk
-nltk.download('stopwords')
-from nltk.corpus import stopwords
+import heapq
+from time import perf_counter
 
 from .context_manager import ContextManager
+from .prompt_cache import PromptCache
+from .prompt_template import PREFIX_STABLE, QUERY_FIRST, PromptTemplate
+from .stopwords import load_stop_words
+from .tokens import pack_to_budget
+
+# The template of each layout.
+LAYOUTS = {"query_first": QUERY_FIRST, "prefix_stable": PREFIX_STABLE}
+
+# The default similarity threshold of each retrieval strategy. The cosine similarities of the
+# ann strategy are lower than the Jaccard similarities of the others for the same matches.
+DEFAULT_THRESHOLDS = {"inverted": 0.5, "scan": 0.5, "sparse": 0.5, "ann": 0.2}
+
+# The number of examples in a prompt when neither top_k nor a token budget is set.
+DEFAULT_TOP_K = 3
+
+# The number of candidates first ranked to fill a token budget without top_k, grown until the budget is spent.
+BUDGET_POOL = 16
+
 
 class PromptBuilder:
     """
@@ -12,37 +29,126 @@ class PromptBuilder:
     ----------
     context_manager : ContextManager
         A context manager object used to retrieve context examples.
+    strategy : str
+        The retrieval strategy passed to ContextManager.rank_examples.
+    top_k : int
+        The maximum number of examples in a prompt, or None for 3 without a token budget and
+        as many as fit with one.
+    similarity_threshold : float
+        The similarity an example must exceed to be included in a prompt.
+    max_prompt_tokens : int
+        An optional budget of prompt tokens, examples being packed best first until it is spent.
+    cache : PromptCache
+        An optional cache of the relevant examples of each context and set of keywords.
+    template : PromptTemplate
+        The compiled template of the prompts.
+    instructions : str
+        Optional instructions at the start of every prompt.
+    pinned_examples : dict
+        A dictionary where the keys are context names and the values are the examples in every prompt.
+    instrumentation : Instrumentation
+        An optional hook timing each stage of build_prompt, or None.
     STOP_WORDS : set
-        A set of stop words to ignore when extracting keywords.
+        A set of stop words to ignore when extracting keywords, loaded on first use.
 
     Methods:
     -------
     build_prompt(context_name, user_input)
         Builds a prompt using examples from a specific context.
+    build_prompts(context_name, user_inputs, workers)
+        Builds prompts for many user inputs, optionally on a pool of worker processes.
+    close()
+        Stops the worker processes of build_prompts.
+    pin_examples(context_name, examples)
+        Sets the examples included in every prompt of a context.
+    shared_prefix(context_name)
+        Returns the text every prompt of a context starts with.
+    shared_prefix_bytes(context_name)
+        Returns the length in bytes of the text every prompt of a context starts with.
     extract_keywords(user_input)
         Extracts relevant keywords from user input.
-    find_relevant_examples(examples, keywords)
+    find_relevant_examples(examples, keywords, context_name, max_tokens)
         Finds the most relevant examples that match the keywords.
     calculate_similarity(example, keywords)
         Calculates the similarity between the example and the keywords.
-    generate_prompt(relevant_examples, user_input)
+    generate_prompt(relevant_examples, user_input, context_name)
         Generates a prompt using the relevant examples and user input.
     """
 
-    def __init__(self, context_manager: ContextManager):
+    def __init__(self, context_manager: ContextManager, strategy: str = "inverted", top_k: int = None,
+                 similarity_threshold: float = None, cache: PromptCache = None, max_prompt_tokens: int = None,
+                 layout: str = "query_first", instructions: str = None, template=None, instrumentation=None):
         """
         Initializes a prompt builder with a context manager.
 
         Args:
         ----
         context_manager (ContextManager): A context manager object.
+        strategy (str): The retrieval strategy, "inverted", "scan", "sparse" or "ann". See
+            ContextManager.rank_examples.
+        top_k (int, optional): The maximum number of examples in a prompt. If omitted, prompts have
+            up to 3 examples without a token budget, and as many as fit in the budget with one.
+        similarity_threshold (float, optional): The similarity an example must exceed to be included in
+            a prompt. Must not be negative, as examples without a common keyword are never included.
+            Defaults to 0.2 for the ann strategy, whose cosine similarities run lower, and 0.5 otherwise.
+        cache (PromptCache, optional): A cache of relevant examples, keyed by context name, keywords
+            and context version. Clear it after changing the other settings of the builder.
+        max_prompt_tokens (int, optional): The maximum number of tokens of a prompt, counted with the
+            context manager's token counter. The most relevant examples are packed, best first and
+            at most top_k of them if it is given, skipping those that no longer fit. No limit if omitted.
+        layout (str): "query_first" puts the retrieved examples first, then the pinned examples.
+            "prefix_stable" puts the instructions and pinned examples first, in a fixed order, and the
+            retrieved examples and user input last, so that the prompts of a context share a prefix
+            that LLM providers can cache.
+        instructions (str, optional): Instructions at the start of every prompt.
+        template (str or PromptTemplate, optional): The template of the prompts, which replaces the
+            template of the layout. A string is compiled once, here; see PromptTemplate for its slots.
+        instrumentation (Instrumentation, optional): A hook told the duration of each stage of
+            build_prompt, the number of examples returned, and the cache hits and misses, such as
+            a synapsense.Metrics. Nothing is measured if omitted.
 
         Returns:
         -------
         None
         """
+        if similarity_threshold is None:
+            similarity_threshold = DEFAULT_THRESHOLDS.get(strategy, 0.5)
+        if similarity_threshold < 0:
+            raise ValueError("similarity_threshold must not be negative")
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown prompt layout: {layout}")
         self.context_manager = context_manager
-        self.STOP_WORDS = set(stopwords.words('english'))
+        self.strategy = strategy
+        self.top_k = top_k
+        self.similarity_threshold = similarity_threshold
+        self.cache = cache
+        self.max_prompt_tokens = max_prompt_tokens
+        if template is None:
+            template = LAYOUTS[layout]
+        self.template = PromptTemplate(template) if isinstance(template, str) else template
+        self.instructions = instructions
+        self.pinned_examples = {}
+        self.instrumentation = instrumentation
+        self._bound_templates = {}
+        self._pool = None
+        self._stop_words = None
+
+    @property
+    def STOP_WORDS(self) -> set:
+        """
+        Returns the stop words, loading the bundled English list the first time they are needed.
+
+        Returns:
+        -------
+        set: A set of stop words.
+        """
+        if self._stop_words is None:
+            self._stop_words = set(load_stop_words('english'))
+        return self._stop_words
+
+    @STOP_WORDS.setter
+    def STOP_WORDS(self, stop_words: set):
+        self._stop_words = stop_words
 
     def build_prompt(self, context_name: str, user_input: str) -> str:
         """
@@ -57,23 +163,237 @@ class PromptBuilder:
         -------
         str: A prompt based on the context examples and user input.
         """
-        examples = self.context_manager.get_context(context_name)
         prompt = ""
+        hook = self.instrumentation
+        if hook is not None:
+            started = perf_counter()
 
         # Step 1: Extract relevant keywords from user input
         keywords = self.extract_keywords(user_input)
-
-        # Step 2: Find the most relevant examples that match the keywords
-        relevant_examples = self.find_relevant_examples(examples, keywords)
+        if hook is not None:
+            extracted = perf_counter()
+            hook.timing("extract_keywords", extracted - started)
+
+        # Step 2: Find the most relevant examples that match the keywords, within the token budget
+        max_tokens = None
+        if self.max_prompt_tokens is not None:
+            # The budget left for the examples once the rest of the prompt is counted
+            fixed_tokens = self.context_manager.token_counter(self.generate_prompt((), user_input, context_name))
+            max_tokens = self.max_prompt_tokens - fixed_tokens
+        if self.cache is None:
+            relevant_examples = self.find_relevant_examples(None, keywords, context_name=context_name,
+                                                            max_tokens=max_tokens)
+        else:
+            # Similarity only depends on the set of keywords
+            key = (context_name, tuple(sorted(set(keywords))), self.context_manager.get_version(context_name),
+                   max_tokens)
+            relevant_examples = self.cache.get(key)
+            if hook is not None:
+                hook.increment("cache_misses" if relevant_examples is None else "cache_hits")
+            if relevant_examples is None:
+                relevant_examples = tuple(self.find_relevant_examples(None, keywords, context_name=context_name,
+                                                                      max_tokens=max_tokens))
+                self.cache.put(key, relevant_examples)
+        if hook is not None:
+            found = perf_counter()
+            hook.timing("find_relevant_examples", found - extracted)
+            hook.observe("examples_returned", len(relevant_examples))
 
         # Step 3: Generate a prompt using the relevant examples and user input
-        if relevant_examples:
-            prompt = self.generate_prompt(relevant_examples, user_input)
-        else:
-            prompt = f"No relevant examples found for {context_name}. Please try again."
+        prompt = self._render(relevant_examples, user_input, context_name)
+        if hook is not None:
+            finished = perf_counter()
+            hook.timing("generate_prompt", finished - found)
+            hook.timing("build_prompt", finished - started)
 
         return prompt
 
+    def build_prompts(self, context_name: str, user_inputs: list, workers: int = 1) -> list:
+        """
+        Builds prompts for many user inputs, optionally on a pool of worker processes.
+
+        The keywords of all the user inputs are extracted first, and the relevant examples
+        of each distinct set of keywords are found once. With more than one worker, the
+        user inputs are split into chunks across a pool of worker processes, each of which
+        gets the examples of the context once, when it starts. The pool is kept for the
+        next calls with the same context, until the context changes or close is called.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        user_inputs (list): A list of user inputs.
+        workers (int): The number of worker processes. 1 builds the prompts in this process.
+
+        Returns:
+        -------
+        list: The prompts, in the same order as the user inputs.
+        """
+        if workers <= 1:
+            return self._build_batch(context_name, list(user_inputs))
+
+        from .parallel import build_prompts_in_pool
+        return build_prompts_in_pool(self, context_name, user_inputs, workers)
+
+    def close(self):
+        """
+        Stops the worker processes of build_prompts, if any.
+
+        Returns:
+        -------
+        None
+        """
+        if self._pool is not None:
+            self._pool[1]()
+            self._pool = None
+
+    def __enter__(self) -> 'PromptBuilder':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _build_batch(self, context_name: str, user_inputs: list) -> list:
+        """
+        Builds the prompts of many user inputs, finding the relevant examples of each distinct
+        set of keywords once.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        user_inputs (list): A list of user inputs.
+
+        Returns:
+        -------
+        list: The prompts, in the same order as the user inputs, the same as build_prompt returns.
+        """
+        hook = self.instrumentation
+        if hook is not None:
+            started = perf_counter()
+        version = self.context_manager.get_version(context_name)
+
+        # Step 1: Extract the keywords of every user input, and the budget left for its examples
+        keys = []
+        for user_input in user_inputs:
+            max_tokens = None
+            if self.max_prompt_tokens is not None:
+                fixed_tokens = self.context_manager.token_counter(self.generate_prompt((), user_input, context_name))
+                max_tokens = self.max_prompt_tokens - fixed_tokens
+            keys.append((tuple(self.extract_keywords(user_input)), max_tokens))
+
+        # Step 2: Find the relevant examples of each distinct set of keywords and budget once
+        found = dict.fromkeys(keys)
+        for key in found:
+            keywords, max_tokens = key
+            relevant_examples = None
+            if self.cache is not None:
+                cache_key = (context_name, tuple(sorted(set(keywords))), version, max_tokens)
+                relevant_examples = self.cache.get(cache_key)
+            if relevant_examples is None:
+                relevant_examples = tuple(self.find_relevant_examples(None, list(keywords), context_name=context_name,
+                                                                      max_tokens=max_tokens))
+                if self.cache is not None:
+                    self.cache.put(cache_key, relevant_examples)
+            found[key] = relevant_examples
+
+        # Step 3: Generate the prompts
+        prompts = [self._render(found[key], user_input, context_name) for key, user_input in zip(keys, user_inputs)]
+        if hook is not None:
+            hook.timing("build_prompts", perf_counter() - started)
+            hook.observe("distinct_keyword_sets", len(found))
+        return prompts
+
+    def _render(self, relevant_examples: list, user_input: str, context_name: str) -> str:
+        """
+        Generates the prompt of a user input, or a message saying that no example is relevant.
+
+        Args:
+        ----
+        relevant_examples (list): A list of relevant examples.
+        user_input (str): The user's input.
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        str: The prompt.
+        """
+        if relevant_examples or self.pinned_examples.get(context_name):
+            return self.generate_prompt(relevant_examples, user_input, context_name)
+        return f"No relevant examples found for {context_name}. Please try again."
+
+    def pin_examples(self, context_name: str, examples: list):
+        """
+        Sets the examples included in every prompt of a context, such as the examples
+        returned by ContextOptimizer.get_optimized_context.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        examples (list): The examples, in the order they appear in prompts. An empty list unpins them.
+
+        Returns:
+        -------
+        None
+        """
+        if examples:
+            self.pinned_examples[context_name] = list(examples)
+        else:
+            self.pinned_examples.pop(context_name, None)
+        self._bound_templates.clear()
+
+    def shared_prefix(self, context_name: str) -> str:
+        """
+        Returns the text every prompt of a context starts with: the template's static text
+        before its first slot that changes with the query.
+
+        With the "prefix_stable" layout, it holds the instructions and the pinned examples.
+        With the "query_first" layout, it only holds the instructions.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        str: The shared prefix, possibly empty.
+        """
+        return self._bind(context_name)[0].segments[0]
+
+    def shared_prefix_bytes(self, context_name: str) -> int:
+        """
+        Returns the length in bytes of the text every prompt of a context starts with,
+        which bounds what a provider-side prompt cache can reuse between its prompts.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        int: The length of the shared prefix, encoded in UTF-8.
+        """
+        return len(self.shared_prefix(context_name).encode("utf-8"))
+
+    def _bind(self, context_name: str) -> tuple:
+        """
+        Returns the template with the instructions, pinned examples and name of a context
+        rendered into its static segments, rendering it the first time it is needed.
+
+        Args:
+        ----
+        context_name (str): The name of the context, or None.
+
+        Returns:
+        -------
+        tuple: The bound template and the set of pinned examples of the context.
+        """
+        key = (context_name, self.instructions, self.template)
+        bound = self._bound_templates.get(key)
+        if bound is None:
+            pinned = self.pinned_examples.get(context_name, [])
+            template = self.template.bind(instructions=self.instructions, pinned=pinned, context_name=context_name)
+            bound = self._bound_templates[key] = (template, frozenset(pinned))
+        return bound
+
     def extract_keywords(self, user_input: str) -> list:
         """
         Extracts relevant keywords from user input.
@@ -94,38 +414,113 @@ class PromptBuilder:
 
         return keywords
 
-    def find_relevant_examples(self, examples: list, keywords: list) -> list:
+    def find_relevant_examples(self, examples: list, keywords: list, context_name: str = None,
+                               max_tokens: int = None) -> list:
         """
         Finds the most relevant examples that match the keywords.
 
+        When a context name is given, the examples are retrieved through the context
+        manager's index, using the builder's strategy, instead of scoring every example
+        in the list, and their token counts are the ones cached when they were added.
+
         Args:
         ----
-        examples (list): A list of context examples.
+        examples (list): A list of context examples. Ignored when context_name is given.
         keywords (list): A list of keywords.
+        context_name (str, optional): The name of the context to retrieve examples from.
+        max_tokens (int, optional): The maximum number of tokens of the examples as they appear in
+            the prompt. The most relevant examples that fit are kept, best first, among the top_k
+            most relevant if top_k is set, or among all the matching examples otherwise.
 
         Returns:
         -------
         list: A list of the most relevant examples that match the keywords.
         """
+        top_k = self.top_k
+        if top_k is None and max_tokens is None:
+            top_k = DEFAULT_TOP_K
+        if context_name is not None:
+            if top_k is not None:
+                example_ids = self._rank_ids(context_name, keywords, top_k)
+                if max_tokens is not None:
+                    token_counts = self.context_manager.get_token_counts(context_name, example_ids)
+                    example_ids = [example_ids[i] for i in self._pack(token_counts, max_tokens)]
+                return self.context_manager.get_examples(context_name, example_ids)
+
+            # Rank a growing pool of candidates until all the matches are seen or no example fits anymore
+            frame = self.context_manager.token_counter(self.template.example_frame)
+            pool = BUDGET_POOL
+            while True:
+                example_ids = self._rank_ids(context_name, keywords, pool)
+                token_counts = self.context_manager.get_token_counts(context_name, example_ids)
+                selected = self._pack(token_counts, max_tokens)
+                spent = sum(token_counts[i] + frame for i in selected)
+                if len(example_ids) < pool or max_tokens - spent < frame:
+                    break
+                pool *= 4
+            return self.context_manager.get_examples(context_name, [example_ids[i] for i in selected])
+
         relevant_examples = []
         for example in examples:
             # Calculate the similarity between the example and the keywords
             similarity = self.calculate_similarity(example, keywords)
-            if similarity > 0.5:
+            if similarity > self.similarity_threshold:
                 relevant_examples.append((example, similarity))
 
-        # Sort the relevant examples by similarity
-        relevant_examples.sort(key=lambda x: x[1], reverse=True)
+        # Select the top k most relevant examples; ties keep the order of the examples
+        relevant_examples = heapq.nlargest(len(relevant_examples) if top_k is None else top_k, relevant_examples,
+                                           key=lambda x: x[1])
+        relevant_examples = [example[0] for example in relevant_examples]
+
+        if max_tokens is not None:
+            token_counter = self.context_manager.token_counter
+            token_counts = [token_counter(example) for example in relevant_examples]
+            relevant_examples = [relevant_examples[i] for i in self._pack(token_counts, max_tokens)]
 
-        return [example[0] for example in relevant_examples[:3]]  # Return the top 3 most relevant examples
+        return relevant_examples
 
-    def calculate_similarity(self, example: str, keywords: list) -> float:
+    def _rank_ids(self, context_name: str, keywords: list, top_k: int) -> list:
+        """
+        Returns the ids of the most relevant examples of a context, with the builder's strategy.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        keywords (list): A list of keywords.
+        top_k (int): The maximum number of examples to return.
+
+        Returns:
+        -------
+        list: The ids of the examples, most relevant first.
+        """
+        ranked = self.context_manager.rank_examples(context_name, keywords, top_k, self.similarity_threshold,
+                                                   self.strategy)
+        return [example_id for example_id, _ in ranked]
+
+    def _pack(self, token_counts: list, max_tokens: int) -> list:
+        """
+        Selects the examples that fit in a token budget, counting the text framing each of them.
+
+        Args:
+        ----
+        token_counts (list): The number of tokens of each example, best first.
+        max_tokens (int): The maximum number of tokens of the framed examples.
+
+        Returns:
+        -------
+        list: The positions of the selected examples.
+        """
+        frame = self.context_manager.token_counter(self.template.example_frame)
+        return pack_to_budget([n_tokens + frame for n_tokens in token_counts], max_tokens)
+
+    def calculate_similarity(self, example, keywords: list) -> float:
         """
         Calculates the similarity between the example and the keywords.
 
         Args:
         ----
-        example (str): A context example.
+        example (str or frozenset): A context example, or its cached token set as
+            returned by ContextManager.get_token_sets.
         keywords (list): A list of keywords.
 
         Returns:
@@ -133,31 +528,33 @@ class PromptBuilder:
         float: The similarity between the example and the keywords.
         """
         # Calculate the Jaccard similarity between the example and the keywords
-        example_tokens = set(example.split())
+        example_tokens = example if isinstance(example, frozenset) else set(example.split())
         keyword_tokens = set(keywords)
-        intersection = example_tokens & keyword_tokens
-        union = example_tokens | keyword_tokens
-        similarity = len(intersection) / len(union)
+        intersection = len(example_tokens & keyword_tokens)
+        union = len(example_tokens) + len(keyword_tokens) - intersection
+        similarity = intersection / union
 
         return similarity
 
-    def generate_prompt(self, relevant_examples: list, user_input: str) -> str:
+    def generate_prompt(self, relevant_examples: list, user_input: str, context_name: str = None) -> str:
         """
         Generates a prompt using the relevant examples and user input.
 
+        The prompt is rendered from the builder's template in a single join, the parts that
+        only depend on the context being rendered once per context.
+
         Args:
         ----
         relevant_examples (list): A list of relevant examples.
         user_input (str): The user's input.
+        context_name (str, optional): The name of the context, whose pinned examples are included.
 
         Returns:
         -------
         str: A prompt based on the relevant examples and user input.
         """
-        prompt = ""
-        for example in relevant_examples:
-            prompt += f"Example: {example}\n"
-        prompt += f"User Input: {user_input}\n"
-        prompt += "Please respond based on the above context"
-
-        return prompt
\ No newline at end of file
+        template, pinned = self._bind(context_name)
+        if pinned:
+            # Pinned examples appear once, where the template puts them
+            relevant_examples = [example for example in relevant_examples if example not in pinned]
+        return template.render({"examples": relevant_examples, "user_input": user_input})
@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PromptCache:
+    """
+    A class used to cache retrieval results of a prompt builder.
+
+    Entries are evicted least recently used first once the cache holds more than
+    max_entries entries or an estimated max_bytes bytes, and expire ttl seconds after
+    they were stored. Keys include the version of the context, so entries of a context
+    that changed are never returned.
+
+    Attributes:
+    ----------
+    hits : int
+        The number of lookups that found a fresh entry.
+    misses : int
+        The number of lookups that found no entry, or an expired one.
+    evictions : int
+        The number of entries evicted to stay within the size bounds.
+    expirations : int
+        The number of entries dropped because they expired.
+
+    Methods:
+    -------
+    get(key)
+        Returns the cached value of a key, or None.
+    put(key, value)
+        Stores a value under a key.
+    clear()
+        Removes all entries.
+    stats()
+        Returns the cache counters.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = None, ttl: float = None, clock: callable = time.monotonic):
+        """
+        Initializes an empty prompt cache.
+
+        Args:
+        ----
+        max_entries (int): The maximum number of entries.
+        max_bytes (int, optional): The maximum estimated size of the cached values, in bytes.
+        ttl (float, optional): The number of seconds after which an entry expires.
+        clock (callable): A function returning the current time in seconds.
+
+        Returns:
+        -------
+        None
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.size_bytes = 0
+        self._entries = OrderedDict()  # key -> (value, size, stored_at)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """
+        Returns the number of entries.
+
+        Returns:
+        -------
+        int: The number of entries.
+        """
+        return len(self._entries)
+
+    def __getstate__(self) -> dict:
+        """
+        Returns the settings of the cache, so that a copy sent to another process starts empty.
+
+        Returns:
+        -------
+        dict: The settings of the cache.
+        """
+        return {"max_entries": self.max_entries, "max_bytes": self.max_bytes, "ttl": self.ttl, "clock": self.clock}
+
+    def __setstate__(self, state: dict):
+        """
+        Initializes an empty cache from the settings returned by __getstate__.
+
+        Args:
+        ----
+        state (dict): The settings of the cache.
+
+        Returns:
+        -------
+        None
+        """
+        self.__init__(**state)
+
+    def get(self, key):
+        """
+        Returns the cached value of a key, or None.
+
+        Args:
+        ----
+        key (tuple): The key to look up.
+
+        Returns:
+        -------
+        object: The cached value, or None if there is no fresh entry for the key.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, stored_at = entry
+            if self.ttl is not None and self.clock() - stored_at > self.ttl:
+                del self._entries[key]
+                self.size_bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: tuple):
+        """
+        Stores a value under a key.
+
+        Args:
+        ----
+        key (tuple): The key to store the value under.
+        value (tuple): A tuple of examples.
+
+        Returns:
+        -------
+        None
+        """
+        size = sum(len(example) for example in value) + 8 * len(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= previous[1]
+            self._entries[key] = (value, size, self.clock())
+            self.size_bytes += size
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or (self.max_bytes is not None and self.size_bytes > self.max_bytes)):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Removes all entries.
+
+        Returns:
+        -------
+        None
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+
+        Returns:
+        -------
+        dict: The hits, misses, evictions, expirations, entries and estimated size in bytes.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+        }
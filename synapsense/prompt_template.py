@@ -0,0 +1,180 @@
+# The slots a prompt template can use. Lists of examples are rendered with the example template.
+SLOTS = ("instructions", "pinned", "examples", "user_input", "context_name")
+
+QUERY_FIRST = "{instructions}{examples}{pinned}User Input: {user_input}\nPlease respond based on the above context"
+PREFIX_STABLE = "{instructions}{pinned}{examples}User Input: {user_input}\nPlease respond based on the above context"
+
+
+class PromptTemplate:
+    """
+    A class used to render prompts from a template compiled into static segments and slots.
+
+    The template uses str.format syntax, with the slots listed in SLOTS and without format
+    specifications. It is parsed once, when the template is created, into the static
+    segments found between its slots, and a prompt is rendered with a single join. Slots
+    known in advance, such as the instructions and pinned examples of a context, can be
+    bound once, which merges them into the static segments around them.
+
+    Attributes:
+    ----------
+    segments : list
+        The static segments, one more than the slots: the text before, between and after them.
+    slots : list
+        The names of the slots, in order.
+    example_prefix : str
+        The text rendered before each example.
+    example_suffix : str
+        The text rendered after each example.
+
+    Methods:
+    -------
+    bind(**values)
+        Returns a template with some slots rendered into its static segments.
+    render(values)
+        Renders a prompt.
+    """
+
+    def __init__(self, template: str = QUERY_FIRST, example: str = "Example: {example}\n"):
+        """
+        Compiles a prompt template.
+
+        Args:
+        ----
+        template (str): The template of the prompt.
+        example (str): The template of each example, with a single {example} slot.
+
+        Returns:
+        -------
+        None
+
+        Raises:
+        ------
+        ValueError: If a template uses an unknown slot or a format specification.
+        """
+        self.template = template
+        self.example = example
+        self.segments, self.slots = _compile(template, SLOTS)
+        example_segments, _ = _compile(example, ("example",))
+        if len(example_segments) != 2:
+            raise ValueError("The example template must have exactly one {example} slot")
+        self.example_prefix, self.example_suffix = example_segments
+
+    def __repr__(self) -> str:
+        return f"PromptTemplate({self.template!r}, example={self.example!r})"
+
+    @property
+    def example_frame(self) -> str:
+        """
+        Returns the text rendered around each example.
+
+        Returns:
+        -------
+        str: The example template without its example.
+        """
+        return self.example_prefix + self.example_suffix
+
+    def bind(self, **values) -> 'PromptTemplate':
+        """
+        Returns a template with some slots rendered into its static segments.
+
+        Args:
+        ----
+        **values: The values of the slots to bind. Lists are rendered as examples, and None as
+            an empty string. Instructions are followed by a newline.
+
+        Returns:
+        -------
+        PromptTemplate: A template with the remaining slots only.
+        """
+        bound = object.__new__(PromptTemplate)
+        bound.template = self.template
+        bound.example = self.example
+        bound.example_prefix = self.example_prefix
+        bound.example_suffix = self.example_suffix
+        segments = [self.segments[0]]
+        slots = []
+        for name, segment in zip(self.slots, self.segments[1:]):
+            if name in values:
+                segments[-1] = "".join(self._render_slot([segments[-1]], name, values[name])) + segment
+            else:
+                slots.append(name)
+                segments.append(segment)
+        bound.segments = segments
+        bound.slots = slots
+        return bound
+
+    def render(self, values: dict) -> str:
+        """
+        Renders a prompt.
+
+        Args:
+        ----
+        values (dict): The value of each slot. Lists are rendered as examples, and missing slots
+            or None as an empty string. Instructions are followed by a newline.
+
+        Returns:
+        -------
+        str: The prompt.
+        """
+        parts = [self.segments[0]]
+        for name, segment in zip(self.slots, self.segments[1:]):
+            self._render_slot(parts, name, values.get(name))
+            parts.append(segment)
+        return "".join(parts)
+
+    def _render_slot(self, parts: list, name: str, value) -> list:
+        """
+        Appends the rendered parts of a slot to a list of parts.
+
+        Args:
+        ----
+        parts (list): The parts of the prompt rendered so far.
+        name (str): The name of the slot.
+        value: The value of the slot.
+
+        Returns:
+        -------
+        list: The list of parts.
+        """
+        if value is None:
+            return parts
+        if isinstance(value, (list, tuple)):
+            prefix = self.example_prefix
+            suffix = self.example_suffix
+            for example in value:
+                parts += (prefix, str(example), suffix)
+        elif name == "instructions":
+            parts += (value, "\n")
+        else:
+            parts.append(str(value))
+        return parts
+
+
+def _compile(template: str, names: tuple) -> tuple:
+    """
+    Splits a template into its static segments and the names of its slots.
+
+    Args:
+    ----
+    template (str): The template, in str.format syntax.
+    names (tuple): The allowed slot names.
+
+    Returns:
+    -------
+    tuple: The list of static segments and the list of slot names.
+    """
+    from string import Formatter
+
+    segments = [""]
+    slots = []
+    for literal, name, format_spec, conversion in Formatter().parse(template):
+        segments[-1] += literal
+        if name is None:
+            continue
+        if name not in names:
+            raise ValueError(f"Unknown template slot: {{{name}}}")
+        if format_spec or conversion:
+            raise ValueError(f"Template slot {{{name}}} must not have a format specification")
+        slots.append(name)
+        segments.append("")
+    return segments, slots
@@ -0,0 +1,440 @@
+import threading
+
+from .context_index import select_top_k
+from .context_manager import ContextManager
+from .snapshot import ContextSnapshot
+from .tokens import estimate_tokens
+
+
+def _serve(connection, token_counter: callable, compact: bool):
+    """
+    Runs a shard: applies the method calls received on a connection to a context manager.
+
+    Args:
+    ----
+    connection (Connection): The worker's end of the pipe to the parent process.
+    token_counter (callable): The token counter of the shard's context manager.
+    compact (bool): Whether the shard's context manager is in compact mode.
+
+    Returns:
+    -------
+    None
+    """
+    context_manager = ContextManager(token_counter, compact=compact)
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        method, args = request
+        try:
+            handler = _HANDLERS.get(method)
+            if handler is None:
+                result = getattr(context_manager, method)(*args)
+            else:
+                result = handler(context_manager, *args)
+            connection.send((True, result))
+        except Exception as error:
+            connection.send((False, error))
+    connection.close()
+
+
+def _truncate_context(context_manager: ContextManager, context_name: str, size: int, keep: bool):
+    """
+    Rolls a context of a shard back to its first examples, rebuilding its index.
+
+    Args:
+    ----
+    context_manager (ContextManager): The context manager of the shard.
+    context_name (str): The name of the context.
+    size (int): The number of examples to keep.
+    keep (bool): Whether the context existed before, so it is kept even if it has no example left.
+
+    Returns:
+    -------
+    None
+    """
+    examples = list(context_manager.get_context(context_name))[:size]
+    context_manager.remove_context(context_name)
+    if keep:
+        context_manager.add_context(context_name, examples)
+
+
+def _rank_prefix(context_manager: ContextManager, context_name: str, size: int, keywords: list, top_k: int,
+                 threshold: float, strategy: str) -> list:
+    """
+    Ranks the first examples of a context of a shard, those of the snapshot a query was made on.
+
+    Examples added after the snapshot are left out before the top k are selected, so they
+    cannot take the place of the examples of the snapshot.
+
+    Args:
+    ----
+    context_manager (ContextManager): The context manager of the shard.
+    context_name (str): The name of the context.
+    size (int): The number of examples of the context in the shard when the snapshot was taken.
+    keywords (list): A list of keywords.
+    top_k (int): The maximum number of examples to return.
+    threshold (float): The similarity an example must exceed to be returned.
+    strategy (str): The retrieval strategy, as in ContextManager.rank_examples.
+
+    Returns:
+    -------
+    list: A list of (example_id, similarity) tuples, most similar first.
+    """
+    snapshot = context_manager.snapshot(context_name)
+    if snapshot is None:
+        return []
+    if size < snapshot.size:
+        snapshot = ContextSnapshot(snapshot.examples, size, snapshot.version, snapshot.index, snapshot.metadata)
+    return context_manager._rank(context_name, snapshot, keywords, top_k, threshold, strategy)
+
+
+# The requests a shard handles with a function of this module rather than a method of its context manager.
+_HANDLERS = {"truncate_context": _truncate_context, "rank_prefix": _rank_prefix}
+
+
+def _shutdown(processes: list, connections: list):
+    """
+    Stops the worker processes of a sharded context manager.
+
+    Args:
+    ----
+    processes (list): The worker processes.
+    connections (list): The parent's ends of the pipes to the workers.
+
+    Returns:
+    -------
+    None
+    """
+    for connection in connections:
+        try:
+            connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        connection.close()
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+
+
+class ShardedContextManager(ContextManager):
+    """
+    A context manager that splits the examples of each context across worker processes.
+
+    Each of the shards is a process holding a ContextManager with one example out of
+    every `shards`, in order: the example with id i lives in shard i % shards, under the
+    id i // shards. Ranking sends the keywords to every shard at once, each shard
+    ranks its own examples with its own index, and the per-shard top k are merged by
+    similarity and then by id, so the results are the same as with a single process.
+    The parent keeps the text of the examples, so retrieving them does not involve the
+    shards. Examples must be added with add_context, which forwards them to the shards.
+
+    Each pipe has its own lock, held from a request to its reply only, so concurrent
+    queries and writes interleave on the shards instead of waiting for each other.
+    If a shard fails to add its examples, the other shards are rolled back; if that
+    fails too, the manager is marked broken and every later call raises RuntimeError.
+
+    Attributes:
+    ----------
+    shards : int
+        The number of worker processes.
+    token_counter : callable
+        The function counting the prompt tokens of each example when it is added.
+
+    Methods:
+    -------
+    close()
+        Stops the worker processes.
+    """
+
+    def __init__(self, shards: int = 4, token_counter: callable = estimate_tokens, compact: bool = False,
+                 instrumentation=None):
+        """
+        Initializes an empty context manager and starts its worker processes.
+
+        Args:
+        ----
+        shards (int): The number of worker processes.
+        token_counter (callable): A function returning the number of prompt tokens of an example,
+            called once per example, in its shard, when it is added.
+        compact (bool): Whether the parent and the shards store examples in compact mode.
+        instrumentation (Instrumentation, optional): A hook told the duration of each call to
+            rank_examples, scatter and merge included. Nothing is measured if omitted.
+
+        Returns:
+        -------
+        None
+        """
+        import multiprocessing
+        import weakref
+
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        super().__init__(token_counter, compact=compact, instrumentation=instrumentation)
+        self.shards = shards
+        self._connections = []
+        self._processes = []
+        for _ in range(shards):
+            parent_end, child_end = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve, args=(child_end, token_counter, compact), daemon=True)
+            process.start()
+            child_end.close()
+            self._connections.append(parent_end)
+            self._processes.append(process)
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._broken = None
+        self._finalizer = weakref.finalize(self, _shutdown, self._processes, self._connections)
+
+    def close(self):
+        """
+        Stops the worker processes.
+
+        Returns:
+        -------
+        None
+        """
+        self._finalizer()
+
+    def __enter__(self) -> 'ShardedContextManager':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _scatter(self, requests: list) -> list:
+        """
+        Sends a method call to each shard, then waits for all their results.
+
+        The lock of each pipe is taken in shard order before sending to it, and released as
+        soon as its reply arrives, so the next call can use the shard while this one waits for
+        the others.
+
+        Args:
+        ----
+        requests (list): For each shard, a (method, args) tuple, or None to skip the shard.
+
+        Returns:
+        -------
+        list: The result of each shard, or None for skipped shards.
+
+        Raises:
+        ------
+        RuntimeError: If the manager is broken.
+        Exception: The first exception raised by a shard.
+        """
+        if self._broken is not None:
+            raise RuntimeError("The shards are out of sync after a failed write; "
+                               "create a new ShardedContextManager") from self._broken
+        replies = [(True, None)] * len(requests)
+        # The shards sent a request whose reply has not been read yet, with their lock held
+        waiting = []
+        try:
+            for shard, request in enumerate(requests):
+                if request is not None:
+                    self._locks[shard].acquire()
+                    waiting.append(shard)
+                    self._connections[shard].send(request)
+            while waiting:
+                replies[waiting[0]] = self._connections[waiting[0]].recv()
+                self._locks[waiting.pop(0)].release()
+        except BaseException as error:
+            if waiting:
+                # A pipe may be left with a reply nobody reads, which the next call would take for its own
+                self._broken = error
+            for shard in waiting:
+                self._locks[shard].release()
+            raise
+        for ok, result in replies:
+            if not ok:
+                raise result
+        return [result for _, result in replies]
+
+    def add_context(self, context_name: str, examples: list, metadata: list = None):
+        """
+        Adds a new list of examples for a specific context.
+
+        The examples are dealt to the shards in turn, continuing from the last example of
+        the context, and every shard indexes its part in parallel. Metadata is indexed in
+        the parent process.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        examples (list): A list of examples for the context.
+        metadata (list, optional): The metadata of each example, as in ContextManager.add_context.
+
+        Returns:
+        -------
+        None
+
+        Raises:
+        ------
+        ValueError: If metadata is given and does not have one entry per example.
+        TypeError: If a metadata entry is not a dictionary or None, or has an unhashable value.
+        RuntimeError: If the manager is broken.
+        Exception: The first exception raised by a shard, once the shards are rolled back.
+        """
+        examples = list(examples)
+        if metadata is not None:
+            metadata = list(metadata)
+            if len(metadata) != len(examples):
+                raise ValueError("metadata must have one entry per example")
+            from .metadata_index import check_records
+
+            # Checked before the shards add the examples, so that indexing it later cannot fail
+            check_records(metadata)
+        with self._write_lock:
+            stored = self.contexts.get(context_name)
+            start = 0 if stored is None else len(stored)
+            shards = self.shards
+            # Queries may see the shards ahead of the parent meanwhile, and ignore the examples
+            # beyond the size of their snapshot
+            try:
+                self._scatter([("add_context", (context_name, examples[(shard - start) % shards::shards]))
+                               for shard in range(shards)])
+            except Exception:
+                if self._broken is None:
+                    self._roll_back(context_name, start, stored is not None)
+                raise
+            if stored is None:
+                stored = self._new_examples()
+                self.contexts = {**self.contexts, context_name: stored}
+            if metadata is not None:
+                self._add_metadata(context_name, metadata, start)
+            stored.extend(examples)
+            self._versions[context_name] = next(self._version_counter)
+            self._publish(context_name)
+
+    def _roll_back(self, context_name: str, size: int, keep: bool):
+        """
+        Rolls the shards back to the first examples of a context after a failed add_context,
+        or marks the manager broken if that fails too.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        size (int): The number of examples of the context before add_context.
+        keep (bool): Whether the context existed before add_context.
+
+        Returns:
+        -------
+        None
+        """
+        shards = self.shards
+        try:
+            self._scatter([("truncate_context", (context_name, len(range(shard, size, shards)), keep))
+                           for shard in range(shards)])
+        except Exception as error:
+            self._broken = error
+
+    def remove_context(self, context_name: str):
+        """
+        Removes a context by name.
+
+        Args:
+        ----
+        context_name (str): The name of the context to remove.
+
+        Returns:
+        -------
+        None
+        """
+        with self._write_lock:
+            self._scatter([("remove_context", (context_name,))] * self.shards)
+            self.contexts = {name: examples for name, examples in self.contexts.items() if name != context_name}
+            self._versions.pop(context_name, None)
+            self._metadata.pop(context_name, None)
+            self._publish(context_name)
+
+    def _rank(self, context_name: str, snapshot: ContextSnapshot, keywords: list, top_k: int, threshold: float,
+              strategy: str) -> list:
+        """
+        Ranks the examples of a snapshot of a context by similarity with the keywords, on every shard at once.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        snapshot (ContextSnapshot): A snapshot of the context.
+        keywords (list): A list of keywords.
+        top_k (int): The maximum number of examples to return.
+        threshold (float): The similarity an example must exceed to be returned.
+        strategy (str): The retrieval strategy of each shard, as in ContextManager.rank_examples.
+
+        Returns:
+        -------
+        list: A list of (example_id, similarity) tuples of examples of the snapshot, most similar
+            first, ties broken by ascending example id.
+        """
+        shards = self.shards
+        # The shards may be ahead of the snapshot, so each one ranks its part of the snapshot only
+        results = self._scatter([("rank_prefix", (context_name, len(range(shard, snapshot.size, shards)), keywords,
+                                                  top_k, threshold, strategy))
+                                 for shard in range(shards)])
+        ranked = [(local_id * shards + shard, similarity)
+                  for shard, shard_ranked in enumerate(results) for local_id, similarity in shard_ranked]
+        return select_top_k(ranked, top_k)
+
+    def get_token_sets(self, context_name: str) -> list:
+        """
+        Retrieves the token sets of the examples of a context from the shards.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        list: The frozen token set of each example, in the same order as get_context.
+        """
+        if context_name not in self.contexts:
+            return []
+        token_sets = [None] * len(self.contexts[context_name])
+        for shard, shard_sets in enumerate(self._scatter([("get_token_sets", (context_name,))] * self.shards)):
+            token_sets[shard::self.shards] = list(shard_sets)
+        return token_sets
+
+    def get_token_counts(self, context_name: str, example_ids: list) -> list:
+        """
+        Retrieves the number of prompt tokens of examples of a context by id from the shards.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        example_ids (list): A list of example ids, as returned by rank_examples.
+
+        Returns:
+        -------
+        list: The number of prompt tokens of each example, in the same order as the ids.
+        """
+        shards = self.shards
+        local_ids = [[] for _ in range(shards)]
+        for example_id in example_ids:
+            local_ids[example_id % shards].append(example_id // shards)
+        results = self._scatter([("get_token_counts", (context_name, ids)) if ids else None for ids in local_ids])
+        results = [iter(counts or ()) for counts in results]
+        return [next(results[example_id % shards]) for example_id in example_ids]
+
+    def get_version(self, context_name: str) -> int:
+        """
+        Returns the version of a context, which changes whenever the context does.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        int: The version of the context, or 0 if the context does not exist.
+        """
+        return self._versions.get(context_name, 0)
+
+    def __str__(self) -> str:
+        """
+        Returns a string representation of the context manager.
+
+        Returns:
+        -------
+        str: A string representation of the context manager.
+        """
+        return f"ShardedContextManager with {len(self.contexts)} contexts on {self.shards} shards"
@@ -0,0 +1,71 @@
+from itertools import islice
+
+
+class ContextSnapshot:
+    """
+    A class used to read a context as it was after a write, while later writes go on.
+
+    The examples and index of a context are append-only: a write adds examples and index
+    entries after the existing ones, then publishes a new snapshot recording how many
+    examples the context has. A snapshot only ever reads its first size examples, so it
+    stays consistent without locks, however many examples are added after it.
+
+    Attributes:
+    ----------
+    examples : list
+        The append-only store of the examples of the context, of which the snapshot holds the
+        first size.
+    size : int
+        The number of examples of the snapshot.
+    version : int
+        The version of the context when the snapshot was published.
+    index : ContextIndex
+        The append-only index of the context, or None if the context manager keeps no index.
+    metadata : MetadataIndex
+        The append-only metadata index of the context, or None if no example has metadata.
+
+    Methods:
+    -------
+    __len__()
+        Returns the number of examples of the snapshot.
+    __iter__()
+        Iterates over the examples of the snapshot.
+    __getitem__(example_id)
+        Returns an example of the snapshot by id.
+    """
+
+    __slots__ = ("examples", "size", "version", "index", "metadata")
+
+    def __init__(self, examples, size: int, version: int, index=None, metadata=None):
+        """
+        Initializes a snapshot.
+
+        Args:
+        ----
+        examples (list): The append-only store of the examples of the context.
+        size (int): The number of examples of the snapshot.
+        version (int): The version of the context.
+        index (ContextIndex, optional): The append-only index of the context.
+        metadata (MetadataIndex, optional): The append-only metadata index of the context.
+
+        Returns:
+        -------
+        None
+        """
+        self.examples = examples
+        self.size = size
+        self.version = version
+        self.index = index
+        self.metadata = metadata
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        return islice(self.examples, self.size)
+
+    def __getitem__(self, example_id: int) -> str:
+        if not 0 <= example_id < self.size:
+            raise IndexError("example id out of range")
+        return self.examples[example_id]
+
@@ -0,0 +1,154 @@
+class SparseMatrix:
+    """
+    A class used to score the examples of a context with sparse matrix arithmetic.
+
+    The examples are compiled into a binary example x vocabulary matrix, stored in
+    coordinate form, plus a vector with the number of distinct tokens of each example.
+    The Jaccard similarity of every example with a query is then computed in a single
+    sparse matrix-vector product, without a Python loop over the examples. Requires NumPy.
+
+    Attributes:
+    ----------
+    vocabulary : dict
+        A dictionary where the keys are tokens and the values are column numbers.
+
+    Methods:
+    -------
+    add(token_sets)
+        Appends a row for each token set to the matrix.
+    rank(keywords, top_k, threshold, limit)
+        Ranks the examples by Jaccard similarity with the keywords.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty sparse matrix.
+
+        Returns:
+        -------
+        None
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("The sparse retrieval strategy requires NumPy: pip install synapsense[numpy]") from None
+        self._np = np
+        self.vocabulary = {}
+        self._rows = np.empty(1024, dtype=np.int64)
+        self._cols = np.empty(1024, dtype=np.int64)
+        self._cardinality = np.empty(256, dtype=np.int64)
+        self._nnz = 0
+        self._n_rows = 0
+
+    def __len__(self) -> int:
+        """
+        Returns the number of rows of the matrix.
+
+        Returns:
+        -------
+        int: The number of rows of the matrix.
+        """
+        return self._n_rows
+
+    def add(self, token_sets: list):
+        """
+        Appends a row for each token set to the matrix.
+
+        The underlying arrays grow geometrically, so appending is amortized linear in the
+        number of new tokens.
+
+        Args:
+        ----
+        token_sets (list): The token sets of the new examples.
+
+        Returns:
+        -------
+        None
+        """
+        np = self._np
+        vocabulary = self.vocabulary
+        rows, cols, cardinality = [], [], []
+        for row, tokens in enumerate(token_sets, self._n_rows):
+            for token in tokens:
+                col = vocabulary.get(token)
+                if col is None:
+                    col = vocabulary[token] = len(vocabulary)
+                cols.append(col)
+            rows.extend([row] * len(tokens))
+            cardinality.append(len(tokens))
+
+        nnz = self._nnz + len(cols)
+        n_rows = self._n_rows + len(cardinality)
+        self._rows = self._reserve(self._rows, nnz)
+        self._cols = self._reserve(self._cols, nnz)
+        self._cardinality = self._reserve(self._cardinality, n_rows)
+        self._rows[self._nnz:nnz] = np.asarray(rows, dtype=np.int64)
+        self._cols[self._nnz:nnz] = np.asarray(cols, dtype=np.int64)
+        self._cardinality[self._n_rows:n_rows] = np.asarray(cardinality, dtype=np.int64)
+        self._nnz = nnz
+        self._n_rows = n_rows
+
+    def _reserve(self, array, size: int):
+        """
+        Returns the array, or a copy of it at least twice as large if it cannot hold size items.
+
+        Args:
+        ----
+        array (numpy.ndarray): The array to grow.
+        size (int): The number of items the array must hold.
+
+        Returns:
+        -------
+        numpy.ndarray: An array that can hold size items.
+        """
+        if size <= len(array):
+            return array
+        grown = self._np.empty(max(size, 2 * len(array)), dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def rank(self, keywords: list, top_k: int = 3, threshold: float = 0.5, limit: int = None) -> list:
+        """
+        Ranks the examples by Jaccard similarity with the keywords.
+
+        The intersection sizes are the product of the matrix with the binary query vector,
+        and the union sizes are |row| + |query| - intersection. The similarities are exactly
+        those of PromptBuilder.calculate_similarity, and ties keep the order of the rows.
+        Rows are appended after the existing ones and the arrays are only replaced by larger
+        copies, so the first limit rows can be ranked while rows are added.
+
+        Args:
+        ----
+        keywords (list): A list of keywords.
+        top_k (int): The maximum number of examples to return.
+        threshold (float): The similarity an example must exceed to be returned.
+        limit (int, optional): Only the rows with a lower number are ranked. Defaults to all rows.
+
+        Returns:
+        -------
+        list: A list of (example_id, similarity) tuples, most similar first.
+        """
+        np = self._np
+        n_rows = self._n_rows if limit is None else min(limit, self._n_rows)
+        rows, cols, cardinality = self._rows, self._cols, self._cardinality[:n_rows]
+        keyword_tokens = set(keywords)
+        columns = [self.vocabulary[token] for token in keyword_tokens if token in self.vocabulary]
+        if not columns or not n_rows:
+            return []
+
+        nnz = int(cardinality.sum())
+        query = np.zeros(len(self.vocabulary), dtype=np.float64)
+        query[columns] = 1.0
+        intersection = np.bincount(rows[:nnz], weights=query[cols[:nnz]], minlength=n_rows)
+        union = cardinality + len(keyword_tokens) - intersection
+        similarity = intersection / union
+
+        example_ids = np.flatnonzero(similarity > threshold)
+        scores = similarity[example_ids]
+        if len(scores) > top_k > 0:
+            # Keep everything tied with the k-th best score, so the final order stays deterministic
+            kth = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+            example_ids = example_ids[scores >= kth]
+            scores = scores[scores >= kth]
+        order = np.lexsort((example_ids, -scores))[:top_k]
+        return [(int(example_ids[i]), float(scores[i])) for i in order]
@@ -0,0 +1,576 @@
+import threading
+from time import perf_counter
+
+from .context_index import select_top_k
+from .context_manager import ContextManager
+from .tokens import estimate_tokens
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS contexts (
+    context_id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS examples (
+    context_id INTEGER NOT NULL,
+    example_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    n_tokens INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    PRIMARY KEY (context_id, example_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    context_id INTEGER NOT NULL,
+    token TEXT NOT NULL,
+    example_id INTEGER NOT NULL,
+    PRIMARY KEY (context_id, token, example_id)
+) WITHOUT ROWID;
+"""
+
+# The version of the schema, stored in the meta table. Version 2 added examples.prompt_tokens.
+SCHEMA_VERSION = 2
+
+# SQLite limits the number of parameters of a statement.
+_MAX_PARAMETERS = 900
+
+
+class SQLiteContextManager(ContextManager):
+    """
+    A context manager that keeps its contexts and their inverted index in a SQLite file.
+
+    It offers the API of ContextManager, so it can be passed to a PromptBuilder in its
+    place, except for snapshot, batch and merge_contexts, which need the contexts in
+    memory and raise TypeError here. Retrieval runs on the on-disk index and fetches the
+    text of the returned examples only, so the corpus never has to fit in memory. Several
+    processes can open the same file read-only and share it through the operating
+    system's page cache, as the file is memory-mapped.
+
+    Attributes:
+    ----------
+    path : str
+        The path of the SQLite file.
+    read_only : bool
+        Whether the file is opened read-only.
+    token_counter : callable
+        The function counting the prompt tokens of each example when it is added.
+    instrumentation : Instrumentation
+        An optional hook timing rank_examples and told the number of candidates it scores, or None.
+
+    Methods:
+    -------
+    close()
+        Closes the connection to the SQLite file.
+    """
+
+    def __init__(self, path: str, read_only: bool = False, mmap_size: int = 1 << 30,
+                 token_counter: callable = estimate_tokens, instrumentation=None):
+        """
+        Initializes a context manager backed by a SQLite file, creating the file if needed.
+
+        Files written with an older schema are migrated when opened for writing, counting the
+        prompt tokens of their examples with the token counter.
+
+        Args:
+        ----
+        path (str): The path of the SQLite file.
+        read_only (bool): Whether to open the file read-only.
+        mmap_size (int): The maximum number of bytes of the file to memory-map.
+        token_counter (callable): A function returning the number of prompt tokens of an example,
+            called once per example when it is added and stored in the file.
+        instrumentation (Instrumentation, optional): A hook told the duration of each call to
+            rank_examples and the number of examples it scores. Nothing is measured if omitted.
+
+        Returns:
+        -------
+        None
+
+        Raises:
+        ------
+        ValueError: If the file is opened read-only and has an older schema, or was written by a
+            newer version of synapsense.
+        """
+        import sqlite3
+
+        self.path = path
+        self.read_only = read_only
+        self.token_counter = token_counter
+        self.instrumentation = instrumentation
+        if read_only:
+            self._connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(_SCHEMA)
+        self._connection.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self._lock = threading.Lock()
+        try:
+            self._check_schema()
+        except Exception:
+            self._connection.close()
+            raise
+
+    @property
+    def contexts(self) -> dict:
+        """
+        Returns all contexts, loading every example from the file.
+
+        Returns:
+        -------
+        dict: A dictionary where the keys are context names and the values are lists of examples.
+        """
+        return {context_name: self.get_context(context_name) for context_name in self.list_contexts()}
+
+    def close(self):
+        """
+        Closes the connection to the SQLite file.
+
+        Returns:
+        -------
+        None
+        """
+        self._connection.close()
+
+    def _check_schema(self):
+        """
+        Checks the schema version of the file, migrating the file to the current schema if it is writable.
+
+        Returns:
+        -------
+        None
+
+        Raises:
+        ------
+        ValueError: If the file is read-only and has an older schema, or has a newer schema.
+        """
+        connection = self._connection
+        if not connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'meta'").fetchone():
+            # A new file opened read-only, before anything was written to it
+            return
+        row = connection.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        version = row[0] if row else 1
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"{self.path} has schema version {version}, newer than the supported "
+                             f"version {SCHEMA_VERSION}; upgrade synapsense to open it")
+        if version == SCHEMA_VERSION:
+            return
+
+        # Files created before the schema was versioned may already have every column
+        columns = {column[1] for column in connection.execute("PRAGMA table_info(examples)")}
+        if self.read_only:
+            if "prompt_tokens" in columns:
+                return
+            raise ValueError(f"{self.path} has schema version {version}, older than version {SCHEMA_VERSION}; "
+                             "open it once without read_only to migrate it")
+        with connection:
+            if "prompt_tokens" not in columns:
+                connection.execute("ALTER TABLE examples ADD COLUMN prompt_tokens INTEGER NOT NULL DEFAULT 0")
+                rows = connection.execute("SELECT context_id, example_id, text FROM examples").fetchall()
+                connection.executemany(
+                    "UPDATE examples SET prompt_tokens = ? WHERE context_id = ? AND example_id = ?",
+                    [(self.token_counter(text), context_id, example_id) for context_id, example_id, text in rows],
+                )
+            connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('schema_version', ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (SCHEMA_VERSION,),
+            )
+
+    def _in_memory_only(self, method: str):
+        """Raises TypeError, as a method needs the contexts in memory."""
+        raise TypeError(f"SQLiteContextManager does not support {method}(), which needs the contexts in memory; "
+                        "load them into a ContextManager with add_context(name, get_context(name)) first")
+
+    def snapshot(self, context_name: str):
+        """Not supported: raises TypeError, as snapshots hold the examples and index of a context in memory."""
+        self._in_memory_only("snapshot")
+
+    def batch(self):
+        """Not supported: raises TypeError, as each add_context already writes in a single transaction."""
+        self._in_memory_only("batch")
+
+    def merge_contexts(self, other: ContextManager):
+        """Not supported: raises TypeError, as overlays rank the in-memory snapshots of their layers."""
+        self._in_memory_only("merge_contexts")
+
+    def _execute(self, sql: str, parameters=()) -> list:
+        """
+        Runs a query and returns all its rows.
+
+        Args:
+        ----
+        sql (str): The query.
+        parameters (tuple): The parameters of the query.
+
+        Returns:
+        -------
+        list: The rows returned by the query.
+        """
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _context_id(self, context_name: str):
+        """
+        Returns the id of a context in the file, or None if it does not exist.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        int: The id of the context, or None.
+        """
+        rows = self._execute("SELECT context_id FROM contexts WHERE name = ?", (context_name,))
+        return rows[0][0] if rows else None
+
+    def _next_version(self) -> int:
+        """
+        Draws a new version from the counter stored in the file. Must be called in a transaction.
+
+        Returns:
+        -------
+        int: The new version.
+        """
+        self._connection.execute(
+            "INSERT INTO meta (key, value) VALUES ('version', 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+        )
+        return self._connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def add_context(self, context_name: str, examples: list, metadata: list = None):
+        """
+        Adds a new list of examples for a specific context.
+
+        The examples and their postings are written in a single transaction.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        examples (list): A list of examples for the context.
+        metadata (list, optional): Must be None, as metadata is not stored in the file.
+
+        Returns:
+        -------
+        None
+
+        Raises:
+        ------
+        ValueError: If metadata is given.
+        """
+        if metadata is not None:
+            raise ValueError("Metadata is not supported by SQLiteContextManager")
+        with self._lock, self._connection:
+            connection = self._connection
+            row = connection.execute("SELECT context_id, size FROM contexts WHERE name = ?", (context_name,)).fetchone()
+            if row is None:
+                cursor = connection.execute("INSERT INTO contexts (name, size, version) VALUES (?, 0, 0)", (context_name,))
+                context_id, size = cursor.lastrowid, 0
+            else:
+                context_id, size = row
+
+            example_rows = []
+            posting_rows = []
+            for example_id, example in enumerate(examples, size):
+                tokens = set(example.split())
+                example_rows.append((context_id, example_id, example, len(tokens), self.token_counter(example)))
+                posting_rows.extend((context_id, token, example_id) for token in tokens)
+            connection.executemany("INSERT INTO examples VALUES (?, ?, ?, ?, ?)", example_rows)
+            connection.executemany("INSERT INTO postings VALUES (?, ?, ?)", posting_rows)
+            if example_rows or row is None:
+                connection.execute(
+                    "UPDATE contexts SET size = ?, version = ? WHERE context_id = ?",
+                    (size + len(example_rows), self._next_version(), context_id),
+                )
+
+    def remove_context(self, context_name: str):
+        """
+        Removes a context by name.
+
+        Args:
+        ----
+        context_name (str): The name of the context to remove.
+
+        Returns:
+        -------
+        None
+        """
+        context_id = self._context_id(context_name)
+        if context_id is None:
+            return
+        with self._lock, self._connection:
+            for table in ("postings", "examples", "contexts"):
+                self._connection.execute(f"DELETE FROM {table} WHERE context_id = ?", (context_id,))
+
+    def get_context(self, context_name: str) -> list:
+        """
+        Retrieves the examples of a specific context.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        list: A list of examples for the context.
+        """
+        rows = self._execute(
+            "SELECT e.text FROM examples e JOIN contexts c USING (context_id) WHERE c.name = ? ORDER BY e.example_id",
+            (context_name,),
+        )
+        return [text for text, in rows]
+
+    def list_contexts(self) -> list:
+        """
+        Lists all available contexts.
+
+        Returns:
+        -------
+        list: A list of context names.
+        """
+        return [name for name, in self._execute("SELECT name FROM contexts ORDER BY context_id")]
+
+    def search_context(self, query: str) -> list:
+        """
+        Searches for contexts that match a query.
+
+        Args:
+        ----
+        query (str): The query to search for.
+
+        Returns:
+        -------
+        list: A list of tuples containing the context name and example.
+        """
+        return self._execute(
+            "SELECT c.name, e.text FROM examples e JOIN contexts c USING (context_id) "
+            "WHERE instr(e.text, ?) > 0 ORDER BY c.context_id, e.example_id",
+            (query,),
+        )
+
+    def search_contexts(self, queries: list) -> list:
+        """
+        Searches for contexts that match each of several queries.
+
+        Args:
+        ----
+        queries (list): The queries to search for.
+
+        Returns:
+        -------
+        list: For each query, the list of tuples that search_context returns for it.
+        """
+        return [self.search_context(query) for query in queries]
+
+    def filter_contexts(self, filter_func: callable = None, where: dict = None) -> dict:
+        """
+        Filters contexts using a custom function.
+
+        Args:
+        ----
+        filter_func (callable, optional): A function that takes an example and returns a boolean.
+        where (dict, optional): Must be None, as metadata is not stored in the file.
+
+        Returns:
+        -------
+        dict: A dictionary of filtered contexts.
+
+        Raises:
+        ------
+        ValueError: If where is given.
+        """
+        filtered_contexts = {}
+        for context_name, example in self.iter_filter_contexts(filter_func, where):
+            filtered_contexts.setdefault(context_name, []).append(example)
+        return filtered_contexts
+
+    def iter_filter_contexts(self, filter_func: callable = None, where: dict = None):
+        """
+        Yields the examples of filter_contexts one at a time, reading one context at a time.
+
+        Args:
+        ----
+        filter_func (callable, optional): A function that takes an example and returns a boolean.
+        where (dict, optional): Must be None, as metadata is not stored in the file.
+
+        Yields:
+        ------
+        tuple: The context name and example of each matching example.
+
+        Raises:
+        ------
+        ValueError: If where is given.
+        """
+        if where is not None:
+            raise ValueError("Metadata is not supported by SQLiteContextManager")
+        for context_name in self.list_contexts():
+            for example in self.get_context(context_name):
+                if filter_func is None or filter_func(example):
+                    yield context_name, example
+
+    def rank_examples(self, context_name: str, keywords: list, top_k: int = 3, threshold: float = 0.5,
+                      strategy: str = "inverted") -> list:
+        """
+        Ranks the examples of a context by similarity with the keywords, using the on-disk index.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        keywords (list): A list of keywords.
+        top_k (int): The maximum number of examples to return.
+        threshold (float): The similarity an example must exceed to be returned.
+        strategy (str): "inverted" or "scan", which both use the on-disk index here.
+
+        Returns:
+        -------
+        list: A list of (example_id, similarity) tuples, most similar first.
+        """
+        if strategy not in ("inverted", "scan"):
+            raise ValueError(f"Retrieval strategy {strategy} is not supported by SQLiteContextManager")
+        hook = self.instrumentation
+        if hook is not None:
+            started = perf_counter()
+        context_id = self._context_id(context_name)
+        if context_id is None:
+            if hook is not None:
+                hook.timing("rank_examples", perf_counter() - started)
+            return []
+
+        keyword_tokens = list(set(keywords))
+        counts = {}
+        sizes = {}
+        for start in range(0, len(keyword_tokens), _MAX_PARAMETERS):
+            tokens = keyword_tokens[start:start + _MAX_PARAMETERS]
+            rows = self._execute(
+                "SELECT p.example_id, COUNT(*), e.n_tokens FROM postings p "
+                "JOIN examples e ON e.context_id = p.context_id AND e.example_id = p.example_id "
+                f"WHERE p.context_id = ? AND p.token IN ({', '.join('?' * len(tokens))}) GROUP BY p.example_id",
+                (context_id, *tokens),
+            )
+            for example_id, intersection, n_tokens in rows:
+                counts[example_id] = counts.get(example_id, 0) + intersection
+                sizes[example_id] = n_tokens
+
+        n_keywords = len(keyword_tokens)
+        ranked = []
+        for example_id, intersection in counts.items():
+            similarity = intersection / (sizes[example_id] + n_keywords - intersection)
+            if similarity > threshold:
+                ranked.append((example_id, similarity))
+        ranked = select_top_k(ranked, top_k)
+        if hook is not None:
+            hook.timing("rank_examples", perf_counter() - started)
+            hook.observe("candidates_scored", len(counts))
+        return ranked
+
+    def get_examples(self, context_name: str, example_ids: list) -> list:
+        """
+        Retrieves examples of a context by id, reading only those examples from the file.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        example_ids (list): A list of example ids, as returned by rank_examples.
+
+        Returns:
+        -------
+        list: The examples with the given ids, in the same order.
+        """
+        return self._select_examples(context_name, example_ids, "text")
+
+    def _select_examples(self, context_name: str, example_ids: list, column: str) -> list:
+        """
+        Reads a column of examples of a context by id.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        example_ids (list): A list of example ids.
+        column (str): The column to read.
+
+        Returns:
+        -------
+        list: The value of the column for each example, in the same order as the ids.
+        """
+        context_id = self._context_id(context_name)
+        values = {}
+        for start in range(0, len(example_ids), _MAX_PARAMETERS):
+            ids = example_ids[start:start + _MAX_PARAMETERS]
+            rows = self._execute(
+                f"SELECT example_id, {column} FROM examples "
+                f"WHERE context_id = ? AND example_id IN ({', '.join('?' * len(ids))})",
+                (context_id, *ids),
+            )
+            values.update(rows)
+        return [values[example_id] for example_id in example_ids]
+
+    def get_token_counts(self, context_name: str, example_ids: list) -> list:
+        """
+        Retrieves the stored number of prompt tokens of examples of a context by id.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        example_ids (list): A list of example ids, as returned by rank_examples.
+
+        Returns:
+        -------
+        list: The number of prompt tokens of each example, in the same order as the ids.
+        """
+        return self._select_examples(context_name, example_ids, "prompt_tokens")
+
+    def get_metadata(self, context_name: str, example_ids: list) -> list:
+        """
+        Retrieves the metadata of examples of a context by id, which is always None here.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+        example_ids (list): A list of example ids, as returned by rank_examples.
+
+        Returns:
+        -------
+        list: None for each example id.
+        """
+        return [None] * len(example_ids)
+
+    def get_token_sets(self, context_name: str) -> list:
+        """
+        Retrieves the token sets of the examples of a context, tokenizing them as they are read.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        list: The frozen token set of each example, in the same order as get_context.
+        """
+        return [frozenset(example.split()) for example in self.get_context(context_name)]
+
+    def get_version(self, context_name: str) -> int:
+        """
+        Returns the version of a context, which changes whenever the context does.
+
+        Args:
+        ----
+        context_name (str): The name of the context.
+
+        Returns:
+        -------
+        int: The version of the context, or 0 if the context does not exist.
+        """
+        rows = self._execute("SELECT version FROM contexts WHERE name = ?", (context_name,))
+        return rows[0][0] if rows else 0
+
+    def __str__(self) -> str:
+        """
+        Returns a string representation of the context manager.
+
+        Returns:
+        -------
+        str: A string representation of the context manager.
+        """
+        return f"SQLiteContextManager with {len(self.list_contexts())} contexts at {self.path}"
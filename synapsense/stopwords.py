@@ -0,0 +1,35 @@
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def load_stop_words(language: str = "english") -> frozenset:
+    """
+    Loads the stop words of a language.
+
+    The English stop words of the NLTK stopwords corpus ship with synapsense, so
+    loading them needs neither nltk nor network access. Other languages are read
+    from the NLTK stopwords corpus when nltk is installed.
+
+    Args:
+    ----
+    language (str): The language of the stop words.
+
+    Returns:
+    -------
+    frozenset: The stop words of the language.
+    """
+    # pkgutil pulls in typing and re, so it is only imported once stop words are needed
+    import pkgutil
+
+    try:
+        data = pkgutil.get_data(__package__, f"data/stopwords/{language}")
+    except FileNotFoundError:
+        data = None
+    if data is not None:
+        return frozenset(data.decode("utf-8").split())
+
+    try:
+        from nltk.corpus import stopwords
+    except ImportError:
+        raise ValueError(f"No bundled stop words for {language!r}; install nltk to use its stopwords corpus.") from None
+    return frozenset(stopwords.words(language))
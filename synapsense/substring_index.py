@@ -0,0 +1,115 @@
+from array import array
+from bisect import bisect_left
+
+# The length of the character n-grams indexed; queries shorter than this cannot use the index.
+GRAM = 3
+
+
+def _grams(text: str) -> set:
+    """
+    Returns the distinct character trigrams of a text.
+
+    Args:
+    ----
+    text (str): The text.
+
+    Returns:
+    -------
+    set: The trigrams of the text.
+    """
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def _contains(posting: array, example_id: int) -> bool:
+    position = bisect_left(posting, example_id)
+    return position < len(posting) and posting[position] == example_id
+
+
+class TrigramIndex:
+    """
+    A class used to find the examples of a context that may contain a substring.
+
+    Every distinct character trigram of an example maps to the ascending ids of the
+    examples containing it. An example containing a query contains all of its trigrams,
+    so intersecting their postings, rarest first, gives a short list of candidates
+    which is then checked with an exact substring test.
+
+    Attributes:
+    ----------
+    postings : dict
+        A dictionary where the keys are trigrams and the values are arrays of example ids.
+
+    Methods:
+    -------
+    add(examples)
+        Indexes examples, numbered after the examples already indexed.
+    candidates(query, limit)
+        Returns the ids of the examples that contain every trigram of the query.
+    """
+
+    __slots__ = ("postings", "_size")
+
+    def __init__(self):
+        """
+        Initializes an empty trigram index.
+
+        Returns:
+        -------
+        None
+        """
+        self.postings = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, examples):
+        """
+        Indexes examples, numbered after the examples already indexed.
+
+        Args:
+        ----
+        examples (iterable): The examples.
+
+        Returns:
+        -------
+        None
+        """
+        postings = self.postings
+        for example_id, example in enumerate(examples, self._size):
+            for gram in _grams(example):
+                posting = postings.get(gram)
+                if posting is None:
+                    postings[gram] = array("I", (example_id,))
+                else:
+                    posting.append(example_id)
+            self._size = example_id + 1
+
+    def candidates(self, query: str, limit: int = None) -> list:
+        """
+        Returns the ids of the examples that contain every trigram of the query.
+
+        Args:
+        ----
+        query (str): The query, of at least three characters.
+        limit (int, optional): Only the examples with a lower id are returned. Defaults to all
+            the indexed examples.
+
+        Returns:
+        -------
+        list: The ids of the candidate examples, in ascending order.
+        """
+        postings = []
+        for gram in _grams(query):
+            posting = self.postings.get(gram)
+            if posting is None:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        ids = postings[0]
+        ids = ids[:bisect_left(ids, self._size if limit is None else limit)].tolist()
+        for posting in postings[1:]:
+            if not ids:
+                break
+            ids = [example_id for example_id in ids if _contains(posting, example_id)]
+        return ids
@@ -0,0 +1,88 @@
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens of a text without a tokenizer.
+
+    Byte-pair encodings of English text average about four characters per token,
+    so the estimate is the number of characters divided by four, rounded up. It
+    costs a single len call.
+
+    Args:
+    ----
+    text (str): The text.
+
+    Returns:
+    -------
+    int: The estimated number of tokens.
+    """
+    return (len(text) + 3) // 4
+
+
+class TiktokenCounter:
+    """
+    A class used to count tokens exactly with a tiktoken encoding.
+
+    Instances are callables that can replace estimate_tokens, and they can be pickled
+    to worker processes, which load the encoding again.
+
+    Attributes:
+    ----------
+    encoding_name : str
+        The name of the tiktoken encoding.
+    """
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        """
+        Initializes a counter with a tiktoken encoding.
+
+        Args:
+        ----
+        encoding_name (str): The name of the tiktoken encoding.
+
+        Returns:
+        -------
+        None
+        """
+        try:
+            import tiktoken
+        except ImportError:
+            raise ImportError("TiktokenCounter requires tiktoken: pip install synapsense[tiktoken]") from None
+        self.encoding_name = encoding_name
+        self._encoding = tiktoken.get_encoding(encoding_name)
+
+    def __call__(self, text: str) -> int:
+        """
+        Counts the tokens of a text.
+
+        Args:
+        ----
+        text (str): The text.
+
+        Returns:
+        -------
+        int: The number of tokens.
+        """
+        return len(self._encoding.encode_ordinary(text))
+
+    def __reduce__(self):
+        return TiktokenCounter, (self.encoding_name,)
+
+
+def pack_to_budget(token_counts: list, budget: int) -> list:
+    """
+    Selects items in order, skipping those that no longer fit, until the budget is spent.
+
+    Args:
+    ----
+    token_counts (list): The number of tokens of each item, best item first.
+    budget (int): The maximum total number of tokens.
+
+    Returns:
+    -------
+    list: The positions of the selected items, in order.
+    """
+    selected = []
+    for position, n_tokens in enumerate(token_counts):
+        if n_tokens <= budget:
+            selected.append(position)
+            budget -= n_tokens
+    return selected